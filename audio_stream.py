@@ -0,0 +1,142 @@
+"""
+Extracción de audio al vuelo durante la descarga.
+Los mismos bloques que se escriben en el MP4 se pasan (por un hilo y una cola acotada)
+a un ffmpeg que lee de stdin y produce el audio de 16 kHz mono. El audio se escribe con
+un nombre temporal y se renombra al terminar bien, así el transcriptor nunca ve un audio
+a medias. Si el átomo moov no está al principio del MP4, ffmpeg no puede leerlo desde una
+tubería: se desiste y el transcriptor extraerá el audio del archivo como siempre.
+"""
+
+import os
+import queue
+import struct
+import logging
+import threading
+import subprocess
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Formatos del audio intermedio: extensión, contenedor para ffmpeg y argumentos de códec.
+# FLAC es sin pérdidas (~50% del PCM); Opus reduce ~10x a costa de ser con pérdidas.
+AUDIO_FORMATS = {
+    "wav": {"ext": ".wav", "muxer": "wav", "codec": []},
+    "flac": {"ext": ".flac", "muxer": "flac", "codec": ["-c:a", "flac", "-compression_level", "5"]},
+    "opus": {"ext": ".opus", "muxer": "ogg", "codec": ["-c:a", "libopus", "-b:a", "32k", "-application", "voip"]},
+}
+
+MAX_PROBE_BYTES = 4 * 1024 * 1024  # si en los primeros MB no aparece moov ni mdat, se desiste
+QUEUE_CHUNKS = 32
+
+
+def moov_position(header):
+    """Recorre las cajas de primer nivel del MP4.
+
+    Devuelve "start" si moov aparece antes que mdat, "end" si mdat va primero y None si
+    con los bytes recibidos todavía no se puede saber.
+    """
+    offset = 0
+    while offset + 8 <= len(header):
+        size, box_type = struct.unpack(">I4s", header[offset:offset + 8])
+        if box_type == b"moov":
+            return "start"
+        if box_type == b"mdat":
+            return "end"
+        if size == 1:
+            if offset + 16 > len(header):
+                return None
+            size = struct.unpack(">Q", header[offset + 8:offset + 16])[0]
+        if size < 8:
+            return "end"  # caja hasta el final del archivo o cabecera inválida
+        offset += size
+    return None
+
+
+class StreamingAudioExtractor:
+    """Tee de la descarga hacia ffmpeg; feed() por bloque, finish() o abort() al final."""
+
+    def __init__(self, audio_path, audio_format="flac"):
+        self.audio_path = Path(audio_path)
+        self.audio_format = audio_format
+        self.tmp_path = self.audio_path.with_name(self.audio_path.name + ".part")
+        self.active = True
+        self._header = b""
+        self._process = None
+        self._queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._writer = None
+        self._broken = False
+
+    def feed(self, chunk):
+        """Pasa un bloque del MP4 a ffmpeg (bloquea solo si ffmpeg va muy por detrás)."""
+        if not self.active:
+            return
+        if self._process is None:
+            self._header += chunk
+            position = moov_position(self._header)
+            if position is None and len(self._header) < MAX_PROBE_BYTES:
+                return
+            if position != "start":
+                logger.info("🎧 El MP4 no tiene moov al principio; el audio se extraerá tras la descarga")
+                self.active = False
+                self._header = b""
+                return
+            self._start()
+            chunk, self._header = self._header, b""
+        self._queue.put(chunk)
+
+    def _start(self):
+        fmt = AUDIO_FORMATS[self.audio_format]
+        self.audio_path.parent.mkdir(parents=True, exist_ok=True)
+        cmd = [
+            "ffmpeg", "-v", "error", "-i", "pipe:0", "-vn",
+            "-ac", "1", "-ar", "16000", *fmt["codec"], "-f", fmt["muxer"], "-y", str(self.tmp_path)
+        ]
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                         stderr=subprocess.PIPE)
+        self._writer = threading.Thread(target=self._pump, daemon=True)
+        self._writer.start()
+
+    def _pump(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._broken:
+                continue  # se sigue vaciando la cola para no bloquear la descarga
+            try:
+                self._process.stdin.write(chunk)
+            except (BrokenPipeError, OSError):
+                self._broken = True
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+
+    def finish(self):
+        """Cierra la entrada de ffmpeg; si el audio es válido lo renombra y devuelve su ruta."""
+        if not self.active or self._process is None:
+            self.active = False
+            return None
+        self._queue.put(None)
+        self._writer.join()
+        stderr = self._process.stderr.read().decode("utf-8", errors="replace")
+        returncode = self._process.wait()
+        self.active = False
+        if returncode != 0 or self._broken or not self.tmp_path.exists() or self.tmp_path.stat().st_size == 0:
+            logger.warning(f"Extracción al vuelo fallida ({returncode}): {stderr.strip()[-300:]}")
+            self.tmp_path.unlink(missing_ok=True)
+            return None
+        os.replace(self.tmp_path, self.audio_path)
+        logger.info(f"🎧 Audio listo al terminar la descarga: {self.audio_path.name}")
+        return self.audio_path
+
+    def abort(self):
+        """Detiene ffmpeg y borra el audio parcial (descarga fallida o duplicada)."""
+        if self._process is not None and self.active:
+            self._broken = True
+            self._queue.put(None)
+            self._process.kill()
+            self._writer.join()
+            self._process.wait()
+        self.active = False
+        self.tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,336 @@
+"""
+Autoajuste de whisper-cli para la máquina actual.
+Sobre un fragmento de prueba se cronometran las variantes cuantizadas del modelo
+(q5_0, q8_0...), GPU frente a CPU, el número de hilos (-t) y el reparto entre
+procesos (-p y varias instancias a la vez). Se guarda en un perfil JSON la
+configuración más rápida cuyo WER respecto a la referencia no supera el umbral;
+el transcriptor lo aplica automáticamente si el perfil es de esta máquina.
+
+Uso:
+    python autotune.py whisper.cpp/build/bin/whisper-cli whisper.cpp/models/ggml-large-v3.bin
+    python autotune.py ... --fixture videos/<asignatura>/2025-03-04.mp4 --max-wer 0.08
+    python autotune.py ... --quantize-bin whisper.cpp/build/bin/quantize --quant q5_0 q8_0
+"""
+
+import os
+import re
+import json
+import time
+import socket
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+import unicodedata
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_PATH = "whisper_profile.json"
+DEFAULT_QUANTS = ("q5_0", "q8_0")
+
+BACKEND_PATTERNS = [
+    (re.compile(r"ggml_vulkan|Vulkan", re.I), "Vulkan"),
+    (re.compile(r"ggml_cuda|CUDA", re.I), "CUDA"),
+    (re.compile(r"ggml_metal|Metal", re.I), "Metal"),
+    (re.compile(r"OpenVINO", re.I), "OpenVINO"),
+]
+
+
+def detect_backend(stderr):
+    """Backend que whisper-cli informa al arrancar (o CPU si no menciona ninguna GPU)."""
+    for pattern, name in BACKEND_PATTERNS:
+        if pattern.search(stderr or ""):
+            return name
+    return "CPU"
+
+
+def machine_key():
+    return {"host": socket.gethostname(), "cpu_count": os.cpu_count()}
+
+
+def load_profile(path=None):
+    """Perfil de esta máquina o None (no existe, ilegible o generado en otro equipo)."""
+    path = Path(path or os.getenv("WHISPER_PROFILE", DEFAULT_PROFILE_PATH))
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Perfil de whisper ilegible ({e}); se usan los valores por defecto")
+        return None
+    if profile.get("machine") != machine_key():
+        logger.warning(f"El perfil {path} es de otra máquina ({profile.get('machine')}); se ignora")
+        return None
+    return profile
+
+
+def whisper_args(profile):
+    """Argumentos de whisper-cli del perfil: hilos, procesadores y, si toca, sin GPU."""
+    if not profile:
+        return []
+    args = ["-t", str(profile["threads"]), "-p", str(profile["processors"])]
+    if not profile["gpu"]:
+        args.append("-ng")
+    return args
+
+
+# --- PRECISIÓN ---
+def normalize_words(text):
+    """Minúsculas, sin tildes ni puntuación: solo cuentan las palabras."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"\w+", text)
+
+
+def word_error_rate(reference, hypothesis):
+    """WER por distancia de edición entre palabras (sustituciones + inserciones + borrados)."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+# --- CANDIDATOS ---
+def quantized_variants(model_path, quants=DEFAULT_QUANTS, quantize_bin=None):
+    """Modelo original y variantes <modelo>-<quant>.bin existentes (o creadas con quantize)."""
+    model_path = Path(model_path)
+    models = [model_path]
+    for quant in quants:
+        variant = model_path.with_name(f"{model_path.stem}-{quant}{model_path.suffix}")
+        if not variant.exists() and quantize_bin:
+            logger.info(f"🧮 Cuantizando {model_path.name} -> {variant.name}")
+            result = subprocess.run([str(quantize_bin), str(model_path), str(variant), quant],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                logger.warning(f"quantize {quant} falló: {result.stderr.strip()[-300:]}")
+                variant.unlink(missing_ok=True)
+        if variant.exists():
+            models.append(variant)
+    return models
+
+
+def thread_grid(cpus):
+    """1, 2, 4... hasta el número de CPUs (incluido aunque no sea potencia de 2)."""
+    grid, threads = [], 1
+    while threads < cpus:
+        grid.append(threads)
+        threads *= 2
+    return grid + [cpus]
+
+
+def split_grid(cpus, max_parallel=4):
+    """Repartos instancias × procesadores × hilos que ocupan todas las CPUs."""
+    splits = []
+    for workers in (1, 2, 4):
+        for processors in (1, 2, 4):
+            if workers * processors > max_parallel or cpus // (workers * processors) < 1:
+                continue
+            splits.append((workers, processors, cpus // (workers * processors)))
+    return splits
+
+
+class Autotuner:
+    """Cronometra configuraciones de whisper-cli sobre un fragmento y elige la mejor."""
+
+    def __init__(self, whisper_cli_path, model_path, fixture_path, fixture_seconds, reference_text=None,
+                 max_wer=0.10, quants=DEFAULT_QUANTS, quantize_bin=None, work_dir=None):
+        self.whisper_cli_path = Path(whisper_cli_path)
+        self.model_path = Path(model_path)
+        self.fixture_path = Path(fixture_path)
+        self.fixture_seconds = fixture_seconds
+        self.reference_text = reference_text
+        self.max_wer = max_wer
+        self.quants = quants
+        self.quantize_bin = quantize_bin
+        self.work_dir = Path(work_dir or tempfile.mkdtemp(prefix="autotune_"))
+        self.cpus = os.cpu_count() or 1
+        self.trials = []
+        self.backend = None
+
+    def trial(self, model, gpu=True, threads=4, processors=1, workers=1):
+        """Ejecuta ``workers`` instancias a la vez; devuelve el resultado con WER y velocidad."""
+        args = ["-t", str(threads), "-p", str(processors)] + ([] if gpu else ["-ng"])
+        label = f"{Path(model).name} {'GPU' if gpu else 'CPU'} w={workers} p={processors} t={threads}"
+
+        def run(n):
+            out_base = self.work_dir / f"trial_{len(self.trials)}_{n}"
+            cmd = [str(self.whisper_cli_path), "-m", str(model), "-f", str(self.fixture_path),
+                   "-otxt", "-l", "es", *args, "-of", str(out_base)]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            out_path = Path(f"{out_base}.txt")
+            text = out_path.read_text(encoding="utf-8", errors="replace") if out_path.exists() else None
+            return result.returncode, result.stderr, text
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(run, range(workers)))
+        elapsed = time.perf_counter() - started
+
+        returncode, stderr, text = outputs[0]
+        result = {
+            "model": str(model), "gpu": gpu, "threads": threads, "processors": processors, "workers": workers,
+            "seconds": round(elapsed, 2),
+            # Segundos de audio procesados por segundo de reloj, sumando todas las instancias
+            "realtime_factor": round(workers * self.fixture_seconds / elapsed, 2) if elapsed else 0.0,
+            "ok": all(code == 0 and out is not None for code, _, out in outputs),
+            "wer": None,
+        }
+        if self.backend is None and gpu:
+            self.backend = detect_backend(stderr)
+        if result["ok"] and self.reference_text is not None:
+            result["wer"] = round(word_error_rate(self.reference_text, text), 4)
+        elif result["ok"]:
+            self.reference_text = text  # la primera ejecución (modelo original) es la referencia
+            result["wer"] = 0.0
+        self.trials.append(result)
+        status = f"{result['realtime_factor']:.1f}x tiempo real, WER {result['wer']}" if result["ok"] else "fallida"
+        logger.info(f"⏱️ {label}: {elapsed:.1f}s ({status})")
+        return result
+
+    def accurate(self, result):
+        return result["ok"] and result["wer"] is not None and result["wer"] <= self.max_wer
+
+    def run(self):
+        """Búsqueda en dos fases: modelo/backend/hilos con una instancia, luego repartos."""
+        # Referencia: modelo original con la configuración por defecto de whisper-cli
+        if not self.trial(self.model_path)["ok"]:
+            logger.error("whisper-cli no pudo transcribir el fragmento de prueba con el modelo original")
+            return None
+        logger.info(f"🚀 Backend detectado: {self.backend}")
+        if self.backend == "CPU":
+            self.trials[0]["gpu"] = False  # sin GPU, -ng no cambia nada
+        gpu_options = [True, False] if self.backend != "CPU" else [False]
+
+        models = quantized_variants(self.model_path, self.quants, self.quantize_bin)
+        for model in models:
+            for gpu in gpu_options:
+                # Con GPU los hilos solo alimentan la decodificación: basta con probar pocos
+                threads_options = [min(4, self.cpus), self.cpus] if gpu else thread_grid(self.cpus)
+                for threads in sorted(set(threads_options)):
+                    self.trial(model, gpu=gpu, threads=threads)
+
+        candidates = [t for t in self.trials if self.accurate(t)]
+        if not candidates:
+            logger.error(f"Ninguna configuración cumple WER <= {self.max_wer}")
+            return None
+        best = max(candidates, key=lambda t: t["realtime_factor"])
+
+        # Fase 2: repartir las CPUs entre instancias (-p y procesos) con el mejor modelo y backend
+        if best["gpu"]:
+            splits = [(2, 1, max(1, self.cpus // 2))]  # una segunda instancia puede solapar CPU y GPU
+        else:
+            splits = [s for s in split_grid(self.cpus) if s != (1, 1, best["threads"])]
+        for workers, processors, threads in splits:
+            self.trial(best["model"], gpu=best["gpu"], threads=threads, processors=processors, workers=workers)
+
+        candidates = [t for t in self.trials if self.accurate(t)]
+        return max(candidates, key=lambda t: t["realtime_factor"])
+
+    def build_profile(self, best):
+        return {
+            "machine": machine_key(),
+            "backend": self.backend if best["gpu"] else "CPU",
+            "base_model": self.model_path.name,
+            "model": best["model"],
+            "gpu": best["gpu"],
+            "threads": best["threads"],
+            "processors": best["processors"],
+            "workers": best["workers"],
+            "realtime_factor": best["realtime_factor"],
+            "wer": best["wer"],
+            "max_wer": self.max_wer,
+            "fixture_seconds": self.fixture_seconds,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "trials": self.trials,
+        }
+
+
+def save_profile(profile, path):
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def extract_fixture(source, output_path, offset, seconds):
+    """Fragmento WAV 16 kHz mono de ``seconds`` a partir de ``offset`` (evita el silencio inicial)."""
+    cmd = [
+        "ffmpeg", "-v", "error", "-ss", str(offset), "-t", str(seconds), "-i", str(source),
+        "-vn", "-ac", "1", "-ar", "16000", "-y", str(output_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0 or not Path(output_path).exists():
+        logger.error(f"Error extrayendo el fragmento de prueba: {result.stderr.strip()[-300:]}")
+        return None
+    return output_path
+
+
+def find_fixture(videos_dir="videos"):
+    """Primer video disponible en <videos_dir>/<asignatura>/*.mp4."""
+    for video_path in sorted(Path(videos_dir).glob("*/*.mp4")):
+        return video_path
+    return None
+
+
+def main(argv=None):
+    from logging_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description="Autoajuste de whisper-cli (cuantización, GPU/CPU, hilos)")
+    parser.add_argument("whisper_cli_path", help="Ruta del binario whisper-cli")
+    parser.add_argument("model_path", help="Modelo GGML de referencia (p. ej. ggml-large-v3.bin)")
+    parser.add_argument("--fixture", help="Video o audio de prueba (por defecto, el primero de videos/)")
+    parser.add_argument("--offset", type=float, default=600, help="Segundo de inicio del fragmento (por defecto 600)")
+    parser.add_argument("--seconds", type=float, default=120, help="Duración del fragmento (por defecto 120)")
+    parser.add_argument("--reference", help="Transcripción revisada del fragmento; sin ella, la del modelo original")
+    parser.add_argument("--max-wer", type=float, default=0.10, help="WER máximo aceptado respecto a la referencia")
+    parser.add_argument("--quant", nargs="*", default=list(DEFAULT_QUANTS), help="Variantes cuantizadas a probar")
+    parser.add_argument("--quantize-bin", help="Binario quantize de whisper.cpp para crear las variantes que falten")
+    parser.add_argument("--output", default=os.getenv("WHISPER_PROFILE", DEFAULT_PROFILE_PATH),
+                        help="Perfil de salida (por defecto WHISPER_PROFILE o whisper_profile.json)")
+    args = parser.parse_args(argv)
+
+    setup_logging('autotune.log')
+    source = Path(args.fixture) if args.fixture else find_fixture()
+    if not source or not source.exists():
+        logger.error("No hay fragmento de prueba: indica uno con --fixture")
+        return False
+
+    work_dir = Path(tempfile.mkdtemp(prefix="autotune_"))
+    try:
+        fixture = extract_fixture(source, work_dir / "fixture.wav", args.offset, args.seconds)
+        if not fixture:
+            return False
+        reference = Path(args.reference).read_text(encoding="utf-8") if args.reference else None
+        tuner = Autotuner(
+            args.whisper_cli_path, args.model_path, fixture, args.seconds, reference_text=reference,
+            max_wer=args.max_wer, quants=args.quant, quantize_bin=args.quantize_bin, work_dir=work_dir,
+        )
+        best = tuner.run()
+        if not best:
+            return False
+        profile = tuner.build_profile(best)
+        save_profile(profile, args.output)
+        logger.info(
+            f"🏆 {Path(best['model']).name} en {profile['backend']}: {best['workers']} instancia(s), "
+            f"-p {best['processors']} -t {best['threads']} -> {best['realtime_factor']:.1f}x tiempo real, "
+            f"WER {best['wer']:.3f}"
+        )
+        logger.info(f"💾 Perfil guardado en {args.output}")
+        return True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
@@ -0,0 +1,168 @@
+"""
+Inferencia por lotes con el paquete whisper (backend en proceso).
+El audio se lee por tubería en ventanas de 30 s y los espectrogramas mel de varias
+ventanas (de la misma clase o de clases distintas) se apilan en un único tensor, de modo
+que el codificador procesa el lote en una pasada y la decodificación voraz avanza todas
+las secuencias a la vez. Las ventanas dudosas (compresión excesiva o log-prob baja) se
+repiten una a una con temperatura, como hace model.transcribe().
+
+Uso:
+    python batched_whisper.py audios/*.flac --model small --batch-size 8 --output-dir transcripciones_lote
+"""
+
+import os
+import time
+import logging
+import argparse
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import torch
+import whisper
+
+from transcript_index import EMPTY_CHUNK_MARK
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = whisper.audio.CHUNK_LENGTH  # 30 s: entrada fija del codificador
+WINDOW_SAMPLES = whisper.audio.N_SAMPLES
+FALLBACK_TEMPERATURES = (0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+
+
+def iter_windows(audio_path):
+    """Ventanas de 30 s (float32, 16 kHz) leídas de ffmpeg sin cargar el audio entero."""
+    cmd = [
+        "ffmpeg", "-v", "error", "-i", str(audio_path),
+        "-f", "s16le", "-ac", "1", "-ar", str(whisper.audio.SAMPLE_RATE), "-"
+    ]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as process:
+        index = 0
+        while True:
+            data = process.stdout.read(WINDOW_SAMPLES * 2)
+            if not data:
+                break
+            samples = np.frombuffer(data[:len(data) - len(data) % 2], dtype="<i2").astype(np.float32) / 32768.0
+            yield index, samples
+            index += 1
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg no pudo decodificar {audio_path}")
+
+
+class BatchedWhisper:
+    """Transcribe ventanas de 30 s en lotes de ``batch_size`` con whisper.decode()."""
+
+    def __init__(self, model, batch_size=8, language="es"):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.language = language
+        self.fp16 = model.device.type == "cuda"
+        self.stats = {"windows": 0, "batches": 0, "fallbacks": 0}
+
+    def _mel(self, samples):
+        audio = whisper.pad_or_trim(torch.from_numpy(samples))
+        return whisper.log_mel_spectrogram(audio, n_mels=self.model.dims.n_mels)
+
+    def _options(self, temperature=0.0):
+        return whisper.DecodingOptions(
+            language=self.language, temperature=temperature, without_timestamps=True, fp16=self.fp16
+        )
+
+    def decode_batch(self, mels):
+        """Una pasada del codificador y decodificación voraz para todo el lote."""
+        batch = torch.stack(mels).to(self.model.device)
+        results = whisper.decode(self.model, batch, self._options())
+        self.stats["batches"] += 1
+        self.stats["windows"] += len(mels)
+        texts = []
+        for mel, result in zip(mels, results):
+            if (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                    or (result.avg_logprob < LOGPROB_THRESHOLD and result.no_speech_prob < 0.6)):
+                result = self._fallback(mel, result)
+            texts.append("" if result.no_speech_prob > 0.6 and result.avg_logprob < LOGPROB_THRESHOLD
+                         else result.text.strip())
+        return texts
+
+    def _fallback(self, mel, result):
+        """Repite una ventana dudosa con temperaturas crecientes (sin lote)."""
+        self.stats["fallbacks"] += 1
+        for temperature in FALLBACK_TEMPERATURES:
+            result = whisper.decode(self.model, mel.to(self.model.device), self._options(temperature))
+            if result.compression_ratio <= COMPRESSION_RATIO_THRESHOLD and result.avg_logprob >= LOGPROB_THRESHOLD:
+                break
+        return result
+
+    def transcribe_files(self, audio_paths):
+        """Transcribe varias clases mezclando sus ventanas en los mismos lotes.
+
+        Devuelve, por cada archivo y en el mismo orden, [(fin de la ventana en s, texto), ...].
+        """
+        outputs = [[] for _ in audio_paths]
+        pending = []  # (nº de archivo, índice de ventana, duración, mel)
+
+        def flush():
+            texts = self.decode_batch([mel for _, _, _, mel in pending])
+            for (n, index, seconds, _), text in zip(pending, texts):
+                outputs[n].append((index * WINDOW_SECONDS + seconds, text))
+            pending.clear()
+
+        for n, path in enumerate(audio_paths):
+            for index, samples in iter_windows(path):
+                pending.append((n, index, len(samples) / whisper.audio.SAMPLE_RATE, self._mel(samples)))
+                if len(pending) == self.batch_size:
+                    flush()
+        if pending:
+            flush()
+        return outputs
+
+
+def write_transcript(windows, output_path):
+    """Mismo formato que el transcriptor: texto de cada ventana seguido de su marca [⏱️ MM:SS]."""
+    with open(output_path, "w", encoding="utf-8") as f:
+        for end, text in windows:
+            f.write(f"\n\n{text or EMPTY_CHUNK_MARK}\n")
+            f.write(f"[⏱️ {int(end) // 60:02d}:{int(end) % 60:02d}]\n")
+
+
+def main(argv=None):
+    from logging_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description="Transcripción por lotes de ventanas de 30 s (paquete whisper)")
+    parser.add_argument("audio_paths", nargs="+", help="Audios o videos a transcribir")
+    parser.add_argument("--model", default="small", help="Modelo de whisper (por defecto small)")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("WHISPER_BATCH_SIZE", "8")),
+                        help="Ventanas por pasada del codificador (por defecto 8 o WHISPER_BATCH_SIZE)")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--output-dir", default="transcripciones_lote", help="Carpeta de salida")
+    args = parser.parse_args(argv)
+
+    setup_logging('batched_whisper.log')
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model = whisper.load_model(args.model, device=args.device)
+    batched = BatchedWhisper(model, args.batch_size)
+
+    started = time.perf_counter()
+    try:
+        outputs = batched.transcribe_files(args.audio_paths)
+    except Exception as e:
+        logger.error(f"Error en la transcripción por lotes: {e}")
+        return False
+    elapsed = time.perf_counter() - started
+
+    audio_seconds = 0.0
+    for path, windows in zip(args.audio_paths, outputs):
+        write_transcript(windows, output_dir / f"{Path(path).stem}.txt")
+        audio_seconds += windows[-1][0] if windows else 0.0
+    stats = batched.stats
+    logger.info(
+        f"✓ {len(outputs)} archivos, {stats['windows']} ventanas en {stats['batches']} lotes "
+        f"({stats['fallbacks']} repetidas): {audio_seconds / elapsed:.1f}x tiempo real"
+    )
+    return True
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
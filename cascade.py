@@ -0,0 +1,109 @@
+"""
+Cascada de modelos para la transcripción.
+Cada fragmento pasa primero por un modelo pequeño (borrador). Con la salida JSON completa
+de whisper-cli (-ojf) se calcula la log-probabilidad media de los tokens y la ambigüedad
+de "sin voz"; solo los fragmentos dudosos se repiten con el modelo grande.
+"""
+
+import os
+import json
+import math
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def read_whisper_json(json_path):
+    """Carga el JSON de whisper-cli (-ojf); los bytes UTF-8 partidos en tokens se reemplazan."""
+    with open(json_path, "r", encoding="utf-8", errors="replace") as f:
+        return json.load(f)
+
+
+def chunk_confidence(data, speech_seconds=None):
+    """Resume la confianza del borrador: log-prob media, prob. de no-voz y caracteres por segundo de voz."""
+    logprobs = []
+    no_speech = []
+    chars = 0
+    for segment in data.get("transcription", []):
+        chars += len(segment.get("text", "").strip())
+        if "no_speech_prob" in segment:
+            no_speech.append(float(segment["no_speech_prob"]))
+        for token in segment.get("tokens", []):
+            # Los tokens especiales ([_BEG_], [_TT_123]...) no aportan a la confianza del texto
+            if token.get("text", "").startswith("[_") or "p" not in token:
+                continue
+            logprobs.append(math.log(max(float(token["p"]), 1e-10)))
+    return {
+        "avg_logprob": sum(logprobs) / len(logprobs) if logprobs else None,
+        "no_speech_prob": max(no_speech) if no_speech else None,
+        "chars_per_second": chars / speech_seconds if speech_seconds else None,
+    }
+
+
+class CascadePolicy:
+    """Decide qué fragmentos del borrador se repiten con el modelo grande."""
+
+    def __init__(self, draft_model_path=None, min_avg_logprob=-0.8, max_no_speech_prob=0.6,
+                 min_chars_per_second=3.0):
+        self.draft_model_path = draft_model_path
+        self.min_avg_logprob = min_avg_logprob
+        self.max_no_speech_prob = max_no_speech_prob
+        self.min_chars_per_second = min_chars_per_second
+        self.stats = {"chunks": 0, "escalated": 0, "draft_seconds": 0.0, "final_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, draft_model_path=None):
+        """CASCADE_DRAFT_MODEL, CASCADE_MIN_LOGPROB, CASCADE_MAX_NO_SPEECH y CASCADE_MIN_CHARS_PER_SECOND."""
+        return cls(
+            draft_model_path=draft_model_path or os.getenv("CASCADE_DRAFT_MODEL") or None,
+            min_avg_logprob=float(os.getenv("CASCADE_MIN_LOGPROB", "-0.8")),
+            max_no_speech_prob=float(os.getenv("CASCADE_MAX_NO_SPEECH", "0.6")),
+            min_chars_per_second=float(os.getenv("CASCADE_MIN_CHARS_PER_SECOND", "3")),
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.draft_model_path)
+
+    def assess(self, json_path, speech_seconds=None):
+        """Devuelve (repetir con el modelo grande, motivo)."""
+        try:
+            confidence = chunk_confidence(read_whisper_json(json_path), speech_seconds)
+        except (OSError, ValueError) as e:
+            return True, f"sin salida JSON del borrador ({e})"
+
+        avg_logprob = confidence["avg_logprob"]
+        no_speech_prob = confidence["no_speech_prob"]
+        chars_per_second = confidence["chars_per_second"]
+        if avg_logprob is None:
+            return True, "borrador sin tokens"
+        if avg_logprob < self.min_avg_logprob:
+            return True, f"log-prob media {avg_logprob:.2f} < {self.min_avg_logprob}"
+        if no_speech_prob is not None and no_speech_prob > self.max_no_speech_prob:
+            return True, f"prob. de no-voz {no_speech_prob:.2f}"
+        # Mucha voz detectada y casi nada de texto: el borrador probablemente se la saltó
+        if chars_per_second is not None and speech_seconds >= 30 and chars_per_second < self.min_chars_per_second:
+            return True, f"{chars_per_second:.1f} caracteres por segundo de voz"
+        return False, f"log-prob media {avg_logprob:.2f}"
+
+    def record(self, escalated, draft_seconds, final_seconds=0.0):
+        with self._lock:
+            self.stats["chunks"] += 1
+            self.stats["escalated"] += int(escalated)
+            self.stats["draft_seconds"] += draft_seconds
+            self.stats["final_seconds"] += final_seconds
+
+    def log_summary(self):
+        stats = self.stats
+        if not self.enabled or not stats["chunks"]:
+            return
+        logger.info("=== CASCADA DE MODELOS ===")
+        logger.info(
+            f"{stats['escalated']}/{stats['chunks']} fragmentos repetidos con el modelo grande "
+            f"({stats['escalated'] / stats['chunks']:.0%})"
+        )
+        logger.info(
+            f"Inferencia: {stats['draft_seconds']:.1f}s de borrador + {stats['final_seconds']:.1f}s de modelo grande"
+        )
@@ -0,0 +1,137 @@
+"""
+Inventario de grabaciones sin descargarlas (modo catálogo).
+Para cada enlace resuelto se pide el tamaño con HEAD y los primeros KB del archivo con
+una petición Range: si el MP4 lleva el índice al principio, la caja mvhd da la duración
+exacta; si no, se estima con el tamaño y una tasa de bits típica. El inventario (JSON o
+CSV según la extensión) lo aceptan main_improved_v3.py --from-catalog y
+work_queue.py enqueue --catalog.
+"""
+
+import os
+import csv
+import json
+import logging
+from datetime import datetime
+
+from storage_manager import content_length
+from video_integrity import mvhd_duration
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FIELDS = ["course", "date", "link", "url", "bytes", "duration_seconds", "duration_source", "downloaded"]
+PROBE_PREFIX_BYTES = 64 * 1024  # ftyp + cabecera de moov + mvhd caben de sobra
+DEFAULT_VIDEO_KBPS = float(os.getenv("CATALOG_VIDEO_KBPS", "800"))
+
+
+def _size_from_content_range(value):
+    """Tamaño total de 'bytes 0-65535/123456' o 0 si no se conoce."""
+    try:
+        return int(value.rsplit("/", 1)[1])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+
+def probe_recording(policy, url, head_only=False, video_kbps=DEFAULT_VIDEO_KBPS):
+    """(bytes, duración en s, origen de la duración) de una grabación sin descargarla."""
+    size = 0
+    try:
+        response = policy.request("HEAD", url, allow_redirects=True)
+        if response.ok:
+            size = content_length(response.headers)
+        response.close()
+    except Exception as e:
+        # Algunas URL firmadas solo admiten GET: el Range de abajo da también el tamaño
+        logger.debug(f"HEAD fallido para {url}: {e}")
+
+    duration = None
+    if not head_only:
+        try:
+            response = policy.request(
+                "GET", url, stream=True, headers={"Range": f"bytes=0-{PROBE_PREFIX_BYTES - 1}"}
+            )
+            with response:
+                if response.ok:
+                    if not size:
+                        size = (_size_from_content_range(response.headers.get("Content-Range"))
+                                or (content_length(response.headers) if response.status_code == 200 else 0))
+                    # Sin soporte de Range el servidor manda el archivo entero: se leen solo los primeros KB
+                    prefix = b""
+                    for chunk in response.iter_content(chunk_size=16 * 1024):
+                        prefix += chunk
+                        if len(prefix) >= PROBE_PREFIX_BYTES:
+                            break
+                    duration = mvhd_duration(prefix)
+        except Exception as e:
+            logger.debug(f"Lectura parcial fallida para {url}: {e}")
+
+    if duration is not None:
+        return size, round(duration, 1), "mvhd"
+    if size and video_kbps:
+        return size, round(size * 8 / (video_kbps * 1000), 1), "bitrate"
+    return size, None, None
+
+
+def write_catalog(rows, path):
+    """Escribe el inventario de forma atómica; CSV si la extensión es .csv, JSON si no."""
+    tmp_path = f"{path}.tmp"
+    if str(path).lower().endswith(".csv"):
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CATALOG_FIELDS)
+            writer.writeheader()
+            writer.writerows({field: row.get(field) for field in CATALOG_FIELDS} for row in rows)
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"generated": datetime.now().isoformat(timespec="seconds"), "recordings": rows},
+                f, ensure_ascii=False, indent=2
+            )
+    os.replace(tmp_path, path)
+
+
+def read_catalog(path):
+    """Filas del inventario (JSON o CSV) con los tipos restaurados."""
+    if str(path).lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            row["bytes"] = int(row["bytes"] or 0)
+            row["duration_seconds"] = float(row["duration_seconds"]) if row["duration_seconds"] else None
+            row["duration_source"] = row["duration_source"] or None
+            row["downloaded"] = row["downloaded"] == "True"
+        return rows
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["recordings"] if isinstance(data, dict) else data
+
+
+def log_summary(rows, bandwidth_mbps=None, realtime_factor=None):
+    """Tabla por asignatura con grabaciones, GB y horas; y tiempos estimados si se conocen."""
+    by_course = {}
+    for row in rows:
+        stats = by_course.setdefault(row["course"], {"count": 0, "pending": 0, "bytes": 0, "seconds": 0.0})
+        stats["count"] += 1
+        if not row.get("downloaded"):
+            stats["pending"] += 1
+            stats["bytes"] += row.get("bytes") or 0
+            stats["seconds"] += row.get("duration_seconds") or 0.0
+
+    logger.info("=== CATÁLOGO DE GRABACIONES ===")
+    logger.info(f"{'Asignatura':<45} {'Total':<7} {'Pend.':<7} {'GB pend.':<10} {'Horas pend.':<10}")
+    for course, stats in by_course.items():
+        logger.info(
+            f"{course[:45]:<45} {stats['count']:<7} {stats['pending']:<7} "
+            f"{stats['bytes'] / 1e9:<10.1f} {stats['seconds'] / 3600:<10.1f}"
+        )
+    pending_bytes = sum(stats["bytes"] for stats in by_course.values())
+    pending_hours = sum(stats["seconds"] for stats in by_course.values()) / 3600
+    unknown = sum(1 for row in rows if not row.get("downloaded") and not row.get("bytes"))
+    logger.info(
+        f"📦 {len(rows)} grabaciones, {sum(s['pending'] for s in by_course.values())} pendientes: "
+        f"{pending_bytes / 1e9:.1f} GB y {pending_hours:.1f} h de audio"
+        + (f" ({unknown} sin tamaño conocido)" if unknown else "")
+    )
+    if bandwidth_mbps:
+        logger.info(f"⬇️ Descarga a {bandwidth_mbps:g} Mbit/s: ~{pending_bytes * 8 / (bandwidth_mbps * 1e6) / 3600:.1f} h")
+    if realtime_factor:
+        logger.info(f"📝 Transcripción a {realtime_factor:.1f}x tiempo real (perfil de autotune): "
+                    f"~{pending_hours / realtime_factor:.1f} h")
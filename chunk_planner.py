@@ -0,0 +1,185 @@
+"""
+Planificación de fragmentos de transcripción a partir de rasgos baratos del audio.
+Se decodifica el audio una vez (ffmpeg -> PCM por tubería) y por cada trama se calcula
+la energía y el flujo espectral. Los silencios largos por debajo de un umbral absoluto
+(SILENCE_DBFS: antes de clase, micrófono cortado) se aíslan como fragmentos sin voz que
+no pasan por Whisper; el resto se corta cerca de la duración objetivo en el punto más
+silencioso o de mayor cambio espectral (cambio de hablante o de diapositiva). El umbral
+relativo al ruido de fondo solo estima la voz de cada fragmento para repartir el trabajo
+(los más caros primero): nunca decide que un fragmento se deje sin transcribir.
+"""
+
+import logging
+import subprocess
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.1
+BLOCK_SECONDS = 60
+MIN_SILENCE_SECONDS = 30     # silencio mínimo para aislarlo como fragmento propio
+SILENCE_DBFS = -50           # por debajo (absoluto) una trama es silencio real, no voz baja
+VOICE_MARGIN_DB = 10         # margen sobre el ruido de fondo para estimar la voz (solo coste)
+MIN_SPEECH_RATIO = 0.05      # tramas audibles por debajo de esta fracción: fragmento silencioso
+CHUNK_OVERHEAD_SECONDS = 5   # coste fijo por fragmento (arranque de whisper-cli y carga del modelo)
+
+
+def analyze_audio(audio_path, frame_seconds=FRAME_SECONDS):
+    """Devuelve (energía en dB, flujo espectral) por trama, leyendo el PCM por bloques."""
+    frame = int(SAMPLE_RATE * frame_seconds)
+    block_bytes = frame * int(BLOCK_SECONDS / frame_seconds) * 2
+    cmd = [
+        "ffmpeg", "-v", "error", "-i", str(audio_path),
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"
+    ]
+    energies, fluxes = [], []
+    previous = None
+    leftover = b""
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as process:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % (frame * 2)
+            leftover = data[usable:]
+            if not usable:
+                continue
+            samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+            frames = samples.reshape(-1, frame)
+            energies.append(10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10))
+
+            # Flujo espectral: aumento positivo de la magnitud (log) respecto a la trama anterior
+            spectrum = np.log1p(np.abs(np.fft.rfft(frames * np.hanning(frame), axis=1)))
+            shifted = np.vstack([spectrum[:1] if previous is None else previous, spectrum[:-1]])
+            fluxes.append(np.maximum(spectrum - shifted, 0).sum(axis=1))
+            previous = spectrum[-1:]
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg no pudo decodificar {audio_path}")
+    if not energies:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+    return np.concatenate(energies), np.concatenate(fluxes)
+
+
+def _smooth(values, width):
+    if width <= 1 or len(values) < width:
+        return values
+    # Relleno con los valores del borde: con ceros el silencio inicial parecería tener voz
+    padded = np.pad(values, (width // 2, width - 1 - width // 2), mode="edge")
+    return np.convolve(padded, np.ones(width) / width, mode="valid")
+
+
+def _zscore(values):
+    std = values.std()
+    return (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+
+
+def _silent_runs(voiced, min_frames):
+    """Intervalos [inicio, fin) de tramas sin voz de al menos ``min_frames``."""
+    edges = np.diff(np.concatenate([[1], voiced.astype(np.int8), [1]]))
+    starts = np.flatnonzero(edges == -1)
+    ends = np.flatnonzero(edges == 1)
+    return [(s, e) for s, e in zip(starts, ends) if e - s >= min_frames]
+
+
+def plan_chunks(energy, flux, duration, target_seconds=300, frame_seconds=FRAME_SECONDS):
+    """Elige los cortes y devuelve fragmentos {index, start, end, speech, cost} en orden temporal."""
+    if not len(energy):
+        return fixed_chunks(duration, target_seconds)
+    smoothed = _smooth(energy, int(1 / frame_seconds))
+    # Silencio real con umbral absoluto: una voz cuyo volumen varía nunca baja de él
+    audible = smoothed > SILENCE_DBFS
+    # Estimación relativa de voz, solo para el coste (orden de envío a los workers)
+    voiced = smoothed > np.percentile(energy, 10) + VOICE_MARGIN_DB
+    # Puntuación de corte: bajo = buen sitio (silencio o cambio brusco de espectro)
+    window = int(2 / frame_seconds)
+    score = _zscore(_smooth(energy, window)) - 0.5 * _zscore(_smooth(flux, window))
+
+    min_frames = int(target_seconds * 0.5 / frame_seconds)
+    max_frames = int(target_seconds * 1.5 / frame_seconds)
+    target_frames = int(target_seconds / frame_seconds)
+    total_frames = len(energy)
+
+    # 1) Silencios largos como límites fijos; 2) cortes en las regiones con voz entre ellos
+    boundaries = [0]
+    regions = []
+    cursor = 0
+    for start, end in _silent_runs(audible, int(MIN_SILENCE_SECONDS / frame_seconds)):
+        regions.append((cursor, start))
+        cursor = end
+    regions.append((cursor, total_frames))
+    for region_start, region_end in regions:
+        position = region_start
+        while region_end - position > max_frames:
+            lo, hi = position + min_frames, min(position + max_frames, region_end - min_frames)
+            candidates = np.arange(lo, hi)
+            distance = np.abs(candidates - (position + target_frames)) / target_frames
+            position = int(candidates[np.argmin(score[lo:hi] + distance)])
+            boundaries.append(position)
+        if region_start > 0:
+            boundaries.append(region_start)
+        boundaries.append(region_end)
+    boundaries = sorted(set(b for b in boundaries if 0 <= b <= total_frames))
+    if boundaries[-1] < total_frames:
+        boundaries.append(total_frames)
+
+    chunks = []
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        if end <= start:
+            continue
+        speech = round(float(voiced[start:end].sum() * frame_seconds), 1)
+        silent = audible[start:end].mean() < MIN_SPEECH_RATIO
+        chunk_start = round(float(start * frame_seconds), 1)
+        chunk_end = round(float(min(end * frame_seconds, duration)), 1)
+        chunks.append(_chunk(len(chunks), chunk_start, chunk_end, speech, silent))
+    if chunks:
+        chunks[-1]["end"] = duration
+    return chunks
+
+
+def fixed_chunks(duration, chunk_duration=300):
+    """Fragmentos de duración fija (comportamiento clásico); se asume voz en todo el audio."""
+    chunks = []
+    start = 0.0
+    while start < duration:
+        end = min(start + chunk_duration, duration)
+        chunks.append(_chunk(len(chunks), start, end, end - start))
+        start = end
+    return chunks
+
+
+def _chunk(index, start, end, speech, silent=False):
+    return {
+        "index": index,
+        "start": start,
+        "end": end,
+        "speech": speech,
+        "silent": bool(silent),
+        # El coste de Whisper crece con la voz a decodificar, más un fijo por invocación
+        "cost": speech + CHUNK_OVERHEAD_SECONDS,
+    }
+
+
+def schedule(chunks):
+    """Orden de envío a los workers: primero los más caros (LPT), los silenciosos al final."""
+    return sorted(chunks, key=lambda chunk: (chunk["silent"], -chunk["cost"]))
+
+
+def plan_for_audio(audio_path, duration, target_seconds=300, mode="fixed"):
+    """Plan de fragmentos para un audio; vuelve a fragmentos fijos si el análisis falla."""
+    if mode != "adaptive":
+        return fixed_chunks(duration, target_seconds)
+    try:
+        energy, flux = analyze_audio(audio_path)
+        chunks = plan_chunks(energy, flux, duration, target_seconds)
+    except Exception as e:
+        logger.warning(f"Análisis de audio fallido ({e}); se usan fragmentos fijos de {target_seconds}s")
+        return fixed_chunks(duration, target_seconds)
+    silent = sum(1 for chunk in chunks if chunk["silent"])
+    logger.info(
+        f"Plan adaptativo: {len(chunks)} fragmentos "
+        f"({silent} silenciosos, {sum(c['end'] - c['start'] for c in chunks if c['silent']) / 60:.1f} min sin voz)"
+    )
+    return chunks
@@ -0,0 +1,118 @@
+"""
+Punto de entrada único del proyecto.
+Cada subcomando importa su módulo solo al ejecutarse: `status` no carga selenium, torch
+ni numpy y responde en milisegundos, útil para tareas cortas de cron.
+
+Uso:
+    python cli.py scrape
+    python cli.py transcribe videos/ audios/ transcripciones/ <whisper-cli> <modelo>
+    python cli.py bench --batch-sizes 1 4
+    python cli.py status
+    python cli.py <subcomando> -h
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# subcomando -> (módulo con main(argv), descripción)
+COMMANDS = {
+    "scrape": ("main_improved_v3", "Descarga las grabaciones con el .env y las constantes del script"),
+    "transcribe": ("transcriptor_videos", "Transcribe una carpeta de videos con whisper-cli"),
+    "bench": ("whisper_benchmark", "Benchmark del paquete whisper (modelos y tamaño de lote)"),
+    "autotune": ("autotune", "Busca la configuración más rápida de whisper-cli para esta máquina"),
+    "jobs": ("job_runner", "Ejecuta un archivo de trabajos TOML/YAML"),
+    "queue": ("work_queue", "Cola de transcripción compartida entre nodos"),
+    "index": ("transcript_index", "Índice de búsqueda de las transcripciones (build/search)"),
+    "segments": ("segment_store", "Consulta del almacén de segmentos"),
+}
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def status(argv=None):
+    """Resumen del estado a partir de los archivos persistentes, sin importar nada pesado."""
+    parser = argparse.ArgumentParser(prog="cli.py status", description="Estado de descargas y transcripciones")
+    parser.add_argument("--videos-root", default="videos", help="Raíz de los videos (por defecto videos)")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    videos_root = Path(args.videos_root)
+    videos = list(videos_root.glob("*/*.mp4")) if videos_root.exists() else []
+    courses = {video.parent.name for video in videos}
+    print(f"🎬 Videos: {len(videos)} en {len(courses)} asignaturas ({videos_root})")
+
+    ledger = _read_json(os.getenv("STORAGE_LEDGER", "retention_ledger.json")) or {}
+    hours = sum(entry.get("duration") or 0 for entry in ledger.values()) / 3600
+    print(f"📝 Transcripciones verificadas: {len(ledger)} ({hours:.1f} h)")
+
+    crawl = _read_json(os.getenv("CRAWL_STATE", "crawl_state.json")) or {}
+    for key, state in sorted(crawl.items()):
+        print(f"📅 {key}: hasta {state.get('high_water') or '—'}")
+
+    dedup = _read_json(os.getenv("DEDUP_INDEX", "content_index.json"))
+    if dedup:
+        print(f"♊ Contenidos únicos: {len(dedup.get('by_hash', {}))}, duplicados enlazados: "
+              f"{len(dedup.get('aliases', {}))}")
+
+    queue_path = Path(os.getenv("WORK_QUEUE", "work_queue.db"))
+    if queue_path.exists():
+        from work_queue import WorkQueue
+        queue = WorkQueue(queue_path)
+        try:
+            print("🖧 Cola: " + " · ".join(f"{state}: {n}" for state, n in queue.counts().items()))
+        finally:
+            queue.close()
+
+    progress_dir = os.getenv("PROGRESS_DIR", "progress")
+    if progress_dir and Path(progress_dir).exists():
+        from progress_status import read_states, describe
+        for state in read_states(progress_dir).values():
+            print(f"⏳ {describe(state)}")
+
+    index_path = Path(os.getenv("TRANSCRIPT_INDEX", "transcripts_index.db"))
+    if index_path.exists():
+        from transcript_index import TranscriptIndex
+        index = TranscriptIndex(index_path)
+        try:
+            stats = index.stats()
+        finally:
+            index.close()
+        print(f"🔎 Índice: {stats['lectures']} clases, {stats['segments']} segmentos, {stats['hours']:.1f} h")
+    return True
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    epilog = "\n".join(f"  {name:<11} {description}" for name, (_, description) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Scraping y transcripción de clases de Blackboard",
+        epilog=f"subcomandos:\n{epilog}\n  {'status':<11} Estado de descargas, transcripciones, progreso, cola e índice",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=list(COMMANDS) + ["status"], metavar="subcomando")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Argumentos del subcomando (ver <subcomando> -h)")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        return status(args.args)
+
+    import importlib
+    module_name, _ = COMMANDS[args.command]
+    sys.argv[0] = f"cli.py {args.command}"  # el -h del subcomando muestra cómo invocarlo desde aquí
+    module = importlib.import_module(module_name)
+    return module.main(args.args) is not False
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
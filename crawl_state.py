@@ -0,0 +1,127 @@
+"""
+Estado del rastreo incremental por asignatura.
+Guarda una marca de agua (fecha de la grabación más reciente ya descargada) y los
+enlaces conocidos cercanos a ella, para que las siguientes ejecuciones estrechen el
+filtro de fechas y dejen de paginar en cuanto aparezcan grabaciones ya vistas.
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlState:
+    """Marcas de agua por asignatura persistidas en un JSON."""
+
+    def __init__(self, state_path="crawl_state.json", overlap_days=1, enabled=True):
+        self.state_path = Path(state_path)
+        self.overlap_days = overlap_days
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._courses = self._load()
+
+    @classmethod
+    def from_env(cls):
+        """CRAWL_STATE (ruta), CRAWL_OVERLAP_DAYS y CRAWL_INCREMENTAL (0 = rastreo completo)."""
+        return cls(
+            state_path=os.getenv("CRAWL_STATE", "crawl_state.json"),
+            overlap_days=int(os.getenv("CRAWL_OVERLAP_DAYS", "1")),
+            enabled=os.getenv("CRAWL_INCREMENTAL", "1") != "0",
+        )
+
+    def start_date_for(self, course_name, default_start):
+        """Fecha de inicio del filtro: la marca de agua menos el solape, sin bajar de default_start."""
+        if not self.enabled:
+            return default_start
+        with self._lock:
+            high_water = self._courses.get(course_name, {}).get("high_water")
+        if not high_water:
+            return default_start
+        narrowed = (date.fromisoformat(high_water) - timedelta(days=self.overlap_days)).isoformat()
+        return max(default_start, narrowed)
+
+    def is_known(self, course_name, link):
+        """True si la grabación ya se descargó en una ejecución anterior."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            return link in self._courses.get(course_name, {}).get("known", {})
+
+    def is_settled(self, course_name, detail):
+        """True si la grabación es conocida y no es posterior a la marca de agua.
+
+        Todo lo anterior a la marca se descargó bien, así que en un listado ordenado
+        de más reciente a más antigua se puede dejar de paginar al encontrarla.
+        """
+        if not self.is_known(course_name, detail["link"]):
+            return False
+        with self._lock:
+            high_water = self._courses[course_name].get("high_water")
+        return bool(high_water) and detail["date"] <= high_water
+
+    def was_downloaded(self, course_name, detail):
+        """Como is_settled pero también con el rastreo incremental desactivado (modo catálogo)."""
+        with self._lock:
+            course = self._courses.get(course_name, {})
+            high_water = course.get("high_water")
+            return detail["link"] in course.get("known", {}) or bool(high_water and detail["date"] <= high_water)
+
+    def remember(self, course_name, succeeded):
+        """Marca como conocidas grabaciones descargadas fuera del listado sin mover la marca de agua.
+
+        Un inventario puede tener huecos (filas quitadas a mano): avanzar la marca daría
+        por descargado lo que falta. El siguiente rastreo las omitirá por enlace conocido.
+        """
+        if not succeeded:
+            return
+        with self._lock:
+            course = self._courses.setdefault(course_name, {"high_water": None, "known": {}})
+            course["known"].update({d["link"]: d["date"] for d in succeeded})
+            self._save()
+
+    def update(self, course_name, succeeded, failed=()):
+        """Avanza la marca de agua con las grabaciones descargadas.
+
+        Si alguna falló, la marca no supera el día anterior al fallo más antiguo,
+        de modo que la siguiente ejecución la vuelva a intentar.
+        """
+        if not succeeded:
+            return
+        with self._lock:
+            course = self._courses.setdefault(course_name, {"high_water": None, "known": {}})
+            high_water = max([course["high_water"] or ""] + [d["date"] for d in succeeded])
+            if failed:
+                oldest_failed = min(d["date"] for d in failed)
+                high_water = min(high_water, (date.fromisoformat(oldest_failed) - timedelta(days=1)).isoformat())
+            course["high_water"] = high_water or None
+
+            # Solo hace falta recordar los enlaces que volverán a aparecer dentro del solape
+            window_start = ""
+            if course["high_water"]:
+                window_start = (date.fromisoformat(course["high_water"]) - timedelta(days=self.overlap_days)).isoformat()
+            known = {link: day for link, day in course["known"].items() if day >= window_start}
+            known.update({d["link"]: d["date"] for d in succeeded if d["date"] >= window_start})
+            course["known"] = known
+            self._save()
+        logger.info(f"Marca de agua de {course_name}: {course['high_water']}")
+
+    def _load(self):
+        if not self.state_path.exists():
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Estado de rastreo ilegible ({e}); se hará un rastreo completo")
+            return {}
+
+    def _save(self):
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._courses, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
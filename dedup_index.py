@@ -0,0 +1,150 @@
+"""
+Índice de contenido para deduplicar grabaciones descargadas.
+El hash se calcula mientras se descarga (sin segunda lectura) y el hash completo
+decide qué es un duplicado. Con DEDUP_EARLY_ABORT=1, si el tamaño y los primeros MB
+coinciden y el final (pedido con Range) también, se corta la transferencia; ese
+duplicado queda anotado como no confirmado en el manifiesto. Los duplicados pasan a
+ser enlaces duros o, si el sistema de archivos no lo permite, referencias.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PREFIX_BYTES = 4 * 1024 * 1024
+TAIL_BYTES = 4 * 1024 * 1024  # final comparado antes de cortar una descarga por duplicada
+
+
+class StreamingHasher:
+    """SHA-256 completo y de prefijo, alimentado con los mismos bloques de la descarga."""
+
+    def __init__(self, prefix_bytes=PREFIX_BYTES):
+        self.prefix_bytes = prefix_bytes
+        self.full = hashlib.sha256()
+        self.prefix = hashlib.sha256()
+        self.size = 0
+
+    def update(self, chunk):
+        self.full.update(chunk)
+        if self.size < self.prefix_bytes:
+            self.prefix.update(chunk[:self.prefix_bytes - self.size])
+        self.size += len(chunk)
+
+    @property
+    def prefix_done(self):
+        return self.size >= self.prefix_bytes
+
+    def prefix_key(self, total_size):
+        """Clave de duplicado temprano: tamaño total anunciado + hash del prefijo."""
+        return f"{total_size}:{self.prefix.hexdigest()}"
+
+    def hexdigest(self):
+        return self.full.hexdigest()
+
+
+def tail_digest(path, tail_bytes=TAIL_BYTES):
+    """SHA-256 de los últimos ``tail_bytes`` de un archivo en disco."""
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        f.seek(max(0, f.tell() - tail_bytes))
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class ContentHashIndex:
+    """Manifiesto JSON sha256 -> archivo canónico, con alias de los duplicados."""
+
+    def __init__(self, index_path="content_index.json", prefix_bytes=PREFIX_BYTES, early_abort=False):
+        self.index_path = Path(index_path)
+        self.prefix_bytes = prefix_bytes
+        self.early_abort = early_abort
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    @classmethod
+    def from_env(cls):
+        """DEDUP_INDEX (ruta del manifiesto) y DEDUP_EARLY_ABORT (1 para cortar pronto los duplicados)."""
+        return cls(
+            index_path=os.getenv("DEDUP_INDEX", "content_index.json"),
+            early_abort=os.getenv("DEDUP_EARLY_ABORT", "0") == "1",
+        )
+
+    def new_hasher(self):
+        return StreamingHasher(self.prefix_bytes)
+
+    def find_by_prefix(self, prefix_key):
+        """Archivo canónico existente con el mismo tamaño y prefijo, o None."""
+        if not self.early_abort:
+            return None
+        with self._lock:
+            digest = self._data["by_prefix"].get(prefix_key)
+            entry = self._data["by_hash"].get(digest) if digest else None
+        if entry and os.path.exists(entry["path"]):
+            return entry["path"]
+        return None
+
+    def canonical_for(self, path):
+        """Archivo canónico al que apunta un alias del manifiesto (o None)."""
+        with self._lock:
+            return self._data["aliases"].get(os.path.realpath(path))
+
+    def register(self, path, hasher, total_size):
+        """Registra una descarga completa; si ya existía el contenido la convierte en duplicado.
+
+        Devuelve la ruta canónica cuando ``path`` resultó ser un duplicado, o None.
+        """
+        digest = hasher.hexdigest()
+        path = os.path.realpath(path)
+        with self._lock:
+            entry = self._data["by_hash"].get(digest)
+            if entry and entry["path"] != path and os.path.exists(entry["path"]):
+                canonical = entry["path"]
+            else:
+                canonical = None
+                self._data["by_hash"][digest] = {"path": path, "size": hasher.size}
+                self._data["by_prefix"][hasher.prefix_key(total_size or hasher.size)] = digest
+                self._save()
+
+        if canonical:
+            os.remove(path)
+            self.link_duplicate(canonical, path)
+        return canonical
+
+    def link_duplicate(self, canonical, path, confirmed=True):
+        """Materializa ``path`` como enlace duro a ``canonical`` o, si falla, como alias.
+
+        ``confirmed=False`` (corte temprano: solo tamaño, principio y final) se anota aparte.
+        """
+        path = os.path.realpath(path)
+        try:
+            os.link(canonical, path)
+            logger.info(f"🔗 Duplicado enlazado: {os.path.basename(path)} -> {canonical}")
+        except OSError as e:
+            logger.info(f"🔗 Duplicado registrado como referencia ({e}): {path} -> {canonical}")
+        with self._lock:
+            self._data["aliases"][path] = canonical
+            if confirmed:
+                self._data["unconfirmed"].pop(path, None)
+            else:
+                self._data["unconfirmed"][path] = canonical
+            self._save()
+
+    def _load(self):
+        data = {"by_hash": {}, "by_prefix": {}, "aliases": {}, "unconfirmed": {}}
+        if self.index_path.exists():
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Índice de contenido ilegible ({e}); se empieza uno nuevo")
+        return data
+
+    def _save(self):
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,78 @@
+"""
+Bloqueo exclusivo entre procesos sobre un archivo ``.lock``.
+Lo usan los registros JSON y el almacén de segmentos, que escriben a la vez el scraper,
+el transcriptor, el modo vigilancia y los workers de la cola. En POSIX se usa flock y en
+Windows msvcrt.locking; el bloqueo se libera solo si el proceso muere.
+"""
+
+import os
+import time
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.05
+
+
+class FileLockTimeout(Exception):
+    """No se obtuvo el bloqueo en el tiempo indicado."""
+
+
+class FileLock:
+    """``with FileLock(ruta):`` espera (o hasta ``timeout`` segundos) a tener el bloqueo exclusivo."""
+
+    def __init__(self, path, timeout=None):
+        self.path = str(path)
+        self.timeout = timeout
+        self._fd = None
+
+    def _try_lock(self, fd):
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        started = time.monotonic()
+        logged = False
+        while not self._try_lock(fd):
+            if self.timeout is not None and time.monotonic() - started >= self.timeout:
+                os.close(fd)
+                raise FileLockTimeout(f"{self.path} sigue bloqueado tras {self.timeout:.0f}s")
+            if not logged and time.monotonic() - started >= 5:
+                logger.info(f"⏳ Esperando el bloqueo de {self.path} (lo tiene otro proceso)")
+                logged = True
+            time.sleep(POLL_SECONDS)
+        self._fd = fd
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
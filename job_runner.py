@@ -0,0 +1,294 @@
+"""
+Ejecución de varios trabajos (cuentas × asignaturas × ventanas de fechas) en un solo proceso.
+Los trabajos se declaran en un archivo TOML o YAML; las credenciales nunca van en el archivo,
+solo los nombres de las variables de entorno que las contienen. Cada cuenta reutiliza un
+único navegador y login para todas sus asignaturas y ventanas, y las métricas, la política
+de peticiones y los índices persistentes se comparten entre cuentas. Una cola de prioridad
+hace que las ventanas y clases más recientes se procesen primero.
+"""
+
+import os
+import heapq
+import logging
+import argparse
+from datetime import date
+from pathlib import Path
+
+from dotenv import load_dotenv
+from logging_setup import setup_logging, log_context
+from profiling import add_profile_arguments, create_profiler
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+load_dotenv()
+
+setup_logging('job_runner.log')
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACCOUNT = {"url_env": "BLACKBOARD_URL", "user_env": "BLACKBOARD_USER", "pass_env": "BLACKBOARD_PASS"}
+
+
+# --- CARGA DE LA CONFIGURACIÓN ---
+def load_job_config(path):
+    """Lee un archivo .toml, .yaml o .yml y valida su estructura."""
+    path = Path(path)
+    if path.suffix == ".toml":
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    elif path.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Para configuraciones YAML instala PyYAML (pip install pyyaml) o usa TOML")
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+    else:
+        raise ValueError(f"Formato de configuración no soportado: {path.suffix} (usa .toml, .yaml o .yml)")
+
+    config.setdefault("defaults", {})
+    config.setdefault("accounts", {})
+    config.setdefault("jobs", [])
+    if not config["jobs"]:
+        raise ValueError(f"{path} no declara ningún trabajo en [[jobs]]")
+    for job in config["jobs"]:
+        account = job.get("account", "default")
+        if account != "default" and account not in config["accounts"]:
+            raise ValueError(f"Trabajo '{job.get('name', '?')}': cuenta desconocida '{account}'")
+        if not job.get("courses"):
+            raise ValueError(f"Trabajo '{job.get('name', '?')}': falta la lista de asignaturas")
+        if not job.get("windows") and not ("start" in config["defaults"] and "end" in config["defaults"]):
+            raise ValueError(f"Trabajo '{job.get('name', '?')}': sin ventanas ni start/end en [defaults]")
+        for window in job.get("windows", []):
+            if date.fromisoformat(str(window["start"])) > date.fromisoformat(str(window["end"])):
+                raise ValueError(f"Trabajo '{job.get('name', '?')}': ventana {window} con inicio posterior al fin")
+    return config
+
+
+def account_credentials(config, account):
+    """Resuelve URL, usuario y contraseña de una cuenta a partir de sus variables de entorno."""
+    spec = {**DEFAULT_ACCOUNT, **config["accounts"].get(account, {})}
+    credentials = {
+        "blackboard_url": spec.get("url") or os.getenv(spec["url_env"]),
+        "username": os.getenv(spec["user_env"]),
+        "password": os.getenv(spec["pass_env"]),
+    }
+    missing = [spec[key] for key, field in (("url_env", "blackboard_url"), ("user_env", "username"),
+                                            ("pass_env", "password")) if not credentials[field]]
+    if missing:
+        raise EnvironmentError(f"❌ Cuenta '{account}': faltan variables de entorno {', '.join(missing)}")
+    return credentials
+
+
+def expand_tasks(config):
+    """Expande los trabajos en tareas (cuenta, asignatura, ventana) con su prioridad."""
+    defaults = config["defaults"]
+    tasks = []
+    for job in config["jobs"]:
+        windows = job.get("windows") or [{"start": defaults["start"], "end": defaults["end"]}]
+        for window in windows:
+            for course_name in job["courses"]:
+                tasks.append({
+                    "job": job.get("name", "sin nombre"),
+                    "account": job.get("account", "default"),
+                    "course": course_name,
+                    "start": str(window["start"]),
+                    "end": str(window["end"]),
+                    "priority": job.get("priority", defaults.get("priority", 0)),
+                    "max_videos": job.get("max_videos_per_course", defaults.get("max_videos_per_course")),
+                    "transcribe": job.get("transcribe", defaults.get("transcribe", True)),
+                })
+    return tasks
+
+
+def task_sort_key(task):
+    """Mayor prioridad primero y, a igual prioridad, la ventana que termina más tarde."""
+    return (-task["priority"], -date.fromisoformat(task["end"]).toordinal(), task["start"], task["course"])
+
+
+def lecture_date(video_path):
+    """Fecha de la clase según el nombre del archivo (AAAA-MM-DD[_n].mp4) o su mtime."""
+    try:
+        return date.fromisoformat(video_path.stem[:10])
+    except ValueError:
+        return date.fromtimestamp(video_path.stat().st_mtime)
+
+
+# --- EJECUCIÓN ---
+class JobRunner:
+    """Ejecuta las tareas de scraping por cuenta y después la cola de transcripción."""
+
+    def __init__(self, config, profiler=None):
+        self.config = config
+        self.defaults = config["defaults"]
+        self.tasks = expand_tasks(config)
+        self.videos_root = self.defaults.get("videos_root", "videos")
+        self.profiler = profiler or create_profiler()
+
+    def run_scraping(self):
+        """Una sesión de navegador por cuenta; las cuentas con tareas más prioritarias van antes."""
+        from main_improved_v3 import ImprovedVideoScraperV3
+        from pipeline_metrics import PipelineMetrics
+        from progress_status import ProgressStatus
+        from storage_manager import StorageManager
+        from request_policy import RequestPolicy
+        from dedup_index import ContentHashIndex
+        from crawl_state import CrawlState
+
+        # Recursos compartidos: un único proceso escribe cada índice y la tasa por host es común
+        settings = self.config.get("transcribe") or {}
+        shared = {
+            "metrics": PipelineMetrics.from_env("scraper"),
+            "progress": ProgressStatus.from_env("scraper", "bytes"),
+            "storage": StorageManager.from_env(),
+            "policy": RequestPolicy.from_env(),
+            "dedup": ContentHashIndex.from_env(),
+            "crawl_state": CrawlState.from_env(),
+        }
+        if settings.get("stream_audio"):
+            # El audio se extrae durante la descarga, en la misma carpeta que leerá el transcriptor
+            shared["audio_root"] = settings.get("audios_root", "audios")
+            shared["audio_format"] = settings.get("audio_format")
+
+        by_account = {}
+        for task in self.tasks:
+            by_account.setdefault(task["account"], []).append(task)
+        queue = [(min(task_sort_key(t) for t in tasks), account) for account, tasks in by_account.items()]
+        heapq.heapify(queue)
+
+        ok = True
+        try:
+            while queue:
+                _, account = heapq.heappop(queue)
+                ok = self._scrape_account(ImprovedVideoScraperV3, account, by_account[account], shared) and ok
+        finally:
+            shared["metrics"].close()
+            shared["progress"].close()
+        return ok
+
+    def _scrape_account(self, scraper_cls, account, tasks, shared):
+        logger.info(f"=== CUENTA {account}: {len(tasks)} tareas ===")
+        try:
+            scraper = scraper_cls(
+                **account_credentials(self.config, account), videos_root=self.videos_root, **shared
+            )
+        except EnvironmentError as e:
+            logger.error(str(e))
+            return False
+
+        # Varias cuentas en la misma ventana no comparten marca de agua
+        multi_account = len({t["account"] for t in self.tasks}) > 1
+        queue = [(task_sort_key(task), n, task) for n, task in enumerate(tasks)]
+        heapq.heapify(queue)
+        try:
+            if not scraper.start_session():
+                return False
+            total = len(queue)
+            for i in range(total):
+                _, _, task = heapq.heappop(queue)
+                crawl_key = f"{task['course']}@{task['start']}..{task['end']}"
+                if multi_account:
+                    crawl_key = f"{account}:{crawl_key}"
+                with log_context(job=task["job"], course=task["course"]):
+                    scraper.process_course(
+                        i, total, task["course"], task["start"], task["end"],
+                        crawl_key=crawl_key, max_videos=task["max_videos"]
+                    )
+            return True
+        except Exception as e:
+            logger.error(f"Error en la cuenta {account}: {e}")
+            return False
+        finally:
+            scraper.close()
+
+    def run_transcription(self):
+        """Transcribe las clases pendientes de todas las tareas, de la más reciente a la más antigua.
+
+        Un único transcriptor por asignatura (mismas rutas de salida) y una sola instancia
+        de whisper-cli a la vez: la GPU y el modelo no se reparten entre procesos.
+        """
+        from transcriptor_videos import (
+            WhisperTranscriberVulkan, DEFAULT_AUDIO_FORMAT, DEFAULT_CHUNKING
+        )
+        from pipeline_metrics import PipelineMetrics
+        from progress_status import ProgressStatus
+        from storage_manager import StorageManager
+        from transcript_index import TranscriptIndex
+        from segment_store import SegmentStore
+
+        settings = self.config.get("transcribe")
+        if not settings:
+            logger.warning("Sin sección [transcribe]: no se transcribe nada")
+            return True
+
+        priorities = {}
+        for task in self.tasks:
+            if task["transcribe"]:
+                priorities[task["course"]] = max(priorities.get(task["course"], task["priority"]), task["priority"])
+
+        metrics = PipelineMetrics.from_env("transcriber")
+        progress = ProgressStatus.from_env("transcriber", "audio_seconds")
+        storage = StorageManager.from_env()
+        index = TranscriptIndex.from_env()
+        segments = SegmentStore.from_env()
+        queue = []
+        for course_name, priority in priorities.items():
+            for video_path in (Path(self.videos_root) / course_name).glob("*.mp4"):
+                if storage.is_transcribed(video_path):
+                    continue
+                heapq.heappush(queue, (-priority, -lecture_date(video_path).toordinal(), str(video_path), course_name))
+
+        logger.info(f"{len(queue)} clases pendientes de transcribir")
+        progress.add_total(len(queue))
+        transcribers = {}
+        try:
+            while queue:
+                _, _, video_path, course_name = heapq.heappop(queue)
+                if course_name not in transcribers:
+                    transcribers[course_name] = WhisperTranscriberVulkan(
+                        Path(self.videos_root) / course_name,
+                        Path(settings.get("audios_root", "audios")) / course_name,
+                        Path(settings.get("transcripts_root", "transcripciones")) / course_name,
+                        settings["whisper_cli"], settings["model"],
+                        profiler=self.profiler,
+                        audio_format=settings.get("audio_format", DEFAULT_AUDIO_FORMAT),
+                        chunking=settings.get("chunking", DEFAULT_CHUNKING),
+                        workers=settings.get("workers"),
+                        draft_model_path=settings.get("draft_model"),
+                        metrics=metrics, storage=storage, index=index, segments=segments,
+                        progress=progress,
+                    )
+                progress.item_done(bool(transcribers[course_name].process_video(video_path)))
+        finally:
+            for transcriber in transcribers.values():
+                transcriber.log_audio_tradeoff()
+                transcriber.cascade.log_summary()
+            metrics.close()
+            progress.close()
+            index.close()
+        return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta los trabajos de un archivo de configuración")
+    parser.add_argument("config", help="Archivo de trabajos (.toml, .yaml o .yml)")
+    parser.add_argument(
+        "--only", choices=["scrape", "transcribe"],
+        help="Ejecutar solo la descarga o solo la transcripción"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    runner = JobRunner(load_job_config(args.config), profiler=create_profiler(args.profile, args.profile_dir))
+    ok = True
+    if args.only != "transcribe":
+        ok = runner.run_scraping()
+    if args.only != "scrape":
+        ok = runner.run_transcription() and ok
+    return ok
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
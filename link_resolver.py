@@ -0,0 +1,160 @@
+"""
+Resolución de enlaces de descarga en lote, fuera de la pestaña del listado.
+Cada lote lanza la navegación de varias pestañas a la vez (el navegador las carga en
+paralelo) y luego lee el <source> del reproductor de cada una. Si la página del
+reproductor llega renderizada por HTTP, se usa una sesión ligera con las cookies del
+navegador y no se abre ninguna pestaña.
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+logger = logging.getLogger(__name__)
+
+PLAYER_SOURCE_XPATH = "//video[@id='player-overlay']//source"
+
+
+class LinkResolverPool:
+    """Pool de pestañas (y sesión HTTP opcional) para resolver muchas URLs de sesión."""
+
+    def __init__(self, driver, policy, metrics, size=4, timeout=15, http_mode="auto"):
+        self.driver = driver
+        self.policy = policy
+        self.metrics = metrics
+        self.size = size
+        self.timeout = timeout
+        # "auto": se prueba HTTP con la primera URL y se decide; "on"/"off" lo fuerzan
+        self.http_mode = {"on": True, "off": False}.get(http_mode)
+        self.listing_handle = None
+        self._tabs = []
+
+    @classmethod
+    def from_env(cls, driver, policy, metrics):
+        """LINK_RESOLVER_TABS, LINK_RESOLVER_TIMEOUT y LINK_RESOLVER_HTTP (auto/on/off)."""
+        return cls(
+            driver, policy, metrics,
+            size=int(os.getenv("LINK_RESOLVER_TABS", "4")),
+            timeout=float(os.getenv("LINK_RESOLVER_TIMEOUT", "15")),
+            http_mode=os.getenv("LINK_RESOLVER_HTTP", "auto"),
+        )
+
+    def resolve_many(self, session_urls):
+        """Devuelve {url_sesión: url_descarga o None}, reintentando las que fallen."""
+        pending = list(dict.fromkeys(session_urls))
+        resolved = {}
+        if not pending:
+            return resolved
+
+        with self.metrics.stage("link_resolution", urls=len(pending)) as stage:
+            if self.http_mode is None:
+                self.http_mode = self._probe_http(pending[0], resolved)
+                pending = [url for url in pending if url not in resolved]
+
+            for attempt in range(self.policy.max_retries + 1):
+                if not pending:
+                    break
+                if self.http_mode:
+                    resolved.update(self._resolve_http(pending))
+                else:
+                    for start in range(0, len(pending), self.size):
+                        resolved.update(self._resolve_tabs(pending[start:start + self.size]))
+                pending = [url for url in pending if not resolved.get(url)]
+                if pending and attempt < self.policy.max_retries:
+                    logger.warning(f"{len(pending)} enlaces sin resolver, reintentando ({attempt + 1})")
+                    self.policy.backoff(attempt)
+
+            if pending:
+                stage.fail()
+                logger.error(f"No se pudieron resolver {len(pending)} enlaces de descarga")
+        return {url: resolved.get(url) for url in session_urls}
+
+    # --- PESTAÑAS ---
+    def _ensure_tabs(self, count):
+        """Abre pestañas hasta tener ``count``; la pestaña del listado no se toca."""
+        if self.listing_handle is None:
+            self.listing_handle = self.driver.current_window_handle
+        open_handles = set(self.driver.window_handles)
+        self._tabs = [handle for handle in self._tabs if handle in open_handles]
+        while len(self._tabs) < count:
+            self.driver.switch_to.new_window('tab')
+            self._tabs.append(self.driver.current_window_handle)
+        self.driver.switch_to.window(self.listing_handle)
+
+    def _resolve_tabs(self, batch):
+        """Lanza todas las navegaciones del lote y después recoge cada resultado."""
+        self._ensure_tabs(len(batch))
+        results = {}
+        try:
+            # 1) Arrancar las cargas sin esperar (location.href no bloquea como driver.get)
+            for handle, url in zip(self._tabs, batch):
+                self.policy.host(url).bucket.acquire()
+                self.driver.switch_to.window(handle)
+                self.driver.execute_script("window.location.href = arguments[0];", url)
+
+            # 2) Recoger el src de cada pestaña; la espera de una solapa la carga de las demás
+            started = time.monotonic()
+            for handle, url in zip(self._tabs, batch):
+                host = self.policy.host(url)
+                self.driver.switch_to.window(handle)
+                try:
+                    element = WebDriverWait(self.driver, self.timeout).until(
+                        EC.presence_of_element_located((By.XPATH, PLAYER_SOURCE_XPATH))
+                    )
+                    results[url] = element.get_attribute("src") or None
+                    host.breaker.record_success()
+                except Exception as e:
+                    logger.warning(f"Error obteniendo enlace de descarga: {e}")
+                    results[url] = None
+                    host.breaker.record_failure()
+                host.on_response(time.monotonic() - started)
+        finally:
+            self.driver.switch_to.window(self.listing_handle)
+        return results
+
+    # --- SESIÓN HTTP LIGERA ---
+    def _cookies(self):
+        return {c["name"]: c["value"] for c in self.driver.get_cookies()}
+
+    def _fetch_source(self, url, cookies):
+        try:
+            response = self.policy.request("GET", url, cookies=cookies)
+            response.raise_for_status()
+        except Exception as e:
+            logger.debug(f"Resolución HTTP fallida para {url}: {e}")
+            return None
+        source = BeautifulSoup(response.text, "html.parser").select_one("video#player-overlay source[src]")
+        return source["src"] if source else None
+
+    def _probe_http(self, url, resolved):
+        """Prueba una URL por HTTP: si el reproductor llega renderizado se usa ese modo."""
+        src = self._fetch_source(url, self._cookies())
+        if src:
+            resolved[url] = src
+            logger.info("Resolución de enlaces por HTTP (sin pestañas)")
+            return True
+        logger.info(f"Resolución de enlaces con {self.size} pestañas en paralelo")
+        return False
+
+    def _resolve_http(self, urls):
+        cookies = self._cookies()
+        with ThreadPoolExecutor(max_workers=self.size) as pool:
+            return dict(zip(urls, pool.map(lambda url: self._fetch_source(url, cookies), urls)))
+
+    def close(self):
+        """Cierra las pestañas del pool y vuelve al listado."""
+        for handle in self._tabs:
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception:
+                pass
+        self._tabs = []
+        if self.listing_handle:
+            self.driver.switch_to.window(self.listing_handle)
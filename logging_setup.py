@@ -0,0 +1,155 @@
+"""
+Configuración de logging compartida por todos los scripts.
+Los registros pasan por una cola y un QueueListener en segundo plano, de modo que
+la escritura a disco no bloquea los bucles de scraping/transcripción. El archivo se
+escribe en JSON Lines con el contexto del worker (asignatura, video, fragmento).
+"""
+
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_log_context = contextvars.ContextVar("log_context", default={})
+_listener = None
+_config = None
+
+
+@contextmanager
+def log_context(**fields):
+    """Añade campos (course, video, chunk...) a todos los registros emitidos dentro del bloque."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copia el contexto actual al registro en el hilo que lo emite (antes de encolarlo)."""
+
+    def filter(self, record):
+        record.context = _log_context.get()
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Un objeto JSON por línea, con el contexto del worker como campos de primer nivel."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "process": record.processName,
+            "thread": record.threadName,
+        }
+        entry.update(getattr(record, "context", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text  # ya formateada por StructuredQueueHandler
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """QueueHandler que formatea la excepción en ``exc_text`` en lugar de pegarla al mensaje.
+
+    QueueHandler.prepare descarta ``exc_info`` (no se puede encolar entre hilos con
+    seguridad), así que sin esto el campo "exc" del JSON nunca se rellenaba.
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class TqdmStreamHandler(logging.StreamHandler):
+    """Handler de consola que escribe con tqdm.write para no romper las barras de progreso."""
+
+    def emit(self, record):
+        try:
+            from tqdm import tqdm
+        except ImportError:
+            super().emit(record)
+            return
+        try:
+            tqdm.write(self.format(record), file=self.stream)
+        except Exception:
+            self.handleError(record)
+
+
+def setup_logging(log_file, level=logging.INFO, log_format=None, console=True):
+    """Sustituye a logging.basicConfig: cola + listener asíncrono con salida JSON Lines.
+
+    ``log_format`` acepta "json" (por defecto, o LOG_FORMAT) o "text" para el archivo.
+    La consola mantiene siempre el formato de texto legible.
+    """
+    global _listener, _config
+    log_format = (log_format or os.getenv("LOG_FORMAT", "json")).lower()
+    config = (os.path.abspath(log_file), level, log_format, console)
+    if _listener is not None:
+        # La primera configuración del proceso manda (p. ej. job_runner antes que el scraper)
+        if config != _config:
+            logging.getLogger(__name__).warning(
+                f"Logging ya configurado ({_config[0]}, nivel {logging.getLevelName(_config[1])}, "
+                f"{_config[2]}); se ignora setup_logging({log_file!r}, nivel {logging.getLevelName(level)}, {log_format})"
+            )
+        return _listener
+
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    if log_format == "json":
+        file_handler.setFormatter(JsonLinesFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers = [file_handler]
+
+    if console:
+        console_handler = TqdmStreamHandler(sys.stderr)
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _config = config
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Vacía la cola y detiene el listener (se llama automáticamente al salir)."""
+    global _listener, _config
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _config = None
@@ -5,17 +5,33 @@ Versión con selectores más robustos y manejo mejorado de errores.
 
 import os
 import time
+import hashlib
 import logging
+import argparse
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-from urllib.parse import urljoin
+from urllib.parse import urljoin, quote
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
+from pipeline_metrics import PipelineMetrics, timed_stage
+from progress_status import ProgressStatus
+from logging_setup import setup_logging, log_context
+from storage_manager import StorageManager, content_length, DEFAULT_VIDEO_BYTES
+from request_policy import RequestPolicy
+from dedup_index import ContentHashIndex, TAIL_BYTES, tail_digest
+from crawl_state import CrawlState
+from link_resolver import LinkResolverPool
+from audio_stream import StreamingAudioExtractor, AUDIO_FORMATS
+from video_integrity import Mp4BoxScanner, DownloadIntegrityError, expected_md5, etag_md5, verify_download
+from catalog import probe_recording, write_catalog, read_catalog, log_summary
 
 # === CARGAR VARIABLES DE ENTORNO ===
 load_dotenv()
@@ -24,9 +40,7 @@ BLACKBOARD_URL = os.getenv("BLACKBOARD_URL")
 USERNAME = os.getenv("BLACKBOARD_USER")
 PASSWORD = os.getenv("BLACKBOARD_PASS")
 
-if not all([BLACKBOARD_URL, USERNAME, PASSWORD]):
-    raise EnvironmentError("❌ Variables de entorno incompletas. Verifica tu archivo .env")
-
+# Valores por defecto de una ejecución simple; job_runner.py los sustituye por los de cada trabajo
 # Lista de prueba: solo las primeras 3 asignaturas
 COURSE_NAMES = [
     "01MBID_04_A_2025-26_Fundamentos de la tecnología Big Data",
@@ -58,24 +72,70 @@ START_DATE = "2025-01-01"
 END_DATE = "2025-10-06"
 MAX_VIDEOS_PER_COURSE = 500  # Solo 2 videos por asignatura para prueba
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('webscrapping_improved_v3.log', encoding='utf-8')
-    ]
-)
+# Paginación y descargas en paralelo
+# RECORDINGS_PAGE_URL: plantilla opcional del listado con {course}, {start}, {end} y {page};
+# si el portal la acepta, las páginas se piden en paralelo sin pasar por el navegador.
+RECORDINGS_PAGE_URL = os.getenv("RECORDINGS_PAGE_URL")
+LISTING_PREFETCH = int(os.getenv("LISTING_PREFETCH", "4"))
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "2"))
+CATALOG_WORKERS = int(os.getenv("CATALOG_WORKERS", "8"))  # peticiones HEAD simultáneas en el catálogo
+CATALOG_BATCH = 25  # enlaces del inventario resueltos por lote al descargar
+MAX_LISTING_PAGES = 50
+
+# Extracción de audio durante la descarga: si STREAM_AUDIO_DIR está definido, el audio de 16 kHz
+# se genera en <STREAM_AUDIO_DIR>/<asignatura>/ a la vez que se descarga el video
+STREAM_AUDIO_DIR = os.getenv("STREAM_AUDIO_DIR")
+STREAM_AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "flac")
+
+MONTH_MAP = {
+    "ene": "01", "feb": "02", "mar": "03", "abr": "04", 
+    "may": "05", "mayo": "05", "jun": "06", "jul": "07", "ago": "08", 
+    "sep": "09", "oct": "10", "nov": "11", "dic": "12"
+}
+
+# Configurar logging (cola asíncrona + JSON Lines)
+setup_logging('webscrapping_improved_v3.log')
 logger = logging.getLogger(__name__)
 
 
 class ImprovedVideoScraperV3:
     """Scraper mejorado v3 con selectores más robustos y manejo de credenciales seguras."""
     
-    def __init__(self):
+    def __init__(self, username=None, password=None, blackboard_url=None, course_names=None,
+                 start_date=None, end_date=None, max_videos_per_course=None, videos_root="videos",
+                 metrics=None, storage=None, policy=None, dedup=None, crawl_state=None,
+                 audio_root=None, audio_format=None, progress=None):
+        """Sin argumentos usa el .env y las constantes del módulo.
+
+        job_runner.py pasa credenciales y ventanas por trabajo, y comparte entre cuentas
+        las métricas, la política de peticiones y los índices persistentes.
+        """
+        self.blackboard_url = blackboard_url or BLACKBOARD_URL
+        self.username = username or USERNAME
+        self.password = password or PASSWORD
+        if not all([self.blackboard_url, self.username, self.password]):
+            raise EnvironmentError("❌ Variables de entorno incompletas. Verifica tu archivo .env")
+        self.course_names = course_names if course_names is not None else COURSE_NAMES
+        self.start_date = start_date or START_DATE
+        self.end_date = end_date or END_DATE
+        self.max_videos_per_course = (
+            max_videos_per_course if max_videos_per_course is not None else MAX_VIDEOS_PER_COURSE
+        )
+        self.videos_root = videos_root
+        self.audio_root = audio_root or STREAM_AUDIO_DIR
+        self.audio_format = audio_format or STREAM_AUDIO_FORMAT
         self.driver = None
         self.wait = None
+        self.metrics = metrics or PipelineMetrics.from_env("scraper")
+        self.progress = progress or ProgressStatus.from_env("scraper", "bytes")
+        self.storage = storage or StorageManager.from_env()
+        self.policy = policy or RequestPolicy.from_env()
+        self.dedup = dedup or ContentHashIndex.from_env()
+        self.crawl_state = crawl_state or CrawlState.from_env()
+        self._listing_year = self.start_date.split("-")[0]
+        self.resolver = None
+        self._path_lock = threading.Lock()
+        self._reserved_paths = set()
         
     def setup_driver(self):
         """Configura el WebDriver de Chrome."""
@@ -92,6 +152,7 @@ class ImprovedVideoScraperV3:
             self.driver = webdriver.Chrome(service=service)
             self.driver.maximize_window()
             self.wait = WebDriverWait(self.driver, 15)
+            self.resolver = LinkResolverPool.from_env(self.driver, self.policy, self.metrics)
             
             logger.info("ChromeDriver configurado exitosamente")
             return True
@@ -100,11 +161,12 @@ class ImprovedVideoScraperV3:
             logger.error(f"Error configurando ChromeDriver: {e}")
             return False
     
+    @timed_stage("login")
     def login_to_blackboard(self):
         """Realiza el login en Blackboard."""
         try:
-            logger.info(f"Navegando a Blackboard: {BLACKBOARD_URL}")
-            self.driver.get(BLACKBOARD_URL)
+            logger.info(f"Navegando a Blackboard: {self.blackboard_url}")
+            self.driver.get(self.blackboard_url)
             time.sleep(2)
             
             # Manejar pop-ups
@@ -146,9 +208,9 @@ class ImprovedVideoScraperV3:
             )
             
             username_field.clear()
-            username_field.send_keys(USERNAME)
+            username_field.send_keys(self.username)
             password_field.clear()
-            password_field.send_keys(PASSWORD)
+            password_field.send_keys(self.password)
             
             # Login final
             login_final_button = self.wait.until(
@@ -220,6 +282,9 @@ class ImprovedVideoScraperV3:
             # Esperar contenido
             self._wait_for_recordings_content()
             
+            # Pestaña del listado: la resolución de enlaces usa otras para no perder los filtros
+            self.resolver.listing_handle = self.driver.current_window_handle
+            
             logger.info("Navegación a grabaciones exitosa")
             return True
             
@@ -380,6 +445,7 @@ class ImprovedVideoScraperV3:
             logger.error(f"Error reseteando formulario: {e}")
             return False
     
+    @timed_stage("apply_filters")
     def apply_filters(self, course_name, start_date, end_date):
         """Aplica filtros para una asignatura con selectores más robustos."""
         try:
@@ -519,7 +585,7 @@ class ImprovedVideoScraperV3:
                 }
             """, element, value)
             
-            logger.info(f"✓ Filtro {filter_name} establecido: {value}")
+            logger.debug("Filtro %s establecido: %s", filter_name, value)
             
         except Exception as e:
             logger.error(f"Error estableciendo filtro {filter_name}: {e}")
@@ -549,28 +615,13 @@ class ImprovedVideoScraperV3:
                         By.XPATH, 
                         ".//div[contains(@class, 'circle-card__circle')]//div[contains(@class, 'font-bold')]"
                     )
-                    day = day_element.text.strip()
-                    
                     month_element = element.find_element(
                         By.XPATH, 
                         ".//div[contains(@class, 'circle-card__circle')]//div[contains(@class, 'uppercase')]"
                     )
-                    month_abbr = month_element.text.strip()
-                    
-                    month_map = {
-                        "ene": "01", "feb": "02", "mar": "03", "abr": "04", 
-                        "may": "05", "mayo": "05", "jun": "06", "jul": "07", "ago": "08", 
-                        "sep": "09", "oct": "10", "nov": "11", "dic": "12"
-                    }
-                    month_num = month_map.get(month_abbr.lower(), "00")
-                    
-                    year = START_DATE.split("-")[0]
-                    file_date = f"{year}-{month_num}-{day.zfill(2)}"
-                    
-                    recording_details.append({
-                        "link": video_link, 
-                        "date": file_date
-                    })
+                    recording_details.append(
+                        self._recording_detail(video_link, day_element.text, month_element.text)
+                    )
                     
                 except Exception as e:
                     logger.warning(f"Error extrayendo detalles de grabación: {e}")
@@ -582,166 +633,613 @@ class ImprovedVideoScraperV3:
             logger.error(f"Error extrayendo detalles de grabaciones: {e}")
             return []
     
-    def process_course_recordings(self, course_name, start_date, end_date, is_first_course=False):
-        """Procesa grabaciones de una asignatura."""
+    def _recording_detail(self, video_link, day, month_abbr):
+        """Construye el detalle {link, date} a partir del día y el mes abreviado de la tarjeta."""
+        month_num = MONTH_MAP.get(month_abbr.strip().lower(), "00")
+        year = self._listing_year
+        return {
+            "link": video_link, 
+            "date": f"{year}-{month_num}-{day.strip().zfill(2)}"
+        }
+    
+    def _parse_listing_html(self, html, base_url):
+        """Extrae detalles de grabaciones de un HTML de listado (misma estructura que en el navegador)."""
+        soup = BeautifulSoup(html, "html.parser")
+        details = []
+        for anchor in soup.select("a[href*='/classes/recordings/get-link/']"):
+            day = anchor.select_one(".circle-card__circle .font-bold")
+            month = anchor.select_one(".circle-card__circle .uppercase")
+            if not day or not month:
+                continue
+            details.append(self._recording_detail(urljoin(base_url, anchor["href"]), day.get_text(), month.get_text()))
+        return details
+    
+    def iter_course_recordings(self, course_name, start_date, end_date, reset_form=False, incremental=True):
+        """Genera, página a página, las grabaciones nuevas de una asignatura.
+        
+        Quien consume puede empezar a resolver y descargar la página 0 mientras
+        se carga la siguiente. Los errores de listado se propagan como excepción.
+        Con ``incremental=False`` (catálogo) se listan todas, también las ya descargadas.
+        """
+        logger.info(f"Procesando asignatura: {course_name}")
+        if RECORDINGS_PAGE_URL:
+            pages = self._iter_listing_pages_by_url(course_name, start_date, end_date)
+        else:
+            pages = self._iter_listing_pages(course_name, start_date, end_date, reset_form)
+        
         try:
-            logger.info(f"Procesando asignatura: {course_name}")
+            for page, current_page_details in enumerate(pages):
+                logger.info(f"Procesando página {page} para {course_name}")
+                
+                if not incremental:
+                    yield current_page_details
+                    continue
+                # Rastreo incremental: descartar lo ya descargado y parar al llegar a lo asentado
+                new_details = [d for d in current_page_details if not self.crawl_state.is_known(course_name, d["link"])]
+                if new_details:
+                    yield new_details
+                if any(self.crawl_state.is_settled(course_name, d) for d in current_page_details):
+                    logger.info("Alcanzadas grabaciones ya descargadas, fin de la paginación")
+                    break
+        finally:
+            pages.close()
+    
+    def _iter_listing_pages(self, course_name, start_date, end_date, reset_form):
+        """Paginación en el navegador: filtros + botón 'Siguiente página'."""
+        # La pestaña del listado ya no se abandona entre asignaturas: solo se resetea
+        # el formulario para recuperarse de un fallo
+        if reset_form:
+            if not self.reset_form_for_new_course():
+                raise RuntimeError("Error reseteando formulario")
+        
+        # Aplicar filtros
+        if not self.apply_filters(course_name, start_date, end_date):
+            raise RuntimeError("Error aplicando filtros")
+        
+        page = 0
+        while page < MAX_LISTING_PAGES:
+            current_page_details = self.extract_recording_details()
             
-            # Resetear formulario si no es la primera asignatura
-            if not is_first_course:
-                if not self.reset_form_for_new_course():
-                    logger.error("Error reseteando formulario")
-                    return []
+            if not current_page_details:
+                logger.info("No hay más grabaciones")
+                return
             
-            # Aplicar filtros
-            if not self.apply_filters(course_name, start_date, end_date):
-                logger.error("Error aplicando filtros")
-                return []
+            yield current_page_details
             
-            all_recording_details = []
-            page = 0
-            max_pages = 50
+            # Verificar siguiente página
+            next_page_buttons = self.driver.find_elements(
+                By.XPATH, 
+                "//a[@data-tippy-content='Siguiente página']"
+            )
             
-            while page < max_pages:
-                logger.info(f"Procesando página {page} para {course_name}")
-                
-                current_page_details = self.extract_recording_details()
-                
-                if not current_page_details:
-                    logger.info("No hay más grabaciones")
-                    break
-                
-                all_recording_details.extend(current_page_details)
-                
-                # Verificar siguiente página
-                next_page_buttons = self.driver.find_elements(
-                    By.XPATH, 
-                    "//a[@data-tippy-content='Siguiente página']"
-                )
-                
-                if not next_page_buttons or not next_page_buttons[0].is_displayed():
-                    break
-                
-                button_disabled = self.driver.execute_script("""
-                    const btn = arguments[0];
-                    return btn.disabled || 
-                           btn.classList.contains('disabled') || 
-                           btn.getAttribute('aria-disabled') === 'true';
-                """, next_page_buttons[0])
-                
-                if button_disabled:
-                    break
-                
+            if not next_page_buttons or not next_page_buttons[0].is_displayed():
+                return
+            
+            button_disabled = self.driver.execute_script("""
+                const btn = arguments[0];
+                return btn.disabled || 
+                       btn.classList.contains('disabled') || 
+                       btn.getAttribute('aria-disabled') === 'true';
+            """, next_page_buttons[0])
+            
+            if button_disabled:
+                return
+            
+            with self.metrics.stage("pagination", course=course_name, page=page + 1):
                 self.driver.execute_script("arguments[0].click();", next_page_buttons[0])
-                page += 1
                 time.sleep(5)
-            
+            page += 1
+    
+    def _iter_listing_pages_by_url(self, course_name, start_date, end_date):
+        """Paginación por parámetro: pide LISTING_PREFETCH páginas por delante en paralelo."""
+        cookies = {c["name"]: c["value"] for c in self.driver.get_cookies()}
+        
+        def page_url(page):
+            return RECORDINGS_PAGE_URL.format(
+                course=quote(course_name), start=start_date, end=end_date, page=page
+            )
+        
+        with ThreadPoolExecutor(max_workers=LISTING_PREFETCH) as pool:
+            futures = {}
+            next_page = 0
+            previous_links = None
+            try:
+                for page in range(MAX_LISTING_PAGES):
+                    while next_page < min(page + LISTING_PREFETCH, MAX_LISTING_PAGES):
+                        futures[next_page] = pool.submit(
+                            contextvars.copy_context().run,
+                            self._fetch_listing_page, page_url(next_page), cookies, course_name, next_page
+                        )
+                        next_page += 1
+                    
+                    current_page_details = futures.pop(page).result()
+                    links = [d["link"] for d in current_page_details]
+                    # Fin del listado: página vacía o el servidor repite la última
+                    if not current_page_details or links == previous_links:
+                        logger.info("No hay más grabaciones")
+                        return
+                    previous_links = links
+                    yield current_page_details
+            finally:
+                for future in futures.values():
+                    future.cancel()
+    
+    def _fetch_listing_page(self, url, cookies, course_name, page):
+        """Descarga y analiza una página del listado."""
+        with self.metrics.stage("pagination", course=course_name, page=page) as stage:
+            response = self.policy.request("GET", url, cookies=cookies)
+            response.raise_for_status()
+            stage.add_bytes(len(response.content))
+            return self._parse_listing_html(response.text, url)
+    
+    def process_course_recordings(self, course_name, start_date, end_date, reset_form=False):
+        """Procesa grabaciones de una asignatura (None si hubo un error y conviene reintentar)."""
+        try:
+            all_recording_details = [
+                detail
+                for page_details in self.iter_course_recordings(course_name, start_date, end_date, reset_form)
+                for detail in page_details
+            ]
             logger.info(f"Total grabaciones encontradas para {course_name}: {len(all_recording_details)}")
             return all_recording_details
             
         except Exception as e:
             logger.error(f"Error procesando asignatura {course_name}: {e}")
-            return []
+            return None
     
     def get_video_download_link(self, video_session_url):
-        """Obtiene enlace de descarga del video."""
+        """Obtiene enlace de descarga del video (pool de pestañas, con reintentos)."""
         try:
-            self.driver.get(video_session_url)
-            video_source_element = self.wait.until(
-                EC.presence_of_element_located((
-                    By.XPATH, 
-                    "//video[@id='player-overlay']//source"
-                ))
-            )
-            return video_source_element.get_attribute("src")
+            return self.resolver.resolve_many([video_session_url]).get(video_session_url)
         except Exception as e:
             logger.error(f"Error obteniendo enlace de descarga: {e}")
             return None
     
-    def download_video(self, download_url, folder_name, file_name):
-        """Descarga un video, evitando sobrescrituras con un incremental único."""
+    def download_video(self, download_url, folder_name, file_name, link=None):
+        """Descarga un video, evitando sobrescrituras con un incremental único.
+
+        ``link`` es el enlace de la grabación en el listado: identifica la grabación aunque
+        haya varias el mismo día y queda registrado junto al video.
+        """
+        final_path = None
         try:
             if not os.path.exists(folder_name):
                 os.makedirs(folder_name)
 
-            base_path = os.path.join(folder_name, f"{file_name}.mp4")
-            final_path = base_path
+            final_path = os.path.join(folder_name, f"{file_name}.mp4")
+
+            # Las clases ya transcritas pueden haberse borrado por retención: no volver a bajarlas.
+            # Se decide por el enlace y no por el nombre: otra grabación del mismo día usaría <fecha>.mp4
+            if link and self.storage.is_link_transcribed(link):
+                logger.info(f"Ya transcrito, se omite la descarga: {file_name} ({link})")
+                return True
             counter = 1
 
-            # En caso de colisión, agregar sufijo incremental
-            while os.path.exists(final_path):
-                final_path = os.path.join(folder_name, f"{file_name}_{counter}.mp4")
-                counter += 1
+            # En caso de colisión, agregar sufijo incremental (reservado entre descargas paralelas)
+            with self._path_lock:
+                while os.path.exists(final_path) or final_path in self._reserved_paths:
+                    final_path = os.path.join(folder_name, f"{file_name}_{counter}.mp4")
+                    counter += 1
+                self._reserved_paths.add(final_path)
 
             logger.info(f"Descargando {download_url} a {final_path}")
+            self.progress.set_current(os.path.basename(final_path))
 
-            response = requests.get(download_url, stream=True)
-            response.raise_for_status()
-
-            with open(final_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # Cortes a mitad de transferencia: se descarta el parcial y se reintenta con backoff.
+            # Un archivo completo pero corrupto se vuelve a pedir de inmediato.
+            stream_errors = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+            part_path = final_path + ".part"
+            for attempt in range(self.policy.max_retries + 1):
+                try:
+                    if not self._stream_to_file(download_url, folder_name, file_name, final_path):
+                        return False
+                    break
+                except DownloadIntegrityError as e:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                    if attempt >= self.policy.max_retries:
+                        logger.error(f"Descarga corrupta tras {attempt + 1} intentos, queda pendiente: {e}")
+                        return False
+                    logger.warning(f"Descarga corrupta (intento {attempt + 1}): {e}; se vuelve a descargar")
+                except stream_errors as e:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                    if attempt >= self.policy.max_retries:
+                        raise
+                    logger.warning(f"Descarga interrumpida (intento {attempt + 1}): {e}")
+                    self.policy.backoff(attempt)
 
+            if link:
+                self.storage.record_source(final_path, link)
             logger.info(f"Descarga completa: {os.path.basename(final_path)}")
             return True
 
         except Exception as e:
             logger.error(f"Error descargando video: {e}")
             return False
+        finally:
+            with self._path_lock:
+                self._reserved_paths.discard(final_path)
+
+    def _stream_to_file(self, download_url, folder_name, file_name, final_path):
+        """Un intento de descarga; devuelve False si no hay espacio en disco.
+
+        Se escribe en ``<final_path>.part`` y solo se renombra si pasa la verificación;
+        si no, lanza DownloadIntegrityError.
+        """
+        response = self.policy.request("GET", download_url, stream=True)
+        response.raise_for_status()
+
+        # Comprobar espacio libre con Content-Length antes de escribir nada
+        expected_bytes = content_length(response.headers) or DEFAULT_VIDEO_BYTES
+        if not self.storage.has_room(folder_name, expected_bytes):
+            response.close()
+            if not self.storage.reserve(folder_name, expected_bytes, "download"):
+                return False
+            response = self.policy.request("GET", download_url, stream=True)
+            response.raise_for_status()
+
+        # Hash, MD5 y cajas MP4 calculados sobre los mismos bloques que se escriben (sin segunda lectura)
+        total_size = content_length(response.headers)
+        hasher = self.dedup.new_hasher()
+        published_md5 = expected_md5(response.headers)
+        etag_hex = etag_md5(response.headers)
+        md5 = hashlib.md5() if published_md5 or etag_hex else None
+        scanner = Mp4BoxScanner()
+        part_path = final_path + ".part"
+        duplicate_of = None
+        tee = self._audio_tee(folder_name, final_path)
+
+        try:
+            with response, self.metrics.stage("download", course=os.path.basename(folder_name), video=file_name) as stage:
+                with open(part_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        if chunk:
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            scanner.feed(chunk)
+                            if md5:
+                                md5.update(chunk)
+                            stage.add_bytes(len(chunk))
+                            self.progress.add_work(len(chunk))
+                            if tee:
+                                tee.feed(chunk)
+                            # Duplicado temprano: mismo tamaño y mismos primeros MB que un archivo ya indexado
+                            if total_size and duplicate_of is None and hasher.prefix_done:
+                                duplicate_of = self.dedup.find_by_prefix(hasher.prefix_key(total_size)) or False
+                                # Dos grabaciones del mismo aula comparten tamaño y cabecera: se compara también el final
+                                if duplicate_of and not self._tail_matches(download_url, duplicate_of, total_size):
+                                    duplicate_of = False
+                                if duplicate_of:
+                                    break
+        except Exception:
+            if tee:
+                tee.abort()
+            raise
+
+        if duplicate_of:
+            logger.info(f"♊ Duplicado detectado tras {hasher.size / 1e6:.0f} MB, transferencia cancelada")
+            if tee:
+                tee.abort()
+            os.remove(part_path)
+            self.dedup.link_duplicate(duplicate_of, final_path, confirmed=False)
+        else:
+            with self.metrics.stage("verify", video=file_name) as stage:
+                problem = verify_download(
+                    part_path, hasher.size, total_size, scanner, md5, published_md5, etag_hex
+                )
+                if problem:
+                    stage.fail()
+            if problem:
+                if tee:
+                    tee.abort()
+                raise DownloadIntegrityError(problem)
+            os.replace(part_path, final_path)
+            canonical = self.dedup.register(final_path, hasher, total_size)
+            if tee and canonical:
+                tee.abort()  # el transcriptor reutiliza la transcripción del original
+            elif tee and tee.active:
+                with self.metrics.stage("stream_extract", video=file_name) as stage:
+                    audio_path = tee.finish()
+                    if audio_path:
+                        stage.add_bytes(audio_path.stat().st_size)
+                    else:
+                        stage.fail()
+        return True
+
+    def _tail_matches(self, download_url, canonical, total_size):
+        """Compara el final remoto (petición Range) con el del archivo canónico en disco."""
+        try:
+            response = self.policy.request(
+                "GET", download_url, headers={"Range": f"bytes={max(0, total_size - TAIL_BYTES)}-"}
+            )
+        except Exception as e:
+            logger.info(f"No se pudo pedir el final de la grabación ({e}); se descarga entera")
+            return False
+        if response.status_code != 206:
+            return False  # sin soporte de Range solo el hash completo puede confirmarlo
+        return hashlib.sha256(response.content).hexdigest() == tail_digest(canonical)
+
+    def _audio_tee(self, folder_name, final_path):
+        """Extractor de audio al vuelo para esta descarga (None si está desactivado)."""
+        if not self.audio_root:
+            return None
+        fmt = AUDIO_FORMATS[self.audio_format]
+        stem = os.path.splitext(os.path.basename(final_path))[0]
+        audio_path = os.path.join(self.audio_root, os.path.basename(folder_name), stem + fmt["ext"])
+        if os.path.exists(audio_path):
+            return None
+        return StreamingAudioExtractor(audio_path, self.audio_format)
+                
+    def process_course(self, i, total, course_name, start_date=None, end_date=None, crawl_key=None,
+                       max_videos=None):
+        """Busca y descarga las grabaciones de una asignatura en tubería.
+        
+        Cada página del listado se resuelve y se encola para descarga en cuanto llega,
+        de modo que las descargas avanzan mientras se cargan las páginas siguientes.
+        ``crawl_key`` separa las marcas de agua de distintas cuentas o ventanas de fechas.
+        """
+        logger.info(f"=== PROCESANDO ASIGNATURA {i+1}/{total}: {course_name} ===")
+        window_start = start_date or self.start_date
+        end_date = end_date or self.end_date
+        crawl_key = crawl_key or course_name
+        if max_videos is None:
+            max_videos = self.max_videos_per_course
+        self.progress.set_course(course_name, i, total)
+        # Las tarjetas del listado solo traen día y mes: el año sale de la ventana
+        self._listing_year = window_start.split("-")[0]
+        
+        # Con marca de agua previa el filtro empieza en la última grabación conocida
+        start_date = self.crawl_state.start_date_for(crawl_key, window_start)
+        if start_date != window_start:
+            logger.info(f"Rastreo incremental desde {start_date}")
+        
+        course_folder = os.path.join(self.videos_root, course_name)
+        submitted = {}  # link -> (detalle, future o None si no se pudo resolver)
+        listing_complete = False
+        
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as downloads:
+            for attempt in range(self.policy.max_retries + 1):
+                try:
+                    # Tras un fallo se fuerza el reseteo del formulario antes de reintentar
+                    pages = self.iter_course_recordings(
+                        course_name, start_date, end_date, reset_form=(attempt > 0)
+                    )
+                    listing_complete = self._submit_downloads(pages, downloads, submitted, course_folder, max_videos)
+                    break
+                except Exception as e:
+                    logger.error(f"Error procesando asignatura {course_name}: {e}")
+                    if attempt < self.policy.max_retries:
+                        logger.warning(f"Reintentando asignatura {course_name} ({attempt + 2}/{self.policy.max_retries + 1})")
+                        self.policy.backoff(attempt)
+            
+            succeeded, failed = [], []
+            for detail, future in submitted.values():
+                if future is not None and future.result():
+                    succeeded.append(detail)
+                else:
+                    failed.append(detail)
+        
+        if not submitted:
+            logger.warning(f"No se encontraron grabaciones para {course_name}")
+            return
+        
+        if listing_complete:
+            self.crawl_state.update(crawl_key, succeeded, failed)
+        else:
+            # El listado va de más reciente a más antigua: si no se recorrió entero, avanzar la
+            # marca de agua saltaría las páginas antiguas que nunca se vieron
+            logger.warning(f"Listado de {course_name} incompleto: la marca de agua no avanza")
+            self.crawl_state.remember(crawl_key, succeeded)
+        logger.info(f"=== {course_name} COMPLETADA: {len(succeeded)}/{len(submitted)} videos descargados ===")
+    
+    def _submit_downloads(self, pages, downloads, submitted, course_folder, max_videos):
+        """Resuelve en lote los enlaces de cada página y encola sus descargas sin esperar a las demás.
+
+        Devuelve True si el listado se recorrió hasta el final y False si se cortó en ``max_videos``.
+        """
+        try:
+            for page_details in pages:
+                # Omitir lo ya encolado en un intento anterior
+                page_details = [d for d in page_details if d["link"] not in submitted]
+                # Aplicar límite si es necesario
+                limit_reached = False
+                if max_videos and len(submitted) + len(page_details) >= max_videos:
+                    page_details = page_details[:max_videos - len(submitted)]
+                    limit_reached = True
                 
+                download_links = self.resolver.resolve_many([d["link"] for d in page_details])
+                for detail in page_details:
+                    file_name_date = detail["date"]
+                    download_link = download_links.get(detail["link"])
+                    with log_context(video=file_name_date):
+                        logger.info("Procesando video %d: %s", len(submitted) + 1, file_name_date)
+                        future = None
+                        self.progress.add_total()
+                        if download_link:
+                            future = downloads.submit(
+                                contextvars.copy_context().run,
+                                self.download_video, download_link, course_folder, file_name_date,
+                                detail["link"]
+                            )
+                            future.add_done_callback(
+                                lambda f: self.progress.item_done(f.exception() is None and bool(f.result()))
+                            )
+                        else:
+                            self.progress.item_done(False)
+                        submitted[detail["link"]] = (detail, future)
+                
+                if limit_reached:
+                    logger.info(f"Limitando a {max_videos} videos")
+                    return False
+            return True
+        finally:
+            pages.close()
+    
+    def catalog_course(self, i, total, course_name, probes, head_only=False, start_date=None, end_date=None,
+                       max_videos=None):
+        """Lista todas las grabaciones de una asignatura y las mide en ``probes`` sin descargarlas.
+
+        Devuelve las filas del inventario; tamaño y duración se rellenan al terminar cada
+        petición, así que hay que esperar a ``probes`` antes de usarlas.
+        """
+        logger.info(f"=== CATÁLOGO {i+1}/{total}: {course_name} ===")
+        start_date = start_date or self.start_date
+        end_date = end_date or self.end_date
+        if max_videos is None:
+            max_videos = self.max_videos_per_course
+        self._listing_year = start_date.split("-")[0]
+        self.progress.set_course(course_name, i, total)
+        rows = {}  # link -> fila
+
+        def fill(future, row):
+            row["bytes"], row["duration_seconds"], row["duration_source"] = future.result()
+            self.progress.item_done(bool(row["bytes"]))
+
+        for attempt in range(self.policy.max_retries + 1):
+            try:
+                pages = self.iter_course_recordings(
+                    course_name, start_date, end_date, reset_form=(attempt > 0), incremental=False
+                )
+                try:
+                    for page_details in pages:
+                        page_details = [d for d in page_details if d["link"] not in rows]
+                        if max_videos:
+                            page_details = page_details[:max_videos - len(rows)]
+                        download_links = self.resolver.resolve_many([d["link"] for d in page_details])
+                        for detail in page_details:
+                            url = download_links.get(detail["link"])
+                            row = {
+                                "course": course_name, "date": detail["date"], "link": detail["link"], "url": url,
+                                "bytes": 0, "duration_seconds": None, "duration_source": None,
+                                "downloaded": self.crawl_state.was_downloaded(course_name, detail),
+                            }
+                            rows[detail["link"]] = row
+                            self.progress.add_total()
+                            if url:
+                                future = probes.submit(probe_recording, self.policy, url, head_only)
+                                future.add_done_callback(lambda f, row=row: fill(f, row))
+                            else:
+                                self.progress.item_done(False)
+                        if max_videos and len(rows) >= max_videos:
+                            break
+                finally:
+                    pages.close()
+                break
+            except Exception as e:
+                logger.error(f"Error listando asignatura {course_name}: {e}")
+                if attempt < self.policy.max_retries:
+                    logger.warning(f"Reintentando asignatura {course_name} ({attempt + 2}/{self.policy.max_retries + 1})")
+                    self.policy.backoff(attempt)
+
+        logger.info(f"{course_name}: {len(rows)} grabaciones en el listado")
+        return list(rows.values())
+
+    def run_catalog(self, output_path, head_only=False, bandwidth_mbps=None):
+        """Modo catálogo: inventario de todas las asignaturas sin descargar ningún video."""
+        try:
+            logger.info("=== INICIANDO CATÁLOGO (sin descargas) ===")
+            if not self.start_session():
+                return False
+
+            rows = []
+            # Las mediciones de una asignatura siguen en curso mientras se lista la siguiente
+            with ThreadPoolExecutor(max_workers=CATALOG_WORKERS) as probes:
+                for i, course_name in enumerate(self.course_names):
+                    with log_context(course=course_name):
+                        rows.extend(self.catalog_course(i, len(self.course_names), course_name, probes, head_only))
+
+            write_catalog(rows, output_path)
+            logger.info(f"📒 Inventario guardado en {output_path}")
+            # Solo el catálogo usa el perfil de autotune: no se carga en cada scraping
+            from autotune import load_profile
+            profile = load_profile()
+            log_summary(rows, bandwidth_mbps, profile["realtime_factor"] if profile else None)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error en el catálogo: {e}")
+            return False
+        finally:
+            self.close()
+            self.metrics.close()
+            self.progress.close()
+
+    def download_catalog(self, catalog_path):
+        """Descarga las grabaciones de un inventario sin recorrer los listados.
+
+        Las URL firmadas del inventario pueden haber caducado, así que los enlaces se
+        vuelven a resolver por lotes. Lo ya descargado desde que se hizo el inventario se omite.
+        """
+        try:
+            rows = read_catalog(catalog_path)
+            by_course = {}
+            for row in rows:
+                if not self.crawl_state.was_downloaded(row["course"], row):
+                    by_course.setdefault(row["course"], []).append(row)
+            logger.info(
+                f"=== DESCARGA DESDE INVENTARIO: {sum(len(r) for r in by_course.values())} de {len(rows)} "
+                f"grabaciones pendientes ==="
+            )
+            if not by_course:
+                return True
+            if not self.start_session():
+                return False
+
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as downloads:
+                for i, (course_name, course_rows) in enumerate(by_course.items()):
+                    self.progress.set_course(course_name, i, len(by_course))
+                    submitted = {}
+                    pages = (course_rows[n:n + CATALOG_BATCH] for n in range(0, len(course_rows), CATALOG_BATCH))
+                    with log_context(course=course_name):
+                        self._submit_downloads(
+                            pages, downloads, submitted, os.path.join(self.videos_root, course_name), None
+                        )
+                        succeeded = [detail for detail, future in submitted.values() if future and future.result()]
+                    # Solo enlaces conocidos: la marca de agua no avanza sobre los huecos del inventario
+                    self.crawl_state.remember(course_name, succeeded)
+                    logger.info(f"=== {course_name}: {len(succeeded)}/{len(submitted)} videos descargados ===")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error descargando el inventario: {e}")
+            return False
+        finally:
+            self.close()
+            self.metrics.close()
+            self.progress.close()
+
+    def start_session(self):
+        """Abre el navegador, inicia sesión y deja abierta la página de grabaciones."""
+        # Configurar navegador
+        if not self.setup_driver():
+            return False
+        
+        # Login
+        if not self.login_to_blackboard():
+            return False
+        
+        # Navegar a grabaciones
+        return self.navigate_to_recordings()
+    
+    def close(self):
+        """Cierra el navegador (las métricas compartidas las cierra quien las creó)."""
+        if self.driver:
+            self.driver.quit()
+            self.driver = None
+    
     def run(self):
         """Ejecuta el proceso completo."""
         try:
             logger.info("=== INICIANDO PROCESO MEJORADO V3 ===")
             
-            # Configurar navegador
-            if not self.setup_driver():
-                return False
-            
-            # Login
-            if not self.login_to_blackboard():
-                return False
-            
-            # Navegar a grabaciones
-            if not self.navigate_to_recordings():
+            if not self.start_session():
                 return False
             
             # Procesar cada asignatura
-            for i, course_name in enumerate(COURSE_NAMES):
-                logger.info(f"=== PROCESANDO ASIGNATURA {i+1}/{len(COURSE_NAMES)}: {course_name} ===")
-                
-                recording_details = self.process_course_recordings(
-                    course_name, START_DATE, END_DATE, is_first_course=(i == 0)
-                )
-                
-                if not recording_details:
-                    logger.warning(f"No se encontraron grabaciones para {course_name}")
-                    continue
-                
-                # Aplicar límite si es necesario
-                if MAX_VIDEOS_PER_COURSE and len(recording_details) > MAX_VIDEOS_PER_COURSE:
-                    logger.info(f"Limitando a {MAX_VIDEOS_PER_COURSE} videos")
-                    recording_details = recording_details[:MAX_VIDEOS_PER_COURSE]
-                
-                # Descargar videos
-                course_folder = os.path.join("videos", course_name)
-                successful = 0
-                
-                for j, detail in enumerate(recording_details, 1):
-                    session_link = detail["link"]
-                    file_name_date = detail["date"]
-                    
-                    logger.info(f"Procesando video {j}/{len(recording_details)}: {file_name_date}")
-                    
-                    download_link = self.get_video_download_link(session_link)
-                    if download_link:
-                        if self.download_video(download_link, course_folder, file_name_date):
-                            successful += 1
-                    
-                    time.sleep(1)
-                
-                logger.info(f"=== {course_name} COMPLETADA: {successful}/{len(recording_details)} videos descargados ===")
+            for i, course_name in enumerate(self.course_names):
+                with log_context(course=course_name):
+                    self.process_course(i, len(self.course_names), course_name)
             
             logger.info("=== PROCESO COMPLETADO ===")
             return True
@@ -750,11 +1248,43 @@ class ImprovedVideoScraperV3:
             logger.error(f"Error en el proceso: {e}")
             return False
         finally:
-            if self.driver:
-                self.driver.quit()
+            self.close()
+            self.metrics.close()
+            self.progress.close()
+
+
+def main(argv=None):
+    """Ejecución simple con el .env y las constantes del módulo (trabajos: job_runner.py)."""
+    parser = argparse.ArgumentParser(description="Descarga de grabaciones de Blackboard")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--catalog", metavar="INVENTARIO",
+        help="No descargar: listar y medir (HEAD) todas las grabaciones y guardar el inventario (.json o .csv)"
+    )
+    mode.add_argument(
+        "--from-catalog", metavar="INVENTARIO",
+        help="Descargar las grabaciones pendientes de un inventario en lugar de recorrer los listados"
+    )
+    parser.add_argument(
+        "--head-only", action="store_true",
+        help="Con --catalog: solo HEAD, sin leer los primeros KB (duración estimada por tamaño)"
+    )
+    parser.add_argument(
+        "--bandwidth-mbps", type=float,
+        help="Con --catalog: ancho de banda disponible para estimar el tiempo de descarga"
+    )
+    args = parser.parse_args(argv)
+    try:
+        scraper = ImprovedVideoScraperV3()
+    except EnvironmentError as e:
+        logger.error(str(e))
+        return False
+    if args.catalog:
+        return scraper.run_catalog(args.catalog, args.head_only, args.bandwidth_mbps)
+    if args.from_catalog:
+        return scraper.download_catalog(args.from_catalog)
+    return scraper.run()
 
 
 if __name__ == "__main__":
-    scraper = ImprovedVideoScraperV3()
-    success = scraper.run()
-    exit(0 if success else 1)
+    exit(0 if main() else 1)
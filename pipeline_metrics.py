@@ -0,0 +1,204 @@
+"""
+Instrumentación compartida del pipeline (scraper y transcriptor).
+Registra duración, bytes y errores por etapa, emite eventos JSON (uno por línea)
+y exporta los acumulados en formato de texto Prometheus (archivo o endpoint HTTP).
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """Acumula bytes y estado de error de una ejecución de etapa en curso."""
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.bytes = 0
+        self.error = False
+
+    def add_bytes(self, count):
+        """Suma bytes procesados por la etapa."""
+        self.bytes += count
+
+    def fail(self):
+        """Marca la etapa como fallida sin necesidad de lanzar una excepción."""
+        self.error = True
+
+
+class PipelineMetrics:
+    """Métricas por etapa con salida de eventos JSON y exportación Prometheus."""
+
+    def __init__(self, component, events_path=None, prometheus_path=None, prometheus_port=None):
+        self.component = component
+        self.events_path = events_path
+        self.prometheus_path = prometheus_path
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._events_file = None
+        self._server = None
+
+        if events_path:
+            os.makedirs(os.path.dirname(os.path.abspath(events_path)), exist_ok=True)
+            self._events_file = open(events_path, "a", encoding="utf-8", buffering=1)
+        if prometheus_port:
+            self.serve_prometheus(int(prometheus_port))
+
+    @classmethod
+    def from_env(cls, component):
+        """Crea la instancia a partir de PIPELINE_METRICS_EVENTS / _PROM / _PORT."""
+        return cls(
+            component,
+            events_path=os.getenv("PIPELINE_METRICS_EVENTS"),
+            prometheus_path=os.getenv("PIPELINE_METRICS_PROM"),
+            prometheus_port=os.getenv("PIPELINE_METRICS_PORT"),
+        )
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """Mide una etapa; una excepción que atraviese el bloque cuenta como error."""
+        timer = StageTimer(name, labels)
+        start = time.perf_counter()
+        try:
+            yield timer
+        except BaseException:
+            timer.error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, timer.bytes, timer.error, **labels)
+
+    def record(self, name, seconds, bytes_count=0, error=False, **labels):
+        """Registra una ejecución de etapa ya medida."""
+        with self._lock:
+            stats = self.stats.setdefault(
+                name, {"calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0}
+            )
+            stats["calls"] += 1
+            stats["errors"] += int(bool(error))
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["bytes"] += bytes_count
+
+            if self._events_file:
+                event = {
+                    "ts": time.time(),
+                    "component": self.component,
+                    "stage": name,
+                    "seconds": round(seconds, 6),
+                    "bytes": bytes_count,
+                    "error": bool(error),
+                }
+                event.update(labels)
+                self._events_file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+    def render_prometheus(self):
+        """Devuelve los acumulados en formato de exposición de texto Prometheus."""
+        series = [
+            ("pipeline_stage_calls_total", "counter", "Ejecuciones por etapa", "calls"),
+            ("pipeline_stage_errors_total", "counter", "Errores por etapa", "errors"),
+            ("pipeline_stage_seconds_total", "counter", "Segundos acumulados por etapa", "seconds"),
+            ("pipeline_stage_seconds_max", "gauge", "Duración máxima de una ejecución", "max_seconds"),
+            ("pipeline_stage_bytes_total", "counter", "Bytes procesados por etapa", "bytes"),
+        ]
+        with self._lock:
+            snapshot = {name: dict(values) for name, values in self.stats.items()}
+
+        lines = []
+        for metric, kind, help_text, key in series:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for stage_name in sorted(snapshot):
+                stage_label = stage_name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(
+                    f'{metric}{{component="{self.component}",stage="{stage_label}"}} {snapshot[stage_name][key]}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Escribe el archivo de texto Prometheus de forma atómica."""
+        path = path or self.prometheus_path
+        if not path:
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve_prometheus(self, port):
+        """Publica /metrics en un hilo en segundo plano."""
+        metrics = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Métricas Prometheus disponibles en http://127.0.0.1:{port}/metrics")
+
+    def log_summary(self):
+        """Resume las etapas ordenadas por tiempo total (la primera es la etapa caliente)."""
+        with self._lock:
+            ranking = sorted(self.stats.items(), key=lambda item: item[1]["seconds"], reverse=True)
+        if not ranking:
+            return
+        logger.info(f"=== MÉTRICAS POR ETAPA ({self.component}) ===")
+        logger.info(f"{'Etapa':<22} {'Llamadas':<10} {'Errores':<9} {'Total (s)':<12} {'Máx (s)':<10} {'MB':<10}")
+        for name, stats in ranking:
+            logger.info(
+                f"{name:<22} {stats['calls']:<10} {stats['errors']:<9} {stats['seconds']:<12.2f} "
+                f"{stats['max_seconds']:<10.2f} {stats['bytes'] / 1e6:<10.1f}"
+            )
+
+    def close(self):
+        """Vuelca el resumen, escribe el archivo Prometheus y libera recursos."""
+        self.log_summary()
+        try:
+            self.write_prometheus()
+        except OSError as e:
+            logger.warning(f"No se pudo escribir el archivo de métricas: {e}")
+        if self._events_file:
+            self._events_file.close()
+            self._events_file = None
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+
+
+def timed_stage(name):
+    """Decorador para métodos que señalan el fallo devolviendo False/None.
+
+    Usa ``self.metrics`` del objeto decorado; si no existe, no mide nada.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            metrics = getattr(self, "metrics", None)
+            if metrics is None:
+                return method(self, *args, **kwargs)
+            with metrics.stage(name) as stage:
+                result = method(self, *args, **kwargs)
+                if result is None or result is False:
+                    stage.fail()
+                return result
+        return wrapper
+    return decorator
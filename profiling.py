@@ -0,0 +1,190 @@
+"""
+Modo perfilado (--profile) para el bucle de transcripción.
+Mide cada fase por lectura (corte ffmpeg, inferencia, fsync, pausa...), y de forma
+opcional guarda cProfile por fragmento o muestrea pilas para generar un resumen
+tipo flame graph (formato "folded", compatible con flamegraph.pl y speedscope).
+"""
+
+import sys
+import time
+import logging
+import cProfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("timers", "cprofile", "sample")
+
+
+class NullProfiler:
+    """Perfilador vacío: mismo interfaz, sin coste, para cuando --profile no está activo."""
+
+    enabled = False
+
+    @contextmanager
+    def lecture(self, name):
+        yield
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    @contextmanager
+    def chunk(self, index):
+        yield
+
+
+class StackSampler:
+    """Muestreador de pilas del hilo que lo arranca (perfilado estadístico sin dependencias)."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = defaultdict(int)
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._worker = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._worker:
+            self._worker.join()
+            self._worker = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+
+class LectureProfiler:
+    """Temporizadores por fase y lectura, con cProfile o muestreo opcional por fragmento."""
+
+    enabled = True
+
+    def __init__(self, mode="timers", output_dir="perfiles", sample_interval=0.01):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de perfilado desconocido: {mode}")
+        self.mode = mode
+        self.output_dir = Path(output_dir)
+        self.sample_interval = sample_interval
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lecture = None
+        self._lecture_start = 0.0
+        self._phases = defaultdict(float)
+        self._samples = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def lecture(self, name):
+        """Delimita una lectura; al salir escribe el archivo folded y el resumen."""
+        self._lecture = name
+        self._lecture_start = time.perf_counter()
+        self._phases = defaultdict(float)
+        self._samples = defaultdict(int)
+        try:
+            yield
+        finally:
+            total = time.perf_counter() - self._lecture_start
+            self._write_folded(name, total)
+            self._log_breakdown(name, total)
+            self._lecture = None
+
+    @contextmanager
+    def phase(self, name):
+        """Acumula el tiempo de pared de una fase dentro de la lectura actual (suma entre workers)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases[name] += time.perf_counter() - start
+
+    @contextmanager
+    def chunk(self, index):
+        """Perfila un fragmento con cProfile o con el muestreador según el modo."""
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                profile.dump_stats(str(self.output_dir / f"{self._lecture}_chunk_{index}.prof"))
+        elif self.mode == "sample":
+            sampler = StackSampler(self.sample_interval)
+            sampler.start()
+            try:
+                yield
+            finally:
+                sampler.stop()
+                for stack, count in sampler.samples.items():
+                    self._samples[stack] += count
+        else:
+            yield
+
+    def _write_folded(self, name, total):
+        """Escribe pilas "lectura;fase microsegundos" (y pilas muestreadas si las hay)."""
+        folded_path = self.output_dir / f"{name}.folded"
+        accounted = sum(self._phases.values())
+        with open(folded_path, "w", encoding="utf-8") as f:
+            for phase_name, seconds in self._phases.items():
+                f.write(f"{name};{phase_name} {int(seconds * 1e6)}\n")
+            if total > accounted:
+                f.write(f"{name};otros {int((total - accounted) * 1e6)}\n")
+            for stack, count in self._samples.items():
+                f.write(f"{name};muestras;{stack} {int(count * self.sample_interval * 1e6)}\n")
+        logger.info(f"Perfil guardado en {folded_path}")
+
+    def _log_breakdown(self, name, total):
+        """Muestra el desglose por fase con barras proporcionales."""
+        rows = sorted(self._phases.items(), key=lambda item: item[1], reverse=True)
+        other = total - sum(self._phases.values())
+        if other > 0:
+            rows.append(("otros", other))
+
+        logger.info(f"=== PERFIL: {name} (total {total:.2f}s) ===")
+        for phase_name, seconds in rows:
+            share = seconds / total if total > 0 else 0
+            bar = "█" * int(round(share * 40))
+            logger.info(f"{phase_name:<20} {seconds:>10.2f}s {share * 100:>6.1f}% {bar}")
+
+        if self._samples:
+            hottest = sorted(self._samples.items(), key=lambda item: item[1], reverse=True)[:5]
+            logger.info("Pilas más muestreadas:")
+            for stack, count in hottest:
+                logger.info(f"  {count:>6} ...;{';'.join(stack.split(';')[-3:])}")
+
+
+def create_profiler(mode=None, output_dir="perfiles"):
+    """Devuelve un LectureProfiler si se pidió --profile, o un NullProfiler en otro caso."""
+    if not mode:
+        return NullProfiler()
+    return LectureProfiler(mode, output_dir)
+
+
+def add_profile_arguments(parser):
+    """Añade --profile y --profile-dir a un argparse.ArgumentParser."""
+    parser.add_argument(
+        "--profile", nargs="?", const="timers", choices=PROFILE_MODES, default=None,
+        help="Activa el perfilado por fase (timers), con cProfile por fragmento (cprofile) o por muestreo (sample)"
+    )
+    parser.add_argument(
+        "--profile-dir", default="perfiles",
+        help="Directorio donde se guardan los perfiles (.folded / .prof)"
+    )
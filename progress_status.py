@@ -0,0 +1,255 @@
+"""
+Estado en vivo de las ejecuciones largas (scraper y transcriptor).
+Cada componente escribe cada pocos segundos `<PROGRESS_DIR>/<componente>.json` con la
+asignatura y el video en curso, los videos hechos y pendientes, el ritmo (bytes/s al
+descargar, segundos de audio por segundo real al transcribir) como media móvil de los
+últimos minutos y una ETA calculada con ese ritmo. `python cli.py status` lee esos
+archivos; con PROGRESS_PORT se publican además en http://127.0.0.1:<puerto>/status.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Unidad del trabajo continuo de cada componente: (clave del ritmo, formato para humanos)
+UNITS = {
+    "bytes": lambda rate: f"{rate / 1e6:.1f} MB/s",
+    "audio_seconds": lambda rate: f"{rate:.1f}x tiempo real",
+}
+
+
+def format_duration(seconds):
+    """1h 05m / 12m 30s / 45s."""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressStatus:
+    """Contadores de avance de un componente con ritmo por media móvil y ETA."""
+
+    def __init__(self, component, unit="bytes", directory="progress", port=None,
+                 interval_seconds=5.0, window_seconds=900.0):
+        if unit not in UNITS:
+            raise ValueError(f"Unidad de progreso no soportada: {unit}")
+        self.component = component
+        self.unit = unit
+        self.path = Path(directory) / f"{component}.json" if directory else None
+        self.interval_seconds = interval_seconds
+        self.window_seconds = window_seconds
+        self.started = time.time()
+        self.course = None
+        self.course_index = None
+        self.courses = None
+        self.current = None
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.work = 0.0
+        self.finished = False
+        self._samples = deque()  # (instante, trabajo, videos terminados)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._thread = threading.Thread(target=self._write_loop, daemon=True)
+            self._thread.start()
+        if port:
+            self.serve(int(port))
+
+    @classmethod
+    def from_env(cls, component, unit="bytes"):
+        """PROGRESS_DIR (vacío = sin archivo), PROGRESS_PORT, PROGRESS_INTERVAL y PROGRESS_WINDOW (s)."""
+        return cls(
+            component, unit,
+            directory=os.getenv("PROGRESS_DIR", "progress"),
+            port=os.getenv("PROGRESS_PORT"),
+            interval_seconds=float(os.getenv("PROGRESS_INTERVAL", "5")),
+            window_seconds=float(os.getenv("PROGRESS_WINDOW", "900")),
+        )
+
+    def set_course(self, course, index=None, total=None):
+        """Asignatura en curso (``index`` empieza en 0, como en process_course)."""
+        with self._lock:
+            self.course, self.course_index, self.courses = course, index, total
+
+    def set_current(self, item, course=None):
+        """Video en curso; el transcriptor cambia también de asignatura por video."""
+        with self._lock:
+            self.current = item
+            if course is not None:
+                self.course = course
+
+    def add_total(self, count=1):
+        """Videos descubiertos o encolados que faltan por procesar."""
+        with self._lock:
+            self.total += count
+
+    def add_work(self, amount):
+        """Bytes descargados o segundos de audio transcritos (llamado desde varios hilos)."""
+        with self._lock:
+            self.work += amount
+
+    def item_done(self, ok=True):
+        with self._lock:
+            self.done += 1
+            self.failed += int(not ok)
+
+    def _rates(self, now):
+        """(trabajo/s, videos/s) sobre la ventana móvil; None sin muestras suficientes."""
+        self._samples.append((now, self.work, self.done))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.window_seconds:
+            self._samples.popleft()
+        first_time, first_work, first_done = self._samples[0]
+        elapsed = now - first_time
+        if elapsed < 1:
+            return None, None
+        return (self.work - first_work) / elapsed, (self.done - first_done) / elapsed
+
+    def snapshot(self):
+        """Estado actual como dict serializable (lo que se escribe y se sirve)."""
+        now = time.time()
+        with self._lock:
+            work_rate, item_rate = self._rates(now)
+            remaining = max(self.total - self.done, 0)
+            eta = None
+            if remaining and self.done and work_rate:
+                # Trabajo medio por video terminado; el de los videos en curso ya está contado
+                remaining_work = max(self.total * self.work / self.done - self.work, 0)
+                eta = remaining_work / work_rate
+            elif remaining and item_rate:
+                eta = remaining / item_rate
+            return {
+                "component": self.component,
+                "pid": os.getpid(),
+                "started": self.started,
+                "updated": now,
+                "finished": self.finished,
+                "course": self.course,
+                "course_index": self.course_index,
+                "courses": self.courses,
+                "current": self.current,
+                "done": self.done,
+                "failed": self.failed,
+                "total": self.total,
+                "remaining": remaining,
+                "unit": self.unit,
+                "work": self.work,
+                "rate": work_rate,
+                "eta_seconds": eta,
+                "interval_seconds": self.interval_seconds,
+            }
+
+    def write(self):
+        """Escribe el archivo de estado de forma atómica."""
+        if not self.path:
+            return
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning(f"No se pudo escribir el estado de progreso: {e}")
+
+    def serve(self, port):
+        """Publica /status con el estado de todos los componentes del directorio."""
+        progress = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/status"):
+                    self.send_error(404)
+                    return
+                states = read_states(progress.path.parent) if progress.path else {}
+                states[progress.component] = progress.snapshot()
+                body = json.dumps(states, ensure_ascii=False, indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        except OSError as e:
+            # Otro proceso (el scraper o el transcriptor) ya publica el directorio en ese puerto
+            logger.warning(f"No se pudo abrir el puerto de progreso {port}: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Progreso disponible en http://127.0.0.1:{port}/status")
+
+    def close(self):
+        """Deja escrito el estado final y detiene el hilo y el servidor."""
+        self._stop.set()
+        with self._lock:
+            self.finished = True
+            self.current = None
+        try:
+            self.write()
+        except OSError as e:
+            logger.warning(f"No se pudo escribir el estado de progreso: {e}")
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+
+
+def read_states(directory):
+    """Estados de todos los componentes de un directorio de progreso."""
+    states = {}
+    for path in sorted(Path(directory).glob("*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        states[state.get("component", path.stem)] = state
+    return states
+
+
+def describe(state, now=None):
+    """Una línea legible del estado de un componente."""
+    now = now or time.time()
+    parts = [state["component"]]
+    if state.get("course"):
+        course = state["course"]
+        if state.get("courses"):
+            course += f" ({state['course_index'] + 1}/{state['courses']})"
+        parts.append(course)
+    videos = f"{state['done']}/{state['total']} videos" if state["total"] else f"{state['done']} videos"
+    if state["failed"]:
+        videos += f" ({state['failed']} fallidos)"
+    parts.append(videos)
+    if state.get("rate") is not None:
+        parts.append(UNITS.get(state["unit"], UNITS["bytes"])(state["rate"]))
+    if state["finished"]:
+        parts.append(f"terminado hace {format_duration(now - state['updated'])}")
+    elif now - state["updated"] > 3 * state.get("interval_seconds", 5):
+        # El proceso murió sin cerrar: el archivo ya no avanza
+        parts.append(f"sin actualizar desde hace {format_duration(now - state['updated'])}")
+    else:
+        if state.get("current"):
+            parts.append(f"en curso {state['current']}")
+        if state.get("eta_seconds") is not None:
+            parts.append(f"ETA {format_duration(state['eta_seconds'])}")
+    return " · ".join(parts)
@@ -0,0 +1,232 @@
+"""
+Política de peticiones compartida para el portal y la CDN de videos.
+Reintentos con backoff exponencial y jitter, circuit breaker por host y limitación
+por token bucket que se adapta (AIMD) cuando el servidor responde 429/503 o lento.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+
+class CircuitOpenError(Exception):
+    """El host acumula demasiados fallos seguidos y el circuito está abierto."""
+
+
+class TokenBucket:
+    """Token bucket con tasa ajustable; acquire() bloquea hasta que haya un token."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Cerrado -> abierto tras N fallos seguidos; semiabierto tras reset_timeout."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            # Semiabierto: deja pasar una petición de prueba cuando vence el plazo
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class HostPolicy:
+    """Estado por host: tasa adaptativa (aumento aditivo, reducción multiplicativa) y breaker."""
+
+    def __init__(self, host, rate, min_rate, max_rate, slow_seconds, failure_threshold, reset_timeout):
+        self.host = host
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.slow_seconds = slow_seconds
+        self.bucket = TokenBucket(rate)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._lock = threading.Lock()
+
+    def on_response(self, elapsed, throttled=False):
+        with self._lock:
+            rate = self.bucket.rate
+            if throttled or elapsed > self.slow_seconds:
+                new_rate = max(self.min_rate, rate / 2)
+                if new_rate < rate:
+                    logger.warning(f"🐢 {self.host}: reduciendo tasa a {new_rate:.2f} req/s")
+            else:
+                new_rate = min(self.max_rate, rate + 0.1)
+            self.bucket.rate = new_rate
+
+
+class RequestPolicy:
+    """Reintentos, circuit breaking y rate limiting por host, seguros entre hilos."""
+
+    def __init__(self, max_retries=4, base_delay=1.0, max_delay=60.0, rate=2.0, min_rate=0.1,
+                 max_rate=10.0, slow_seconds=15.0, failure_threshold=5, reset_timeout=60.0, timeout=(10, 60)):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.slow_seconds = slow_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """REQUEST_MAX_RETRIES, REQUEST_RATE, REQUEST_MAX_RATE y REQUEST_SLOW_SECONDS."""
+        return cls(
+            max_retries=int(os.getenv("REQUEST_MAX_RETRIES", "4")),
+            rate=float(os.getenv("REQUEST_RATE", "2")),
+            max_rate=float(os.getenv("REQUEST_MAX_RATE", "10")),
+            slow_seconds=float(os.getenv("REQUEST_SLOW_SECONDS", "15")),
+        )
+
+    def host(self, key):
+        """Devuelve (creándolo si hace falta) el estado del host; acepta URL o nombre."""
+        name = urlparse(key).netloc or key
+        with self._lock:
+            if name not in self._hosts:
+                self._hosts[name] = HostPolicy(
+                    name, self.rate, self.min_rate, self.max_rate, self.slow_seconds,
+                    self.failure_threshold, self.reset_timeout
+                )
+            return self._hosts[name]
+
+    def backoff(self, attempt, retry_after=None):
+        """Espera exponencial con jitter completo (respeta Retry-After si es mayor)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after:
+            delay = max(delay, min(self.max_delay, retry_after))
+        time.sleep(delay)
+
+    def request(self, method, url, **kwargs):
+        """Petición HTTP con reintentos ante errores de red y códigos 429/5xx."""
+        host = self.host(url)
+        kwargs.setdefault("timeout", self.timeout)
+        last_error = None
+        network_throttled = False
+
+        for attempt in range(self.max_retries + 1):
+            if not host.breaker.allow():
+                raise CircuitOpenError(f"Circuito abierto para {host.host}")
+            host.bucket.acquire()
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                host.breaker.record_failure()
+                # Una caída de red reduce la tasa una sola vez por petición, no en cada reintento
+                if not network_throttled:
+                    host.on_response(time.monotonic() - start, throttled=True)
+                    network_throttled = True
+                last_error = e
+                logger.warning(f"Error de red con {host.host} (intento {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    self.backoff(attempt)
+                continue
+
+            host.on_response(time.monotonic() - start, throttled=response.status_code in THROTTLE_STATUS)
+            if response.status_code not in RETRY_STATUS:
+                host.breaker.record_success()
+                return response
+
+            host.breaker.record_failure()
+            last_error = requests.HTTPError(f"{response.status_code} para {url}", response=response)
+            logger.warning(f"{host.host} respondió {response.status_code} (intento {attempt + 1})")
+            retry_after = _retry_after_seconds(response.headers.get("Retry-After"))
+            response.close()
+            if attempt < self.max_retries:
+                self.backoff(attempt, retry_after)
+
+        raise last_error
+
+    def call(self, key, func, *args, retry_on=(Exception,), **kwargs):
+        """Ejecuta ``func`` con la misma política del host ``key`` (p. ej. navegación Selenium).
+
+        Se reintenta cuando ``func`` lanza una de ``retry_on``; el tiempo de cada intento
+        alimenta el ajuste de tasa igual que una petición HTTP.
+        """
+        host = self.host(key)
+        for attempt in range(self.max_retries + 1):
+            if not host.breaker.allow():
+                raise CircuitOpenError(f"Circuito abierto para {host.host}")
+            host.bucket.acquire()
+            start = time.monotonic()
+            try:
+                result = func(*args, **kwargs)
+            except retry_on as e:
+                host.breaker.record_failure()
+                host.on_response(time.monotonic() - start)
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"Fallo en {host.host} (intento {attempt + 1}/{self.max_retries + 1}): {e}")
+                self.backoff(attempt)
+                continue
+            host.breaker.record_success()
+            host.on_response(time.monotonic() - start)
+            return result
+
+
+def _retry_after_seconds(value):
+    """Interpreta Retry-After como segundos o como fecha HTTP."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
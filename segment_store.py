@@ -0,0 +1,336 @@
+"""
+Almacén columnar de segmentos de transcripción en disco.
+Los tiempos (ms, int32) y el fin de cada texto en el blob (int64) se guardan como arrays
+binarios de NumPy que se abren con memmap; los textos van concatenados en un único blob
+UTF-8 también mapeado en memoria. Leer una clase o un intervalo de tiempo solo toca las
+páginas necesarias, sin cargar todo el almacén. Las clases se añaden al final de los
+archivos; lectures.json indica qué rango de segmentos pertenece a cada una.
+Varios procesos (transcriptor, --watch, workers de la cola) comparten el almacén: cada
+escritura toma el bloqueo <almacén>.lock y parte del lectures.json que hay en disco.
+
+Uso:
+    python segment_store.py list --course "Big Data"
+    python segment_store.py show "<asignatura>/2025-03-04" --start 10:00 --end 15:00
+    python segment_store.py compact
+"""
+
+import os
+import json
+import shutil
+import logging
+import argparse
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+TIME_DTYPE = np.int32   # milisegundos: ~24 días de margen por clase
+OFFSET_DTYPE = np.int64  # fin (exclusivo) de cada texto dentro del blob
+COLUMNS = {"starts": TIME_DTYPE, "ends": TIME_DTYPE, "text_ends": OFFSET_DTYPE}
+TEXT_FILE = "text.bin"
+META_FILE = "lectures.json"
+
+
+class LectureSegments:
+    """Vista de solo lectura de los segmentos de una clase (sin copiar los arrays)."""
+
+    def __init__(self, store, key, count, text_start, starts, ends, text_ends, text):
+        self.store = store
+        self.key = key
+        self.count = count
+        self.text_start = text_start
+        self.starts = starts  # ms, vistas sobre el memmap
+        self.ends = ends
+        self._text_ends = text_ends
+        self._text = text  # blob mapeado al abrir la vista: sigue valiendo aunque otro proceso compacte
+
+    def __len__(self):
+        return self.count
+
+    def text(self, i):
+        end = int(self._text_ends[i])
+        start = int(self._text_ends[i - 1]) if i > 0 else self.text_start
+        return self._text[start:end].tobytes().decode("utf-8")
+
+    def between(self, start_seconds, end_seconds):
+        """Segmentos que se solapan con [start_seconds, end_seconds) como (inicio, fin, texto) en segundos."""
+        lo = int(np.searchsorted(self.ends, start_seconds * 1000, side="right"))
+        hi = int(np.searchsorted(self.starts, end_seconds * 1000, side="left"))
+        return [self[i] for i in range(lo, max(lo, hi))]
+
+    def __getitem__(self, i):
+        return int(self.starts[i]) / 1000, int(self.ends[i]) / 1000, self.text(i)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+
+class SegmentStore:
+    """Arrays de tiempos y offsets + blob de texto, ampliables clase a clase."""
+
+    def __init__(self, root="segment_store"):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._maps = None
+        self._meta_stamp = None
+        # Con el bloqueo nadie está a mitad de un append: lo que pase de lectures.json es de un corte
+        with self._store_lock():
+            self._recover_compaction()
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._meta = self._load_meta()
+            self._truncate_to_meta()
+
+    @classmethod
+    def from_env(cls):
+        """SEGMENT_STORE: directorio del almacén de segmentos."""
+        return cls(os.getenv("SEGMENT_STORE", "segment_store"))
+
+    # --- ESCRITURA ---
+    def add_lecture(self, key, segments, course=None, date=None):
+        """Añade (o sustituye) los segmentos (inicio, fin, texto) en segundos de una clase."""
+        segments = sorted(segments, key=lambda s: s[0])
+        encoded = [text.encode("utf-8") for _, _, text in segments]
+        with self._lock, self._store_lock():
+            self._sync_meta()  # otro proceso puede haber añadido clases o compactado
+            first = self._meta["segments"]
+            base = self._meta["text_bytes"]
+            lengths = np.fromiter((len(b) for b in encoded), dtype=OFFSET_DTYPE, count=len(encoded))
+            columns = {
+                "starts": np.array([round(s[0] * 1000) for s in segments], dtype=TIME_DTYPE),
+                "ends": np.array([round(s[1] * 1000) for s in segments], dtype=TIME_DTYPE),
+                "text_ends": base + np.cumsum(lengths, dtype=OFFSET_DTYPE),
+            }
+            for name, values in columns.items():
+                with open(self.root / f"{name}.bin", "ab") as f:
+                    f.write(values.tobytes())
+            with open(self.root / TEXT_FILE, "ab") as f:
+                f.write(b"".join(encoded))
+
+            # Una clase re-transcrita apunta al nuevo rango; el antiguo queda huérfano hasta compact()
+            replaced = key in self._meta["lectures"]
+            self._meta["lectures"][key] = {
+                "course": course, "date": date, "first": first, "count": len(segments), "text_start": int(base)
+            }
+            self._meta["segments"] = first + len(segments)
+            self._meta["text_bytes"] = int(base + lengths.sum())
+            self._save_meta()
+            self._maps = None
+        suffix = " (sustituye la versión anterior)" if replaced else ""
+        logger.info(f"🧱 {len(segments)} segmentos guardados para {key}{suffix}")
+
+    def compact(self):
+        """Reescribe el almacén sin los rangos huérfanos de clases sustituidas.
+
+        Las columnas compactadas y lectures.json se escriben en un directorio hermano que
+        sustituye al actual con os.replace: un corte a mitad deja intacto el almacén antiguo.
+        """
+        compact_root = self._sibling(".compact")
+        old_root = self._sibling(".old")
+        with self._lock, self._store_lock():
+            self._sync_meta()
+            live = sum(entry["count"] for entry in self._meta["lectures"].values())
+            removed = self._meta["segments"] - live
+            if removed == 0:
+                return 0
+            meta = self._write_compacted(compact_root)
+            # Sin cerrar los memmap, Windows no deja mover ni borrar los archivos
+            self._maps = None
+            os.replace(self.root, old_root)
+            os.replace(compact_root, self.root)
+            shutil.rmtree(old_root, ignore_errors=True)
+            self._meta = meta
+            self._meta_stamp = self._stamp()
+        logger.info(f"🧱 Almacén compactado: {removed} segmentos huérfanos eliminados")
+        return removed
+
+    def _write_compacted(self, compact_root):
+        """Copia los rangos vivos a ``compact_root`` y devuelve sus metadatos; quien llama tiene el lock."""
+        shutil.rmtree(compact_root, ignore_errors=True)
+        compact_root.mkdir(parents=True)
+        maps = self._open_maps()
+        meta = {"segments": 0, "text_bytes": 0, "lectures": {}}
+        files = {name: open(compact_root / f"{name}.bin", "wb") for name in COLUMNS}
+        files[TEXT_FILE] = open(compact_root / TEXT_FILE, "wb")
+        try:
+            for key, entry in self._meta["lectures"].items():
+                first, count, text_start = entry["first"], entry["count"], entry["text_start"]
+                text_ends = maps["text_ends"][first:first + count]
+                text_end = int(text_ends[-1]) if count else text_start
+                files["starts"].write(maps["starts"][first:first + count].tobytes())
+                files["ends"].write(maps["ends"][first:first + count].tobytes())
+                files["text_ends"].write((text_ends - text_start + meta["text_bytes"]).tobytes())
+                files[TEXT_FILE].write(maps["text"][text_start:text_end].tobytes())
+                meta["lectures"][key] = dict(entry, first=meta["segments"], text_start=meta["text_bytes"])
+                meta["segments"] += count
+                meta["text_bytes"] += text_end - text_start
+        finally:
+            for f in files.values():
+                f.close()
+        # lectures.json se escribe el último: marca que el directorio compactado está completo
+        self._write_meta(compact_root, meta)
+        return meta
+
+    def _sibling(self, suffix):
+        return self.root.with_name(self.root.name + suffix)
+
+    def _store_lock(self):
+        # Junto al directorio, no dentro: compact() lo sustituye entero
+        return FileLock(self._sibling(".lock"))
+
+    def _recover_compaction(self):
+        """Termina o descarta una compactación interrumpida por un corte."""
+        compact_root = self._sibling(".compact")
+        old_root = self._sibling(".old")
+        if not self.root.exists():
+            # Corte entre los dos os.replace: el compactado ya estaba completo
+            if (compact_root / META_FILE).exists():
+                os.replace(compact_root, self.root)
+            elif old_root.exists():
+                os.replace(old_root, self.root)
+        for leftover in (compact_root, old_root):
+            shutil.rmtree(leftover, ignore_errors=True)
+
+    # --- LECTURA ---
+    def keys(self, course=None):
+        with self._lock:
+            self._sync_meta()
+            return [key for key, entry in self._meta["lectures"].items()
+                    if course is None or entry.get("course") == course]
+
+    def info(self, key):
+        with self._lock:
+            self._sync_meta()
+            return dict(self._meta["lectures"][key])
+
+    def lecture(self, key):
+        """Segmentos de una clase como vistas sobre los arrays mapeados (KeyError si no existe)."""
+        with self._lock:
+            self._sync_meta()
+            entry = self._meta["lectures"][key]
+            maps = self._open_maps()
+        first, count = entry["first"], entry["count"]
+        return LectureSegments(
+            self, key, count, entry["text_start"],
+            maps["starts"][first:first + count], maps["ends"][first:first + count],
+            maps["text_ends"][first:first + count], maps["text"]
+        )
+
+    def between(self, key, start_seconds, end_seconds):
+        """Atajo: segmentos de ``key`` que se solapan con el intervalo dado (en segundos)."""
+        return self.lecture(key).between(start_seconds, end_seconds)
+
+    def _open_maps(self):
+        """Memmaps de las columnas y del blob; quien llama tiene el lock."""
+        if self._maps is None:
+            count = self._meta["segments"]
+            self._maps = {
+                name: (np.memmap(self.root / f"{name}.bin", dtype=dtype, mode="r", shape=(count,))
+                       if count else np.empty(0, dtype=dtype))
+                for name, dtype in COLUMNS.items()
+            }
+            text_bytes = self._meta["text_bytes"]
+            self._maps["text"] = (np.memmap(self.root / TEXT_FILE, dtype=np.uint8, mode="r", shape=(text_bytes,))
+                                  if text_bytes else np.empty(0, dtype=np.uint8))
+        return self._maps
+
+    # --- METADATOS ---
+    def _sync_meta(self):
+        """Recarga lectures.json si otro proceso lo ha cambiado; quien llama tiene el lock."""
+        if self._meta_stamp != self._stamp():
+            self._meta = self._load_meta()
+            self._maps = None
+
+    def _stamp(self):
+        try:
+            stat = (self.root / META_FILE).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load_meta(self):
+        meta_path = self.root / META_FILE
+        self._meta_stamp = self._stamp()
+        meta = {"segments": 0, "text_bytes": 0, "lectures": {}}
+        if meta_path.exists():
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Metadatos del almacén de segmentos ilegibles ({e}); se empieza uno nuevo")
+                meta = {"segments": 0, "text_bytes": 0, "lectures": {}}
+        return meta
+
+    def _save_meta(self):
+        self._write_meta(self.root, self._meta)
+        self._meta_stamp = self._stamp()
+
+    @staticmethod
+    def _write_meta(root, meta):
+        meta_path = root / META_FILE
+        tmp_path = meta_path.with_name(META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, meta_path)
+
+    def _truncate_to_meta(self):
+        """Descarta lo escrito después del último lectures.json válido (p. ej. tras un corte)."""
+        sizes = {f"{name}.bin": self._meta["segments"] * np.dtype(dtype).itemsize for name, dtype in COLUMNS.items()}
+        sizes[TEXT_FILE] = self._meta["text_bytes"]
+        for name, size in sizes.items():
+            path = self.root / name
+            if path.exists() and path.stat().st_size > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+
+def parse_offset(value):
+    """Acepta segundos, MM:SS o H:MM:SS."""
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def main(argv=None):
+    from logging_setup import setup_logging
+    from transcript_index import format_offset
+
+    parser = argparse.ArgumentParser(description="Consulta del almacén de segmentos de transcripción")
+    parser.add_argument("--root", default=os.getenv("SEGMENT_STORE", "segment_store"),
+                        help="Directorio del almacén (por defecto SEGMENT_STORE o segment_store)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    listing = subparsers.add_parser("list", help="Lista las clases almacenadas")
+    listing.add_argument("--course", help="Solo las de esta asignatura")
+    show = subparsers.add_parser("show", help="Muestra los segmentos de una clase")
+    show.add_argument("key", help="Clave <asignatura>/<fecha> (ver 'list')")
+    show.add_argument("--start", type=parse_offset, default=0.0, help="Inicio (s, MM:SS o H:MM:SS)")
+    show.add_argument("--end", type=parse_offset, default=float("inf"), help="Fin (s, MM:SS o H:MM:SS)")
+    subparsers.add_parser("compact", help="Elimina los segmentos huérfanos de clases re-transcritas")
+    args = parser.parse_args(argv)
+
+    setup_logging('segment_store.log')
+    store = SegmentStore(args.root)
+    if args.command == "list":
+        for key in store.keys(args.course):
+            print(f"{key}  ({store.info(key)['count']} segmentos)")
+    elif args.command == "show":
+        try:
+            lecture = store.lecture(args.key)
+        except KeyError:
+            print(f"❌ Clase no encontrada: {args.key}")
+            return False
+        end = min(args.end, 2 ** 31 / 1000)
+        for start, stop, text in lecture.between(args.start, end):
+            print(f"[{format_offset(start)}-{format_offset(stop)}] {text}")
+    else:
+        store.compact()
+    return True
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
@@ -0,0 +1,264 @@
+"""
+Gestor de almacenamiento compartido por scraper y transcriptor.
+Comprueba el espacio libre antes de cada descarga/extracción, pausa la etapa mientras
+el disco esté por debajo de la marca de agua y aplica la política de retención
+(borrar MP4 y audio una vez existe una transcripción verificada).
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+from file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+# Políticas de retención:
+#   keep             -> no se borra nada (comportamiento original)
+#   after_transcript -> se borran video y audio en cuanto la transcripción se verifica
+#   on_pressure      -> se conservan hasta que falte espacio; entonces se borran los más antiguos
+RETENTION_POLICIES = ("keep", "after_transcript", "on_pressure")
+
+# Estimaciones cuando no hay Content-Length o duración disponible
+DEFAULT_VIDEO_BYTES = int(1.5 * GB)
+AUDIO_BYTES_PER_SECOND = {"wav": 32000, "flac": 20000, "opus": 4000}
+
+MARKER_RE = re.compile(r"\[⏱️ (\d+):(\d{2})\]")
+FAILED_CHUNK_MARK = "[⚠️ No se generó salida en este fragmento]"
+
+
+def content_length(headers):
+    """Devuelve Content-Length como entero, o 0 si no viene en la respuesta."""
+    try:
+        return int(headers.get("Content-Length", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def estimate_audio_bytes(duration_seconds, audio_format="flac"):
+    """Estima el tamaño del audio intermedio a partir de la duración del video."""
+    return int(duration_seconds * AUDIO_BYTES_PER_SECOND.get(audio_format, AUDIO_BYTES_PER_SECOND["wav"]))
+
+
+def verify_transcript(transcript_path, duration=None):
+    """Una transcripción es válida si no está vacía, no tiene fragmentos fallidos
+    y su última marca temporal cubre la duración del audio (cuando se conoce)."""
+    transcript_path = Path(transcript_path)
+    if not transcript_path.exists() or transcript_path.stat().st_size == 0:
+        return False
+    text = transcript_path.read_text(encoding="utf-8", errors="replace")
+    if FAILED_CHUNK_MARK in text:
+        return False
+    markers = MARKER_RE.findall(text)
+    if not markers:
+        return False
+    if duration:
+        minutes, seconds = markers[-1]
+        if int(minutes) * 60 + int(seconds) < duration - 60:
+            return False
+    return True
+
+
+class StorageManager:
+    """Reserva espacio por etapa, pausa por marca de agua y aplica retención."""
+
+    def __init__(self, min_free_bytes=5 * GB, resume_free_bytes=None, retention="keep",
+                 ledger_path="retention_ledger.json", poll_interval=30, max_wait=None, margin=1.1,
+                 sources_path="video_sources.json"):
+        if retention not in RETENTION_POLICIES:
+            raise ValueError(f"Política de retención desconocida: {retention}")
+        self.min_free_bytes = min_free_bytes
+        self.resume_free_bytes = resume_free_bytes if resume_free_bytes is not None else min_free_bytes * 2
+        self.retention = retention
+        self.ledger_path = Path(ledger_path)
+        self.sources_path = Path(sources_path)
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.margin = margin
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """STORAGE_MIN_FREE_GB, STORAGE_RESUME_FREE_GB, STORAGE_RETENTION, STORAGE_LEDGER,
+        STORAGE_POLL_SECONDS, STORAGE_MAX_WAIT_SECONDS (vacío = esperar indefinidamente) y
+        VIDEO_SOURCES (enlace del listado de cada video descargado)."""
+        min_free = float(os.getenv("STORAGE_MIN_FREE_GB", "5"))
+        resume_free = os.getenv("STORAGE_RESUME_FREE_GB")
+        max_wait = os.getenv("STORAGE_MAX_WAIT_SECONDS")
+        return cls(
+            min_free_bytes=int(min_free * GB),
+            resume_free_bytes=int(float(resume_free) * GB) if resume_free else None,
+            retention=os.getenv("STORAGE_RETENTION", "keep"),
+            ledger_path=os.getenv("STORAGE_LEDGER", "retention_ledger.json"),
+            poll_interval=float(os.getenv("STORAGE_POLL_SECONDS", "30")),
+            max_wait=float(max_wait) if max_wait else None,
+            sources_path=os.getenv("VIDEO_SOURCES", "video_sources.json"),
+        )
+
+    # --- ESPACIO LIBRE ---
+    @staticmethod
+    def free_bytes(path):
+        """Espacio libre del volumen que contiene ``path`` (aunque aún no exista)."""
+        path = Path(path).resolve()
+        while not path.exists() and path != path.parent:
+            path = path.parent
+        return shutil.disk_usage(path).free
+
+    def has_room(self, path, needed_bytes):
+        """True si tras escribir ``needed_bytes`` quedaría por encima de la marca mínima."""
+        return self.free_bytes(path) - needed_bytes * self.margin >= self.min_free_bytes
+
+    def reserve(self, path, needed_bytes, stage):
+        """Bloquea la etapa hasta que haya espacio; devuelve False si se agota max_wait."""
+        if self.has_room(path, needed_bytes):
+            return True
+
+        self.reclaim(needed_bytes * self.margin + self.resume_free_bytes - self.free_bytes(path))
+        started = time.monotonic()
+        logged = False
+        while self.free_bytes(path) - needed_bytes * self.margin < self.resume_free_bytes:
+            if not logged:
+                logger.warning(
+                    f"⏸️ Etapa '{stage}' en pausa: {self.free_bytes(path) / GB:.1f} GB libres, "
+                    f"se necesitan {needed_bytes / GB:.2f} GB + {self.resume_free_bytes / GB:.1f} GB de margen"
+                )
+                logged = True
+            if self.max_wait is not None and time.monotonic() - started >= self.max_wait:
+                logger.error(f"Sin espacio suficiente para '{stage}' tras {self.max_wait:.0f}s de espera")
+                return False
+            time.sleep(self.poll_interval)
+            self.reclaim(needed_bytes * self.margin + self.resume_free_bytes - self.free_bytes(path))
+
+        if logged:
+            logger.info(f"▶️ Etapa '{stage}' reanudada ({self.free_bytes(path) / GB:.1f} GB libres)")
+        return True
+
+    # --- RETENCIÓN ---
+    def mark_transcribed(self, video_path, audio_path, transcript_path, duration=None):
+        """Registra una clase transcrita; si la transcripción es válida aplica la retención."""
+        if not verify_transcript(transcript_path, duration):
+            logger.warning(f"Transcripción no verificada, se conservan los originales: {transcript_path}")
+            return False
+
+        entry = {
+            "video": os.path.realpath(video_path) if video_path else None,
+            "link": self.source_link(video_path) if video_path else None,
+            "audio": os.path.realpath(audio_path) if audio_path else None,
+            "transcript": os.path.realpath(transcript_path),
+            "duration": duration,
+            "verified_at": time.time(),
+        }
+        with self._updating(self.ledger_path):
+            ledger = self._load_ledger()
+            ledger[entry["transcript"]] = entry
+            self._save_ledger(ledger)
+
+        if self.retention == "after_transcript":
+            self._delete_media(entry)
+        return True
+
+    def is_transcribed(self, video_path):
+        """True si el video ya tiene transcripción verificada (aunque se haya borrado por retención).
+
+        Si la retención borró un video y otra grabación del mismo día reutilizó su nombre,
+        el enlace del listado las distingue.
+        """
+        link = self.source_link(video_path)
+        video_path = os.path.realpath(video_path)
+        with self._lock:
+            return any(
+                entry.get("video") == video_path and (not link or not entry.get("link") or entry["link"] == link)
+                for entry in self._load_ledger().values()
+            )
+
+    def is_link_transcribed(self, link):
+        """True si la grabación de ese enlace del listado ya tiene transcripción verificada."""
+        with self._lock:
+            return any(entry.get("link") == link for entry in self._load_ledger().values())
+
+    # --- ORIGEN DE LOS VIDEOS (lo escribe el scraper; el transcriptor lo lee) ---
+    def record_source(self, video_path, link):
+        """Asocia un video descargado al enlace de su grabación en el listado."""
+        with self._updating(self.sources_path):
+            sources = self._load_json(self.sources_path, "Registro de orígenes")
+            sources[os.path.realpath(video_path)] = link
+            self._save_json(self.sources_path, sources)
+
+    def source_link(self, video_path):
+        with self._lock:
+            return self._load_json(self.sources_path, "Registro de orígenes").get(os.path.realpath(video_path))
+
+    def reclaim(self, bytes_needed):
+        """Con política on_pressure borra medios de las clases verificadas más antiguas."""
+        if self.retention == "keep" or bytes_needed <= 0:
+            return 0
+        freed = 0
+        with self._lock:
+            ledger = self._load_ledger()
+            for entry in sorted(ledger.values(), key=lambda e: e.get("verified_at", 0)):
+                if freed >= bytes_needed:
+                    break
+                freed += self._delete_media(entry)
+        if freed:
+            logger.info(f"♻️ Retención: liberados {freed / GB:.2f} GB de clases ya transcritas")
+        return freed
+
+    def _delete_media(self, entry):
+        freed = 0
+        for key in ("video", "audio"):
+            media = entry.get(key)
+            if media and os.path.exists(media):
+                size = os.path.getsize(media)
+                try:
+                    os.remove(media)
+                    freed += size
+                    logger.info(f"🗑️ Eliminado {key}: {media}")
+                except OSError as e:
+                    logger.warning(f"No se pudo eliminar {media}: {e}")
+        return freed
+
+    def _load_ledger(self):
+        return self._load_json(self.ledger_path, "Registro de retención")
+
+    def _save_ledger(self, ledger):
+        self._save_json(self.ledger_path, ledger)
+
+    @contextmanager
+    def _updating(self, path):
+        """Lectura-modificación-escritura de un registro JSON sin perder entradas de otros procesos.
+
+        Scraper, transcriptor, vigilancia y workers de la cola escriben los mismos registros.
+        """
+        with self._lock, FileLock(path.with_name(path.name + ".lock")):
+            yield
+
+    @staticmethod
+    def _load_json(path, description):
+        if not path.exists():
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"{description} ilegible ({e}); se empieza uno nuevo")
+            return {}
+
+    @staticmethod
+    def _save_json(path, data):
+        fd, tmp_name = tempfile.mkstemp(prefix=f"{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
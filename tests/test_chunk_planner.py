@@ -0,0 +1,54 @@
+"""
+Prueba del planificador de fragmentos con rasgos sintéticos (sin ffmpeg).
+Una voz continua cuyo volumen varía no debe darse nunca por silencio; un silencio real
+(micrófono cortado) sí se aísla como fragmento silencioso.
+
+    python -m pytest tests/test_chunk_planner.py
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chunk_planner import FRAME_SECONDS, plan_chunks  # noqa: E402
+
+FRAMES_PER_SECOND = int(1 / FRAME_SECONDS)
+
+
+def _drifting_speech(seconds, rng):
+    """Energía (dBFS) de una voz continua: deriva de 4 dB por bloques de 5 s y ±6 dB por trama."""
+    blocks = -25 + rng.normal(0, 4, seconds // 5 + 1)
+    energy = np.repeat(blocks, 5 * FRAMES_PER_SECOND)[:seconds * FRAMES_PER_SECOND]
+    return energy + rng.uniform(-6, 6, len(energy))
+
+
+class PlanChunksTest(unittest.TestCase):
+    def test_drifting_speech_is_never_silent(self):
+        rng = np.random.default_rng(0)
+        energy = _drifting_speech(3600, rng)
+        flux = rng.random(len(energy))
+        chunks = plan_chunks(energy, flux, 3600.0)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual([c for c in chunks if c["silent"]], [])
+        self.assertEqual(chunks[0]["start"], 0.0)
+        self.assertEqual(chunks[-1]["end"], 3600.0)
+
+    def test_true_silence_is_isolated(self):
+        rng = np.random.default_rng(1)
+        silence = -80 + rng.normal(0, 2, 120 * FRAMES_PER_SECOND)
+        energy = np.concatenate([silence, _drifting_speech(900, rng)])
+        flux = rng.random(len(energy))
+        chunks = plan_chunks(energy, flux, 1020.0)
+        silent = [c for c in chunks if c["silent"]]
+        self.assertEqual(len(silent), 1)
+        self.assertAlmostEqual(silent[0]["start"], 0.0)
+        self.assertAlmostEqual(silent[0]["end"], 120.0, delta=1.0)
+        self.assertFalse(any(c["silent"] for c in chunks if c["start"] >= 120.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Prueba local de la cola con varios procesos worker sobre la misma base de datos.
+Los workers son procesos reales (multiprocessing): cada tarea debe reclamarse una sola
+vez y un arrendamiento caducado debe poder recuperarlo otro worker.
+
+    python -m pytest tests/test_work_queue.py
+    python -m unittest tests.test_work_queue
+"""
+
+import os
+import sys
+import time
+import tempfile
+import unittest
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from work_queue import WorkQueue  # noqa: E402
+
+TASKS = 40
+WORKERS = 4
+
+
+def _drain(db_path, worker_id, claims):
+    """Worker mínimo: reclama y completa hasta vaciar la cola, anotando cada reclamación."""
+    queue = WorkQueue(db_path)
+    try:
+        while True:
+            task = queue.claim(worker_id, lease_seconds=60)
+            if task is None:
+                break
+            claims.put((task["id"], worker_id))
+            time.sleep(0.01)  # simula trabajo para que los workers se solapen
+            queue.complete(task["id"], worker_id, "ok")
+    finally:
+        queue.close()
+
+
+def _claim_and_die(db_path, worker_id, lease_seconds, now, claims):
+    """Reclama una tarea en el instante ``now`` y muere sin completarla ni renovar el arrendamiento."""
+    queue = WorkQueue(db_path)
+    task = queue.claim(worker_id, lease_seconds=lease_seconds, now=now)
+    claims.put((task["id"], task["attempt"]))
+    claims.close()
+    claims.join_thread()  # os._exit no espera al hilo que vacía la cola de multiprocessing
+    os._exit(0)
+
+
+class WorkQueueProcessesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "work_queue.db"
+        self.ctx = multiprocessing.get_context("spawn")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _enqueue(self, count):
+        queue = WorkQueue(self.db_path)
+        try:
+            for n in range(count):
+                queue.enqueue(f"C{n % 3}/2025-06-{n % 28 + 1:02d}_{n}.mp4", f"C{n % 3}", priority=n)
+        finally:
+            queue.close()
+
+    def test_each_task_claimed_once(self):
+        self._enqueue(TASKS)
+        claims = self.ctx.Queue()
+        workers = [
+            self.ctx.Process(target=_drain, args=(str(self.db_path), f"w{n}", claims)) for n in range(WORKERS)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=120)
+            self.assertEqual(worker.exitcode, 0)
+
+        claimed = [claims.get(timeout=5) for _ in range(TASKS)]
+        self.assertTrue(claims.empty())
+        task_ids = [task_id for task_id, _ in claimed]
+        self.assertEqual(len(task_ids), len(set(task_ids)), "una tarea se reclamó más de una vez")
+        self.assertEqual(len(set(task_ids)), TASKS)
+
+        queue = WorkQueue(self.db_path)
+        try:
+            self.assertEqual(queue.counts()["done"], TASKS)
+        finally:
+            queue.close()
+
+    def test_expired_lease_is_reclaimed(self):
+        # Reloj inyectado: la caducidad no depende de lo cargada que esté la máquina
+        start = time.time()
+        self._enqueue(1)
+        claims = self.ctx.Queue()
+        dead = self.ctx.Process(target=_claim_and_die, args=(str(self.db_path), "dead", 60, start, claims))
+        dead.start()
+        dead.join(timeout=60)
+        task_id, attempt = claims.get(timeout=5)
+        self.assertEqual(attempt, 1)
+
+        queue = WorkQueue(self.db_path)
+        try:
+            # Mientras el arrendamiento está vigente nadie más puede reclamarla
+            self.assertIsNone(queue.claim("alive", lease_seconds=60, now=start + 59))
+            task = queue.claim("alive", lease_seconds=60, now=start + 61)
+            self.assertIsNotNone(task)
+            self.assertEqual((task["id"], task["attempt"]), (task_id, 2))
+            # El worker muerto ya no es el dueño: ni renueva ni su resultado tardío cuenta
+            self.assertFalse(queue.heartbeat(task_id, "dead", 60, now=start + 62))
+            self.assertTrue(queue.heartbeat(task_id, "alive", 60, now=start + 62))
+            self.assertFalse(queue.complete(task_id, "dead", "tarde"))
+            self.assertTrue(queue.complete(task_id, "alive", "ok"))
+            self.assertEqual(queue.counts()["done"], 1)
+        finally:
+            queue.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
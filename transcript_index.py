@@ -0,0 +1,240 @@
+"""
+Índice de búsqueda de texto completo sobre las transcripciones (SQLite FTS5).
+Cada bloque entre marcas [⏱️ MM:00] se guarda como un segmento con su asignatura, fecha
+e intervalo de tiempo. El transcriptor indexa cada clase al terminarla; las que no han
+cambiado (mismo tamaño y mtime) no se vuelven a procesar.
+
+Uso:
+    python transcript_index.py build transcripciones/
+    python transcript_index.py search "MapReduce" --course "Big Data" --since 2025-03-01
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+
+from logging_setup import setup_logging
+from storage_manager import MARKER_RE, FAILED_CHUNK_MARK
+
+logger = logging.getLogger(__name__)
+
+EMPTY_CHUNK_MARK = "[⚠️ Fragmento sin voz detectada]"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lectures (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    course TEXT,
+    date TEXT,
+    size INTEGER,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    lecture_id INTEGER NOT NULL REFERENCES lectures(id) ON DELETE CASCADE,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_lecture ON segments(lecture_id, start);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def parse_transcript(text):
+    """Divide una transcripción en segmentos (inicio, fin, texto) en segundos.
+
+    Cada marca cierra el bloque anterior: el texto que la precede va desde la marca
+    previa (o 0) hasta ella. Los avisos de fragmento fallido o sin voz se descartan.
+    """
+    segments = []
+    previous_end = 0.0
+    position = 0
+    for match in MARKER_RE.finditer(text):
+        end = int(match.group(1)) * 60 + int(match.group(2))
+        block = text[position:match.start()].strip()
+        if block and block not in (FAILED_CHUNK_MARK, EMPTY_CHUNK_MARK):
+            segments.append((previous_end, float(end), block))
+        previous_end = float(end)
+        position = match.end()
+    tail = text[position:].strip()
+    if tail and tail not in (FAILED_CHUNK_MARK, EMPTY_CHUNK_MARK):
+        segments.append((previous_end, previous_end, tail))
+    return segments
+
+
+def format_offset(seconds):
+    """Segundos -> MM:SS (o H:MM:SS en clases de más de una hora)."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+class TranscriptIndex:
+    """Índice FTS5 incremental de transcripciones por asignatura, fecha y minuto."""
+
+    def __init__(self, db_path="transcripts_index.db"):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """TRANSCRIPT_INDEX: ruta de la base de datos del índice."""
+        return cls(os.getenv("TRANSCRIPT_INDEX", "transcripts_index.db"))
+
+    def index_transcript(self, transcript_path, course=None, date=None):
+        """Indexa (o reindexa si cambió) una transcripción; devuelve los segmentos añadidos."""
+        transcript_path = Path(transcript_path)
+        path = os.path.realpath(transcript_path)
+        try:
+            stat = transcript_path.stat()
+            text = transcript_path.read_text(encoding="utf-8", errors="replace")
+        except OSError as e:
+            logger.warning(f"No se pudo indexar {transcript_path}: {e}")
+            return 0
+        course = course or transcript_path.parent.name
+        date = date or transcript_path.stem[:10]
+
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id, size, mtime FROM lectures WHERE path = ?", (path,)).fetchone()
+            if row and row[1] == stat.st_size and row[2] == stat.st_mtime:
+                return 0
+            if row:
+                self._conn.execute("DELETE FROM segments WHERE lecture_id = ?", (row[0],))
+                self._conn.execute(
+                    "UPDATE lectures SET course = ?, date = ?, size = ?, mtime = ? WHERE id = ?",
+                    (course, date, stat.st_size, stat.st_mtime, row[0])
+                )
+                lecture_id = row[0]
+            else:
+                lecture_id = self._conn.execute(
+                    "INSERT INTO lectures (path, course, date, size, mtime) VALUES (?, ?, ?, ?, ?)",
+                    (path, course, date, stat.st_size, stat.st_mtime)
+                ).lastrowid
+            segments = parse_transcript(text)
+            self._conn.executemany(
+                "INSERT INTO segments (lecture_id, start, end, text) VALUES (?, ?, ?, ?)",
+                [(lecture_id, start, end, block) for start, end, block in segments]
+            )
+        logger.info(f"🔎 Indexados {len(segments)} segmentos de {transcript_path.name} ({course})")
+        return len(segments)
+
+    def index_directory(self, root, course=None):
+        """Indexa todas las transcripciones bajo ``root`` y olvida las que ya no existen."""
+        added = 0
+        for transcript_path in sorted(Path(root).rglob("*.txt")):
+            added += self.index_transcript(transcript_path, course=course)
+        with self._lock, self._conn:
+            stale = [(lecture_id,) for lecture_id, path in self._conn.execute("SELECT id, path FROM lectures")
+                     if not os.path.exists(path)]
+            self._conn.executemany("DELETE FROM lectures WHERE id = ?", stale)
+        if stale:
+            logger.info(f"🔎 Eliminadas del índice {len(stale)} transcripciones que ya no existen")
+        return added
+
+    def search(self, query, course=None, since=None, until=None, limit=20):
+        """Busca ``query`` (sintaxis FTS5) y devuelve los segmentos más relevantes primero."""
+        sql = """
+            SELECT l.course, l.date, l.path, s.start, s.end,
+                   snippet(segments_fts, 0, '[', ']', '…', 16), bm25(segments_fts)
+            FROM segments_fts
+            JOIN segments s ON s.id = segments_fts.rowid
+            JOIN lectures l ON l.id = s.lecture_id
+            WHERE segments_fts MATCH ?
+        """
+        params = [query]
+        if course:
+            sql += " AND l.course LIKE ?"
+            params.append(f"%{course}%")
+        if since:
+            sql += " AND l.date >= ?"
+            params.append(since)
+        if until:
+            sql += " AND l.date <= ?"
+            params.append(until)
+        sql += " ORDER BY bm25(segments_fts) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        keys = ("course", "date", "path", "start", "end", "snippet", "score")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            lectures, hours = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(max_end), 0) / 3600.0 FROM "
+                "(SELECT l.id, MAX(s.end) AS max_end FROM lectures l LEFT JOIN segments s ON s.lecture_id = l.id "
+                "GROUP BY l.id)"
+            ).fetchone()
+            segments = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {"lectures": lectures, "segments": segments, "hours": hours}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Índice de búsqueda sobre las transcripciones")
+    parser.add_argument("--db", default=os.getenv("TRANSCRIPT_INDEX", "transcripts_index.db"),
+                        help="Base de datos del índice (por defecto TRANSCRIPT_INDEX o transcripts_index.db)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Indexa (incrementalmente) un directorio de transcripciones")
+    build.add_argument("transcripts_dir", help="Ruta de las transcripciones")
+    build.add_argument("--course", help="Asignatura (por defecto, el nombre de la carpeta de cada archivo)")
+
+    search = subparsers.add_parser("search", help="Busca en las transcripciones indexadas")
+    search.add_argument("query", help='Consulta FTS5: palabras, "frase exacta", prefijo*, OR, NEAR(...)')
+    search.add_argument("--course", help="Filtra por asignatura (coincidencia parcial)")
+    search.add_argument("--since", help="Fecha mínima AAAA-MM-DD")
+    search.add_argument("--until", help="Fecha máxima AAAA-MM-DD")
+    search.add_argument("--limit", type=int, default=20, help="Número máximo de resultados")
+
+    args = parser.parse_args(argv)
+    setup_logging('transcript_index.log')
+    index = TranscriptIndex(args.db)
+    try:
+        if args.command == "build":
+            index.index_directory(args.transcripts_dir, course=args.course)
+            stats = index.stats()
+            print(f"{stats['lectures']} clases, {stats['segments']} segmentos, {stats['hours']:.1f} h indexadas")
+            return True
+
+        started = time.perf_counter()
+        try:
+            results = index.search(args.query, args.course, args.since, args.until, args.limit)
+        except sqlite3.OperationalError as e:
+            print(f"❌ Consulta no válida: {e}")
+            return False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for result in results:
+            print(f"{result['date']}  [{format_offset(result['start'])}-{format_offset(result['end'])}]  "
+                  f"{result['course']}")
+            print(f"    {result['snippet']}")
+            print(f"    {result['path']}")
+        print(f"{len(results)} resultados en {elapsed_ms:.0f} ms")
+        return True
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)
@@ -1,58 +1,156 @@
 import os
-import sys
+import csv
 import time
 import math
 import logging
+import argparse
+import shutil
 import subprocess
+import contextvars
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from tqdm import tqdm
 import tempfile
+from pipeline_metrics import PipelineMetrics
+from progress_status import ProgressStatus
+from profiling import add_profile_arguments, create_profiler
+from logging_setup import setup_logging, log_context
+from storage_manager import StorageManager, estimate_audio_bytes, FAILED_CHUNK_MARK
+from transcript_index import TranscriptIndex
+from segment_store import SegmentStore
+from chunk_planner import plan_for_audio, schedule
+from cascade import CascadePolicy
+from audio_stream import AUDIO_FORMATS
+from autotune import load_profile, whisper_args, detect_backend
+from video_integrity import verify_video
 
 
-# === CONFIGURACIÓN DE LOGGING ===
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('transcripcion_videos_vulkan.log', encoding='utf-8')
-    ]
-)
+# === CONFIGURACIÓN DE LOGGING (cola asíncrona + JSON Lines) ===
+setup_logging('transcripcion_videos_vulkan.log')
 logger = logging.getLogger(__name__)
 
+DEFAULT_AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "flac")
+PCM_BYTES_PER_SECOND = 16000 * 2  # 16 kHz, mono, 16 bits
+
+# Fragmentación: "fixed" cada 5 minutos, "adaptive" corta por silencios/cambios de espectro.
+# Por defecto fija hasta validar el planificador con audio real de clases.
+CHUNKING_MODES = ("adaptive", "fixed")
+DEFAULT_CHUNKING = os.getenv("CHUNKING", "fixed")
+DEFAULT_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+
 
 class WhisperTranscriberVulkan:
-    def __init__(self, videos_dir, audios_dir, transcripts_dir, whisper_cli_path, model_path):
+    def __init__(self, videos_dir, audios_dir, transcripts_dir, whisper_cli_path, model_path, profiler=None,
+                 audio_format=DEFAULT_AUDIO_FORMAT, metrics=None, storage=None, index=None, segments=None,
+                 chunking=DEFAULT_CHUNKING, workers=None, draft_model_path=None, whisper_profile=None,
+                 progress=None):
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"Formato de audio no soportado: {audio_format}")
+        if chunking not in CHUNKING_MODES:
+            raise ValueError(f"Modo de fragmentación no soportado: {chunking}")
         self.videos_dir = Path(videos_dir)
         self.audios_dir = Path(audios_dir)
         self.transcripts_dir = Path(transcripts_dir)
         self.whisper_cli_path = Path(whisper_cli_path)
         self.model_path = Path(model_path)
+        # Perfil de autotune.py: variante cuantizada, backend, hilos y reparto más rápidos en esta máquina
+        self.tuning = load_profile(whisper_profile)
+        if self.tuning and self.tuning["base_model"] != self.model_path.name:
+            logger.info(f"El perfil de whisper se ajustó para {self.tuning['base_model']}; no se aplica")
+            self.tuning = None
+        if self.tuning and Path(self.tuning["model"]).exists():
+            self.model_path = Path(self.tuning["model"])
+        if workers is None:
+            # TRANSCRIBE_WORKERS explícito manda sobre el perfil
+            workers = self.tuning["workers"] if self.tuning and "TRANSCRIBE_WORKERS" not in os.environ else DEFAULT_WORKERS
+        self.whisper_args = whisper_args(self.tuning)
+        self.backend = self.tuning["backend"] if self.tuning else None
+        self.metrics = metrics or PipelineMetrics.from_env("transcriber")
+        self.progress = progress or ProgressStatus.from_env("transcriber", "audio_seconds")
+        self.profiler = profiler or create_profiler()
+        self.audio_format = audio_format
+        self.chunking = chunking
+        self.workers = max(1, workers)
+        self.cascade = CascadePolicy.from_env(draft_model_path)
+        self.storage = storage or StorageManager.from_env()
+        self.index = index or TranscriptIndex.from_env()
+        self.segments = segments or SegmentStore.from_env()
+        # Los duplicados deduplicados por el scraper son enlaces duros: mismo inodo, misma transcripción
+        self.transcribed_by_inode = {}
+        self.audio_stats = {"stored_bytes": 0, "pcm_bytes": 0, "decode_seconds": 0.0, "audio_seconds": 0.0}
 
         self.audios_dir.mkdir(parents=True, exist_ok=True)
         self.transcripts_dir.mkdir(parents=True, exist_ok=True)
 
         logger.info("=== CONFIGURACIÓN DEL ENTORNO ===")
         logger.info(f"📂 Videos: {self.videos_dir.resolve()}")
-        logger.info(f"🎧 Audios: {self.audios_dir.resolve()}")
+        logger.info(f"🎧 Audios: {self.audios_dir.resolve()} (formato {self.audio_format})")
         logger.info(f"📝 Transcripciones: {self.transcripts_dir.resolve()}")
         logger.info(f"🧠 Binario Whisper: {self.whisper_cli_path.resolve()}")
         logger.info(f"🧩 Modelo: {self.model_path.resolve()}")
-        logger.info("🚀 Backend activo: Vulkan (AMD GPU detectada automáticamente)")
+        logger.info(f"✂️ Fragmentación: {self.chunking}, {self.workers} worker(s) de whisper-cli")
+        if self.cascade.enabled:
+            logger.info(f"🪜 Cascada: borrador {Path(self.cascade.draft_model_path).name} -> {self.model_path.name}")
+        if self.tuning:
+            logger.info(
+                f"🚀 Backend: {self.backend} (perfil de autotune: {' '.join(self.whisper_args)}, "
+                f"{self.tuning['realtime_factor']:.1f}x tiempo real)"
+            )
+        else:
+            logger.info("🚀 Backend: el que elija whisper-cli (sin perfil de autotune)")
 
     # --- EXTRAER AUDIO DE VIDEO ---
     def extract_audio(self, video_path):
+        tmp_path = None
         try:
-            audio_path = self.audios_dir / f"{video_path.stem}.wav"
-            if audio_path.exists():
-                return audio_path
+            # Reutilizar un audio ya extraído en cualquier formato (p. ej. WAV de ejecuciones previas
+            # o el que el scraper generó al vuelo durante la descarga)
+            for fmt in AUDIO_FORMATS.values():
+                existing = self.audios_dir / f"{video_path.stem}{fmt['ext']}"
+                if existing.exists():
+                    return existing
+            fmt = AUDIO_FORMATS[self.audio_format]
+            audio_path = self.audios_dir / f"{video_path.stem}{fmt['ext']}"
+
+            # Reservar espacio según la duración del video antes de lanzar ffmpeg
+            video_duration = self.get_audio_duration(video_path)
+            expected_bytes = estimate_audio_bytes(video_duration, self.audio_format)
+            if not self.storage.reserve(self.audios_dir, expected_bytes, "extract"):
+                return None
+            # Nombre temporal único: un audio a medias no se reutiliza como completo y dos procesos
+            # con el mismo video (vigilancia + cola o lote) no escriben en el mismo archivo
+            fd, tmp_name = tempfile.mkstemp(prefix=f"{audio_path.name}.", suffix=".part", dir=self.audios_dir)
+            os.close(fd)
+            tmp_path = Path(tmp_name)
             cmd = [
-                "ffmpeg", "-i", str(video_path),
-                "-ac", "1", "-ar", "16000", "-y", str(audio_path)
+                "ffmpeg", "-i", str(video_path), "-vn",
+                "-ac", "1", "-ar", "16000", *fmt["codec"], "-f", fmt["muxer"], "-y", str(tmp_path)
             ]
-            subprocess.run(cmd, capture_output=True, text=True)
+            with self.profiler.phase("ffmpeg_extract"), \
+                    self.metrics.stage("ffmpeg_extract", video=video_path.name) as stage:
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                problem = None
+                if result.returncode != 0:
+                    problem = f"ffmpeg terminó con código {result.returncode}: {result.stderr.strip()[-300:]}"
+                elif not tmp_path.exists() or tmp_path.stat().st_size == 0:
+                    problem = "ffmpeg no produjo audio"
+                else:
+                    # Un audio mucho más corto que el video indica un video dañado a mitad
+                    audio_duration = self.get_audio_duration(tmp_path)
+                    if video_duration and audio_duration < video_duration - 60:
+                        problem = f"audio de {audio_duration:.0f}s para un video de {video_duration:.0f}s"
+                if problem:
+                    stage.fail()
+                    tmp_path.unlink(missing_ok=True)
+                    logger.error(f"Extracción de audio fallida para {video_path.name}: {problem}")
+                    return None
+                os.replace(tmp_path, audio_path)
+                stage.add_bytes(audio_path.stat().st_size)
             return audio_path
         except Exception as e:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
             logger.error(f"Error extrayendo audio: {e}")
             return None
 
@@ -73,61 +171,264 @@ class WhisperTranscriberVulkan:
     def transcribe_in_chunks(self, audio_path, chunk_duration=300):
         transcript_path = self.transcripts_dir / f"{audio_path.stem}.txt"
         total_duration = self.get_audio_duration(audio_path)
-        total_chunks = math.ceil(total_duration / chunk_duration)
+        with self.profiler.phase("chunk_plan"), self.metrics.stage("chunk_plan", video=audio_path.stem):
+            chunks = plan_for_audio(audio_path, total_duration, chunk_duration, self.chunking)
 
-        logger.info(f"Duración total: {total_duration:.1f}s ({total_chunks} segmentos máx. de 5 min cada uno)")
+        logger.info(
+            f"Duración total: {total_duration:.1f}s ({len(chunks)} fragmentos de ~{chunk_duration // 60} min, "
+            f"{self.workers} worker(s))"
+        )
+        segments = []
+        results = {}
+        next_index = 0
+        # Los fragmentos sin voz también cuentan como audio procesado para el ritmo y la ETA
+        chunk_seconds = {chunk["index"]: chunk["end"] - chunk["start"] for chunk in chunks}
 
         with open(transcript_path, "w", encoding="utf-8") as f_out:
-            with tqdm(total=total_chunks, desc=f"Transcribiendo {audio_path.stem}", unit="segmento") as pbar:
-                for i in range(total_chunks):
-                    start_time = i * chunk_duration
-                    end_time = min(start_time + chunk_duration, total_duration)
-
-                    temp_chunk = Path(tempfile.gettempdir()) / f"chunk_{i}_{audio_path.stem}.wav"
-                    cmd = [
-                        "ffmpeg", "-ss", str(start_time), "-t", str(chunk_duration),
-                        "-i", str(audio_path), "-ac", "1", "-ar", "16000", "-y", str(temp_chunk)
-                    ]
+            with tqdm(total=len(chunks), desc=f"Transcribiendo {audio_path.stem}", unit="segmento") as pbar:
+                if self.workers > 1:
+                    # Los más caros primero (mejor reparto); la salida se escribe en orden temporal
+                    with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                        futures = [
+                            pool.submit(contextvars.copy_context().run, self._transcribe_chunk, audio_path, chunk)
+                            for chunk in schedule(chunks)
+                        ]
+                        for future in as_completed(futures):
+                            result = future.result()
+                            results[result["index"]] = result
+                            self.progress.add_work(chunk_seconds[result["index"]])
+                            next_index = self._write_ready(f_out, results, next_index, segments, pbar)
+                else:
+                    for chunk in chunks:
+                        results[chunk["index"]] = self._transcribe_chunk(audio_path, chunk)
+                        self.progress.add_work(chunk_seconds[chunk["index"]])
+                        next_index = self._write_ready(f_out, results, next_index, segments, pbar)
+
+        if os.path.getsize(transcript_path) == 0:
+            logger.warning(f"⚠️ Transcripción vacía: {transcript_path}")
+        else:
+            logger.info(f"✓ Transcripción final guardada en {transcript_path.name}")
+
+        decode_seconds = sum(result["decode_seconds"] for result in results.values())
+        self._record_audio_tradeoff(audio_path, total_duration, decode_seconds)
+        return transcript_path, total_duration, segments
+
+    def _transcribe_chunk(self, audio_path, chunk):
+        """Corta y transcribe un fragmento; los silenciosos no pasan por whisper-cli."""
+        i = chunk["index"]
+        start_time, end_time = chunk["start"], chunk["end"]
+        result = {"index": i, "end": end_time, "text": "", "segments": [], "decode_seconds": 0.0}
+        if chunk["silent"]:
+            return result
+
+        profiler = self.profiler
+        # cProfile y el muestreador siguen un único hilo: con varios workers solo se miden fases
+        chunk_profile = profiler.chunk(i) if self.workers == 1 else nullcontext()
+        with log_context(chunk=i), chunk_profile:
+            # Nombre único por llamada: varios procesos (cola, vigilancia) pueden cortar a la vez
+            # fragmentos de clases con la misma fecha en asignaturas distintas
+            fd, temp_name = tempfile.mkstemp(prefix=f"chunk_{i}_", suffix=".wav")
+            os.close(fd)
+            temp_chunk = Path(temp_name)
+            try:
+                cmd = [
+                    "ffmpeg", "-ss", str(start_time), "-t", str(end_time - start_time),
+                    "-i", str(audio_path), "-ac", "1", "-ar", "16000", "-y", str(temp_chunk)
+                ]
+                cut_start = time.perf_counter()
+                with profiler.phase("chunk_cut"), \
+                        self.metrics.stage("chunk_cut", video=audio_path.stem, chunk=i) as stage:
                     subprocess.run(cmd, capture_output=True, text=True)
+                    result["decode_seconds"] = time.perf_counter() - cut_start
+                    if temp_chunk.stat().st_size:
+                        stage.add_bytes(temp_chunk.stat().st_size)
+                    else:
+                        stage.fail()
+
+                # Ejecutar whisper-cli.exe (con cascada: borrador y, si es dudoso, modelo grande)
+                out_base = self.transcripts_dir / f"{audio_path.stem}_chunk_{i}"
+                if self.cascade.enabled:
+                    out_base = self._cascade_chunk(audio_path, chunk, temp_chunk, out_base)
+                else:
+                    self._run_whisper(self.model_path, temp_chunk, out_base, "whisper_inference", audio_path, i)
 
-                    # Ejecutar whisper-cli.exe
-                    out_path = self.transcripts_dir / f"{audio_path.stem}_chunk_{i}.txt"
-                    cmd_whisper = [
-                        str(self.whisper_cli_path),
-                        "-m", str(self.model_path),
-                        "-f", str(temp_chunk),
-                        "-otxt",
-                        "-l", "es",
-                        "-of", str(out_path.with_suffix(""))  # salida sin extensión duplicada
-                    ]
-                    subprocess.run(cmd_whisper, capture_output=True, text=True)
-
-                    # Leer resultado temporal
+                # Leer resultado temporal
+                out_path = Path(f"{out_base}.txt")
+                with profiler.phase("read_output"):
                     if out_path.exists():
                         with open(out_path, "r", encoding="utf-8") as f_chunk:
-                            text = f_chunk.read().strip()
+                            result["text"] = f_chunk.read().strip()
                         out_path.unlink(missing_ok=True)
+                        result["segments"] = self._read_segments(
+                            Path(f"{out_base}.csv"), start_time, end_time, result["text"]
+                        )
                     else:
-                        text = "[⚠️ No se generó salida en este fragmento]"
+                        result["text"] = FAILED_CHUNK_MARK
+            finally:
+                temp_chunk.unlink(missing_ok=True)
+        return result
+
+    def _run_whisper(self, model_path, temp_chunk, out_base, stage_name, audio_path, i, extra_args=()):
+        """Lanza whisper-cli con un modelo; devuelve los segundos de inferencia."""
+        cmd_whisper = [
+            str(self.whisper_cli_path),
+            "-m", str(model_path),
+            "-f", str(temp_chunk),
+            "-otxt",
+            "-ocsv",  # tiempos por segmento para el almacén columnar
+            *self.whisper_args,
+            *extra_args,
+            "-l", "es",
+            "-of", str(out_base)  # salida sin extensión duplicada
+        ]
+        started = time.perf_counter()
+        with self.profiler.phase(stage_name), \
+                self.metrics.stage(stage_name, video=audio_path.stem, chunk=i) as stage:
+            whisper_result = subprocess.run(cmd_whisper, capture_output=True, text=True)
+            if whisper_result.returncode != 0 or not Path(f"{out_base}.txt").exists():
+                stage.fail()
+        if self.backend is None:
+            self.backend = detect_backend(whisper_result.stderr)
+            logger.info(f"🚀 Backend detectado por whisper-cli: {self.backend}")
+        return time.perf_counter() - started
 
-                    if not text:
-                        text = "[⚠️ Fragmento sin voz detectada]"
+    def _cascade_chunk(self, audio_path, chunk, temp_chunk, out_base):
+        """Borrador con el modelo pequeño; repite con el grande si la confianza es baja.
 
-                    f_out.write(f"\n\n{text}\n")
-                    f_out.write(f"[⏱️ {math.floor(end_time / 60):02d}:00]\n")
+        Devuelve la base de los archivos de salida que deben leerse.
+        """
+        i = chunk["index"]
+        draft_base = Path(f"{out_base}_draft")
+        draft_seconds = self._run_whisper(
+            self.cascade.draft_model_path, temp_chunk, draft_base, "whisper_draft", audio_path, i, ["-ojf"]
+        )
+        json_path = Path(f"{draft_base}.json")
+        escalate, reason = self.cascade.assess(json_path, chunk["speech"])
+        json_path.unlink(missing_ok=True)
+        if not escalate:
+            logger.debug(f"Fragmento {i} aceptado del borrador ({reason})")
+            self.cascade.record(False, draft_seconds)
+            return draft_base
 
-                    f_out.flush()
-                    os.fsync(f_out.fileno())
-                    temp_chunk.unlink(missing_ok=True)
-                    pbar.update(1)
-                    time.sleep(0.2)
+        logger.info(f"🔁 Fragmento {i}: {reason}; se repite con el modelo grande")
+        for suffix in (".txt", ".csv"):
+            Path(f"{draft_base}{suffix}").unlink(missing_ok=True)
+        final_seconds = self._run_whisper(self.model_path, temp_chunk, out_base, "whisper_inference", audio_path, i)
+        self.cascade.record(True, draft_seconds, final_seconds)
+        return out_base
 
-        if os.path.getsize(transcript_path) == 0:
-            logger.warning(f"⚠️ Transcripción vacía: {transcript_path}")
-        else:
-            logger.info(f"✓ Transcripción final guardada en {transcript_path.name}")
+    def _write_ready(self, f_out, results, next_index, segments, pbar):
+        """Escribe en orden los fragmentos ya terminados; devuelve el siguiente índice pendiente."""
+        while next_index in results:
+            result = results[next_index]
+            text = result["text"] or "[⚠️ Fragmento sin voz detectada]"
+            end_time = result["end"]
+            with self.profiler.phase("write_fsync"):
+                f_out.write(f"\n\n{text}\n")
+                f_out.write(f"[⏱️ {math.floor(end_time / 60):02d}:{math.floor(end_time % 60):02d}]\n")
+
+                f_out.flush()
+                os.fsync(f_out.fileno())
+            segments.extend(result["segments"])
+            pbar.update(1)
+            with self.profiler.phase("sleep"):
+                time.sleep(0.2)
+            next_index += 1
+        return next_index
+
+    @staticmethod
+    def _read_segments(csv_path, start_time, end_time, text):
+        """Segmentos (inicio, fin, texto) en segundos absolutos a partir del CSV de whisper-cli.
+
+        El CSV trae milisegundos relativos al fragmento; sin CSV (versiones antiguas de
+        whisper-cli) el fragmento entero cuenta como un único segmento.
+        """
+        if not csv_path.exists():
+            return [(start_time, end_time, text)] if text else []
+        segments = []
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f, escapechar="\\", doublequote=False):
+                try:
+                    start, end = int(row["start"]) / 1000, int(row["end"]) / 1000
+                except (KeyError, TypeError, ValueError):
+                    continue
+                segment_text = (row.get("text") or "").strip()
+                if segment_text:
+                    segments.append((start_time + start, start_time + end, segment_text))
+        csv_path.unlink(missing_ok=True)
+        return segments
+
+    def _record_audio_tradeoff(self, audio_path, duration, decode_seconds):
+        """Registra espacio ahorrado frente a PCM y el coste de decodificar los fragmentos."""
+        stored = audio_path.stat().st_size if audio_path.exists() else 0
+        pcm = int(duration * PCM_BYTES_PER_SECOND)
+        self.audio_stats["stored_bytes"] += stored
+        self.audio_stats["pcm_bytes"] += pcm
+        self.audio_stats["decode_seconds"] += decode_seconds
+        self.audio_stats["audio_seconds"] += duration
+        if pcm:
+            logger.info(
+                f"🎧 {audio_path.name}: {stored / 1e6:.1f} MB en disco vs {pcm / 1e6:.1f} MB en PCM "
+                f"({stored / pcm:.0%}), corte/decodificación {decode_seconds:.1f}s"
+            )
+
+    def log_audio_tradeoff(self):
+        """Resumen global del formato de audio elegido: ahorro de disco y sobrecoste de decodificación."""
+        stats = self.audio_stats
+        if not stats["pcm_bytes"]:
+            return
+        saved = stats["pcm_bytes"] - stats["stored_bytes"]
+        per_hour = stats["decode_seconds"] / (stats["audio_seconds"] / 3600) if stats["audio_seconds"] else 0
+        logger.info(f"=== AUDIO ({self.audio_format}) ===")
+        logger.info(
+            f"Disco: {stats['stored_bytes'] / 1e9:.2f} GB frente a {stats['pcm_bytes'] / 1e9:.2f} GB en WAV "
+            f"(ahorro {saved / 1e9:.2f} GB, {saved / stats['pcm_bytes']:.0%})"
+        )
+        logger.info(f"Corte/decodificación: {stats['decode_seconds']:.1f}s en total, {per_hour:.1f}s por hora de audio")
 
     # --- FLUJO PRINCIPAL ---
+    def process_video(self, video_path):
+        """Extrae y transcribe un video; devuelve la ruta de la transcripción o None."""
+        video_path = Path(video_path)
+        stat = video_path.stat()
+        inode = (stat.st_dev, stat.st_ino)
+        course = video_path.parent.name
+        segment_key = f"{course}/{video_path.stem}"
+        self.progress.set_current(video_path.name, course=course)
+        if inode in self.transcribed_by_inode:
+            original_transcript, original_key = self.transcribed_by_inode[inode]
+            duplicate_transcript = self.transcripts_dir / f"{video_path.stem}.txt"
+            shutil.copyfile(original_transcript, duplicate_transcript)
+            logger.info(f"♊ {video_path.name} es un duplicado; se reutiliza su transcripción")
+            self.index.index_transcript(duplicate_transcript, course=course)
+            self.segments.add_lecture(
+                segment_key, list(self.segments.lecture(original_key)), course, video_path.stem[:10]
+            )
+            return duplicate_transcript
+
+        logger.info(f"\n=== Procesando: {video_path.name} ===")
+        with log_context(course=course, video=video_path.name), \
+                self.profiler.lecture(video_path.stem):
+            # Un video truncado o ilegible no debe consumir tiempo de transcripción
+            with self.metrics.stage("verify", video=video_path.name) as stage:
+                problem = verify_video(video_path)
+                if problem:
+                    stage.fail()
+            if problem:
+                logger.error(f"❌ Video dañado, se omite (volver a descargarlo): {problem}")
+                return None
+            audio_path = self.extract_audio(video_path)
+            if not audio_path:
+                return None
+            transcript_path, duration, segments = self.transcribe_in_chunks(audio_path)
+            self.storage.mark_transcribed(video_path, audio_path, transcript_path, duration)
+            self.transcribed_by_inode[inode] = (transcript_path, segment_key)
+            # Indexar al terminar cada clase: la búsqueda está al día sin reconstrucciones
+            with self.profiler.phase("index"):
+                self.index.index_transcript(transcript_path, course=course)
+                self.segments.add_lecture(segment_key, segments, course, video_path.stem[:10])
+        return transcript_path
+
     def run(self):
         video_files = list(self.videos_dir.glob("*.mp4"))
         if not video_files:
@@ -135,25 +436,73 @@ class WhisperTranscriberVulkan:
             return False
 
         logger.info(f"{len(video_files)} videos encontrados.")
+        self.progress.add_total(len(video_files))
         for video_path in video_files:
-            logger.info(f"\n=== Procesando: {video_path.name} ===")
-            audio_path = self.extract_audio(video_path)
-            if audio_path:
-                self.transcribe_in_chunks(audio_path)
+            self.progress.item_done(bool(self.process_video(video_path)))
 
         logger.info("✅ Todas las transcripciones completadas.")
+        self.log_audio_tradeoff()
+        self.cascade.log_summary()
+        self.metrics.close()
+        self.progress.close()
+        self.index.close()
         return True
 
 
-def main():
-    if len(sys.argv) < 6:
-        print("Uso: python transcriptor_videos_vulkan.py <ruta_videos> <ruta_audios> <ruta_transcripciones> <ruta_whisper_cli> <ruta_modelo>")
-        sys.exit(1)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcripción por lotes con whisper-cli")
+    parser.add_argument("videos_dir", help="Ruta de los videos")
+    parser.add_argument("audios_dir", help="Ruta de los audios extraídos")
+    parser.add_argument("transcripts_dir", help="Ruta de las transcripciones")
+    parser.add_argument("whisper_cli_path", help="Ruta del binario whisper-cli")
+    parser.add_argument("model_path", help="Ruta del modelo GGML")
+    parser.add_argument(
+        "--audio-format", choices=sorted(AUDIO_FORMATS), default=DEFAULT_AUDIO_FORMAT,
+        help="Formato del audio intermedio (por defecto flac o AUDIO_FORMAT)"
+    )
+    parser.add_argument(
+        "--chunking", choices=CHUNKING_MODES, default=DEFAULT_CHUNKING,
+        help="Cortes por silencios y cambios de espectro (adaptive) o cada 5 minutos (fixed)"
+    )
+    parser.add_argument(
+        "--workers", type=int,
+        help="Instancias de whisper-cli en paralelo por clase (por defecto TRANSCRIBE_WORKERS, el perfil o 1)"
+    )
+    parser.add_argument(
+        "--draft-model",
+        help="Modelo GGML pequeño para la cascada: solo los fragmentos dudosos usan model_path"
+             " (por defecto CASCADE_DRAFT_MODEL)"
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Vigilar videos_dir/<asignatura>/ y transcribir cada video nuevo al terminar de escribirse;"
+             " audios y transcripciones replican las carpetas de asignatura"
+    )
+    parser.add_argument(
+        "--idle-exit", type=float, metavar="SEG",
+        help="Con --watch: terminar tras SEG segundos sin videos nuevos (por defecto, hasta Ctrl+C)"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    options = {
+        "profiler": create_profiler(args.profile, args.profile_dir), "audio_format": args.audio_format,
+        "chunking": args.chunking, "workers": args.workers, "draft_model_path": args.draft_model,
+    }
+    if args.watch:
+        from video_watcher import VideoWatcher
+        watcher = VideoWatcher(
+            args.videos_dir, args.audios_dir, args.transcripts_dir, args.whisper_cli_path, args.model_path,
+            transcriber_options=options
+        )
+        return watcher.run(idle_exit=args.idle_exit)
 
-    videos_dir, audios_dir, transcripts_dir, whisper_cli_path, model_path = sys.argv[1:6]
-    transcriber = WhisperTranscriberVulkan(videos_dir, audios_dir, transcripts_dir, whisper_cli_path, model_path)
+    transcriber = WhisperTranscriberVulkan(
+        args.videos_dir, args.audios_dir, args.transcripts_dir, args.whisper_cli_path, args.model_path, **options
+    )
     transcriber.run()
+    return True
 
 
 if __name__ == "__main__":
-    main()
+    exit(0 if main() else 1)
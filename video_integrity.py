@@ -0,0 +1,214 @@
+"""
+Verificación de integridad de los MP4 descargados.
+Durante la descarga se recorren las cajas de primer nivel del MP4 con los mismos bloques
+que se escriben (sin releer el archivo) y, si el servidor publica un MD5, se calcula en
+streaming. Al terminar se comprueba el tamaño frente a Content-Length, que no falte
+moov/mdat, que la última caja no quede cortada y que ffprobe lea una duración válida.
+Un archivo que no pasa la verificación no llega a tener su nombre definitivo.
+"""
+
+import os
+import re
+import base64
+import shutil
+import struct
+import logging
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+MIN_DURATION_SECONDS = 1.0
+# Un ETag de 32 hex solo es el MD5 en objetos S3 sin cifrado KMS/SSE-C; muchas CDN usan otra cosa
+VERIFY_ETAG_MD5 = os.getenv("VERIFY_ETAG_MD5", "0") == "1"
+
+
+class DownloadIntegrityError(Exception):
+    """La descarga terminó pero el archivo no es un video válido y completo."""
+
+
+def _parse_box_header(header):
+    """(tipo, tamaño) de una cabecera de caja; None si faltan bytes. Tamaño 0 = hasta el final."""
+    if len(header) < 8:
+        return None
+    size, box_type = struct.unpack(">I4s", header[:8])
+    if size == 1:
+        if len(header) < 16:
+            return None
+        size = struct.unpack(">Q", header[8:16])[0]
+    return box_type.decode("latin-1"), size
+
+
+class Mp4BoxScanner:
+    """Sigue las cajas de primer nivel a medida que llegan los bloques de la descarga."""
+
+    def __init__(self):
+        self.received = 0
+        self.next_box = 0       # offset de la próxima cabecera
+        self.boxes = []         # (tipo, offset, tamaño)
+        self.to_eof = False     # la última caja declara llegar hasta el final del archivo
+        self.invalid = None
+        self._header = b""
+
+    def feed(self, chunk):
+        chunk_start = self.received
+        self.received += len(chunk)
+        while self.invalid is None and not self.to_eof and self.next_box < self.received:
+            position = self.next_box + len(self._header) - chunk_start
+            self._header += chunk[position:position + 16 - len(self._header)]
+            parsed = _parse_box_header(self._header)
+            if parsed is None:
+                return  # cabecera partida entre dos bloques
+            box_type, size = parsed
+            self._header = b""
+            if size == 0:
+                self.boxes.append((box_type, self.next_box, None))
+                self.to_eof = True
+            elif size < 8:
+                self.invalid = f"caja '{box_type}' con tamaño inválido ({size}) en el byte {self.next_box}"
+            else:
+                self.boxes.append((box_type, self.next_box, size))
+                self.next_box += size
+
+    def problem(self):
+        """Descripción del defecto del contenedor o None si es un MP4 completo."""
+        return container_problem(self.boxes, self.invalid, self.to_eof, self.next_box, self.received)
+
+
+def scan_file(path):
+    """Recorre las cajas de primer nivel de un archivo en disco leyendo solo sus cabeceras."""
+    boxes, invalid, to_eof, offset = [], None, False, 0
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        total = f.tell()
+        while offset < total:
+            f.seek(offset)
+            parsed = _parse_box_header(f.read(16))
+            if parsed is None:
+                break  # cabecera cortada: container_problem lo detecta por el offset
+            box_type, size = parsed
+            if size == 0:
+                boxes.append((box_type, offset, None))
+                to_eof = True
+                break
+            if size < 8:
+                invalid = f"caja '{box_type}' con tamaño inválido ({size}) en el byte {offset}"
+                break
+            boxes.append((box_type, offset, size))
+            offset += size
+    return container_problem(boxes, invalid, to_eof, offset, total)
+
+
+def mvhd_duration(prefix):
+    """Duración en segundos según la caja mvhd si ``prefix`` (inicio del archivo) la contiene.
+
+    Solo funciona con moov al principio (faststart); si no, devuelve None.
+    """
+    offset = 0
+    while offset + 8 <= len(prefix):
+        parsed = _parse_box_header(prefix[offset:offset + 16])
+        if parsed is None:
+            return None
+        box_type, size = parsed
+        if box_type == "moov":
+            header = 16 if struct.unpack(">I", prefix[offset:offset + 4])[0] == 1 else 8
+            child = prefix[offset + header:offset + header + 40]
+            if len(child) < 32 or child[4:8] != b"mvhd":
+                return None
+            if child[8] == 1:  # versión 1: tiempos de 64 bits
+                if len(child) < 40:
+                    return None
+                timescale, duration = struct.unpack(">IQ", child[28:40])
+            else:
+                timescale, duration = struct.unpack(">II", child[20:28])
+            return duration / timescale if timescale else None
+        if size < 8:
+            return None
+        offset += size
+    return None
+
+
+def container_problem(boxes, invalid, to_eof, next_box, total):
+    if invalid:
+        return invalid
+    types = [box[0] for box in boxes]
+    if not types or types[0] not in ("ftyp", "styp"):
+        return "no empieza por una caja ftyp: no parece un MP4"
+    if "moov" not in types:
+        return "falta la caja moov (índice del video)"
+    if "mdat" not in types:
+        return "falta la caja mdat (datos del video)"
+    if not to_eof and next_box != total:
+        box_type, offset, size = boxes[-1]
+        return f"truncado: la caja '{box_type}' declara {size} bytes desde el byte {offset} y el archivo tiene {total}"
+    return None
+
+
+def probe_duration(path):
+    """Duración en segundos según ffprobe o None si no puede leer el contenedor."""
+    cmd = [
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", str(path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        return float(result.stdout.strip()) if result.returncode == 0 else None
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def expected_md5(headers):
+    """MD5 publicado expresamente por el servidor (Content-MD5 o x-goog-hash) en hex."""
+    content_md5 = headers.get("Content-MD5")
+    if content_md5:
+        try:
+            return base64.b64decode(content_md5).hex()
+        except ValueError:
+            pass
+    for part in headers.get("x-goog-hash", "").split(","):
+        if part.strip().startswith("md5="):
+            try:
+                return base64.b64decode(part.strip()[4:]).hex()
+            except ValueError:
+                pass
+    return None
+
+
+def etag_md5(headers):
+    """ETag de 32 hex que quizá sea el MD5 del objeto; solo con VERIFY_ETAG_MD5=1."""
+    if not VERIFY_ETAG_MD5:
+        return None
+    match = re.fullmatch(r'"?([0-9a-fA-F]{32})"?', headers.get("ETag", ""))
+    return match.group(1).lower() if match else None
+
+
+def duration_problem(path):
+    """Problema de duración según ffprobe; sin ffprobe instalado la comprobación se omite."""
+    if not shutil.which("ffprobe"):
+        return None
+    duration = probe_duration(path)
+    if duration is None or duration < MIN_DURATION_SECONDS:
+        return f"ffprobe no obtiene una duración válida ({duration})"
+    return None
+
+
+def verify_download(path, received, expected_size, scanner, md5=None, expected_md5_hex=None, etag_md5_hex=None):
+    """Comprobaciones tras la descarga; devuelve la descripción del primer problema o None.
+
+    Un ETag distinto del MD5 calculado solo se avisa: no basta para dar el archivo por corrupto.
+    """
+    if expected_size and received != expected_size:
+        return f"recibidos {received} bytes de {expected_size} (Content-Length)"
+    if md5 is not None and expected_md5_hex and md5.hexdigest() != expected_md5_hex:
+        return f"MD5 {md5.hexdigest()} distinto del publicado ({expected_md5_hex})"
+    if md5 is not None and etag_md5_hex and md5.hexdigest() != etag_md5_hex:
+        logger.warning(f"MD5 {md5.hexdigest()} distinto del ETag ({etag_md5_hex}) de {path}; se acepta")
+    return scanner.problem() or duration_problem(path)
+
+
+def verify_video(path):
+    """Comprobación rápida de un MP4 en disco (cajas + ffprobe) antes de transcribirlo."""
+    try:
+        problem = scan_file(path)
+    except OSError as e:
+        return str(e)
+    return problem or duration_problem(path)
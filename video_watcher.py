@@ -0,0 +1,207 @@
+"""
+Modo vigilancia del transcriptor.
+Observa <videos>/<asignatura>/ (recursivo) y transcribe cada MP4 nuevo en cuanto termina
+de escribirse: con watchdog (inotify, FSEvents, ReadDirectoryChangesW) los avisos llegan
+al momento; sin él, o con WATCH_POLLING=1 en volúmenes de red que no emiten eventos, se
+recorre el árbol cada pocos segundos. Un archivo se da por terminado cuando su tamaño y
+fecha no cambian durante WATCH_SETTLE_SECONDS. Audios y transcripciones replican las
+carpetas de asignatura, así que dos clases del mismo día en asignaturas distintas no se
+pisan.
+
+Uso:
+    python transcriptor_videos.py videos/ audios/ transcripciones/ <whisper-cli> <modelo> --watch
+"""
+
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # opcional: sin watchdog se vigila por sondeo
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTLE_SECONDS = float(os.getenv("WATCH_SETTLE_SECONDS", "10"))
+DEFAULT_POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", "5"))
+
+
+def _signature(path):
+    """(tamaño, mtime) o None si el archivo ya no existe."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+class VideoWatcher:
+    """Transcribe los MP4 que aparecen bajo ``videos_root`` con un transcriptor por asignatura."""
+
+    def __init__(self, videos_root, audios_root, transcripts_root, whisper_cli_path, model_path,
+                 settle_seconds=DEFAULT_SETTLE_SECONDS, poll_seconds=DEFAULT_POLL_SECONDS,
+                 polling=None, transcriber_options=None):
+        self.videos_root = Path(videos_root)
+        self.audios_root = Path(audios_root)
+        self.transcripts_root = Path(transcripts_root)
+        self.whisper_cli_path = whisper_cli_path
+        self.model_path = model_path
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        if polling is None:
+            polling = Observer is None or os.getenv("WATCH_POLLING", "0") == "1"
+        self.polling = polling
+        self.transcriber_options = transcriber_options or {}
+        self.transcribers = {}
+        self.shared = None
+        self.candidates = {}  # ruta -> (firma, instante desde el que no cambia)
+        self.handled = {}     # ruta -> firma con la que se procesó (un archivo reemplazado se repite)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def _shared_resources(self):
+        from pipeline_metrics import PipelineMetrics
+        from progress_status import ProgressStatus
+        from storage_manager import StorageManager
+        from transcript_index import TranscriptIndex
+        from segment_store import SegmentStore
+
+        return {
+            "metrics": PipelineMetrics.from_env("transcriber"),
+            "progress": ProgressStatus.from_env("transcriber", "audio_seconds"),
+            "storage": StorageManager.from_env(),
+            "index": TranscriptIndex.from_env(),
+            "segments": SegmentStore.from_env(),
+        }
+
+    def _transcriber(self, course_dir):
+        """Transcriptor de una carpeta de asignatura (relativa a la raíz de videos)."""
+        from transcriptor_videos import WhisperTranscriberVulkan
+
+        if course_dir not in self.transcribers:
+            self.transcribers[course_dir] = WhisperTranscriberVulkan(
+                self.videos_root / course_dir, self.audios_root / course_dir, self.transcripts_root / course_dir,
+                self.whisper_cli_path, self.model_path, **self.transcriber_options, **self.shared
+            )
+        return self.transcribers[course_dir]
+
+    def notify(self, path):
+        """Aviso de que ``path`` se creó, cambió o se renombró (llamado desde el hilo de watchdog)."""
+        path = Path(path)
+        if path.suffix.lower() != ".mp4":
+            return  # los .mp4.part del scraper llegan después como renombrado
+        with self._lock:
+            self.candidates[path] = (None, None)  # la firma se vuelve a tomar desde cero
+        self._wakeup.set()
+
+    def scan(self):
+        """Recorre el árbol y añade los MP4 que aún no se han procesado."""
+        for path in self.videos_root.rglob("*.mp4"):
+            with self._lock:
+                known = path in self.candidates
+            if not known and self.handled.get(path) != _signature(path):
+                self.notify(path)
+
+    def _start_observer(self):
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.notify(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    watcher.notify(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher.notify(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(_Handler(), str(self.videos_root), recursive=True)
+        observer.start()
+        return observer
+
+    def _ready(self):
+        """Candidatos cuya firma no ha cambiado en ``settle_seconds``; actualiza el resto."""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (signature, since) in list(self.candidates.items()):
+                current = _signature(path)
+                if current is None:
+                    del self.candidates[path]  # borrado o renombrado antes de terminar
+                elif current != signature:
+                    self.candidates[path] = (current, now)
+                elif now - since >= self.settle_seconds:
+                    del self.candidates[path]
+                    ready.append((path, current))
+        return sorted(ready)
+
+    def _process(self, path, signature):
+        if self.handled.get(path) == signature:
+            return  # aviso sin cambio real (p. ej. solo metadatos)
+        self.handled[path] = signature
+        if self.shared["storage"].is_transcribed(path):
+            return
+        course_dir = path.parent.relative_to(self.videos_root)
+        progress = self.shared["progress"]
+        progress.add_total()
+        try:
+            transcript_path = self._transcriber(course_dir).process_video(path)
+        except Exception as e:
+            logger.error(f"Error transcribiendo {path}: {e}")
+            transcript_path = None
+        progress.item_done(bool(transcript_path))
+        if not transcript_path:
+            # No se reintenta hasta que el archivo cambie (p. ej. se vuelva a descargar)
+            logger.warning(f"⚠️ {path} queda sin transcribir hasta que se reemplace")
+
+    def run(self, idle_exit=None):
+        """Vigila hasta Ctrl+C (o ``idle_exit`` segundos sin trabajo) y transcribe lo que llega."""
+        self.videos_root.mkdir(parents=True, exist_ok=True)
+        self.shared = self._shared_resources()
+        observer = None if self.polling else self._start_observer()
+        mode = "sondeo" if observer is None else "eventos del sistema de archivos"
+        logger.info(f"👀 Vigilando {self.videos_root.resolve()} ({mode}, estable tras {self.settle_seconds:g}s)")
+
+        # Lo que ya estaba antes de arrancar: el observador solo ve cambios nuevos
+        self.scan()
+        last_work = last_scan = time.monotonic()
+        try:
+            while True:
+                if observer is None and time.monotonic() - last_scan >= self.poll_seconds:
+                    self.scan()
+                    last_scan = time.monotonic()
+                ready = self._ready()
+                for path, signature in ready:
+                    self._process(path, signature)
+                if ready:
+                    last_work = time.monotonic()
+                    continue
+                with self._lock:
+                    waiting = bool(self.candidates)
+                if not waiting and idle_exit is not None and time.monotonic() - last_work >= idle_exit:
+                    logger.info("Sin videos nuevos: fin de la vigilancia")
+                    break
+                # Con candidatos pendientes se revisa cada segundo; si no, se espera un aviso
+                self._wakeup.wait(1 if waiting or observer is None else self.poll_seconds)
+                self._wakeup.clear()
+        except KeyboardInterrupt:
+            logger.info("Vigilancia detenida")
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            for transcriber in self.transcribers.values():
+                transcriber.log_audio_tradeoff()
+                transcriber.cascade.log_summary()
+            self.shared["metrics"].close()
+            self.shared["progress"].close()
+            self.shared["index"].close()
+        return True
@@ -1,34 +1,34 @@
 """
 Benchmark de Whisper para medir rendimiento en la máquina local.
-Extrae 5 minutos de un video y prueba los modelos small y medium.
+Extrae 5 minutos de un video y prueba los modelos small y medium; después mide en CPU
+el rendimiento de la inferencia por lotes (batched_whisper.py) según el tamaño de lote.
 """
 
 import os
+import math
 import time
 import logging
-import whisper
+import argparse
 import subprocess
 from pathlib import Path
+from profiling import add_profile_arguments, create_profiler
+from logging_setup import setup_logging
 
 # Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('whisper_benchmark.log', encoding='utf-8')
-    ]
-)
+setup_logging('whisper_benchmark.log')
 logger = logging.getLogger(__name__)
 
 
 class WhisperBenchmark:
     """Benchmark para medir rendimiento de Whisper."""
     
-    def __init__(self):
+    def __init__(self, profiler=None, batch_sizes=(1, 2, 4, 8), batch_model="small"):
         self.videos_dir = "videos"
         self.temp_dir = "temp_benchmark"
         self.results = {}
+        self.profiler = profiler or create_profiler()
+        self.batch_sizes = sorted(set(batch_sizes))
+        self.batch_model = batch_model
         
     def find_test_video(self):
         """Encuentra un video de prueba en el directorio de videos."""
@@ -129,17 +129,21 @@ class WhisperBenchmark:
         try:
             logger.info(f"=== INICIANDO BENCHMARK DE MODELO: {model_name.upper()} ===")
             
+            import whisper  # importa torch: solo cuando de verdad se va a medir un modelo
+
             # Cargar modelo
             logger.info(f"Cargando modelo {model_name}...")
             start_load = time.time()
-            model = whisper.load_model(model_name)
+            with self.profiler.phase(f"load_{model_name}"):
+                model = whisper.load_model(model_name)
             load_time = time.time() - start_load
             logger.info(f"✓ Modelo {model_name} cargado en {load_time:.2f} segundos")
             
             # Transcribir audio
             logger.info(f"Transcribiendo audio con modelo {model_name}...")
             start_transcribe = time.time()
-            result = model.transcribe(audio_path, language="es")
+            with self.profiler.phase(f"transcribe_{model_name}"), self.profiler.chunk(model_name):
+                result = model.transcribe(audio_path, language="es")
             transcribe_time = time.time() - start_transcribe
             logger.info(f"✓ Transcripción completada en {transcribe_time:.2f} segundos")
             
@@ -187,12 +191,14 @@ class WhisperBenchmark:
                 return False
             
             # 2. Extraer 5 minutos
-            video_5min = self.extract_5_minutes(video_path)
+            with self.profiler.phase("extract_5_minutes"):
+                video_5min = self.extract_5_minutes(video_path)
             if not video_5min:
                 return False
             
             # 3. Extraer audio
-            audio_path = self.extract_audio(video_5min)
+            with self.profiler.phase("extract_audio"):
+                audio_path = self.extract_audio(video_5min)
             if not audio_path:
                 return False
             
@@ -215,6 +221,10 @@ class WhisperBenchmark:
             
             # 5. Comparar resultados
             self.compare_results(results)
+
+            # 6. Rendimiento por tamaño de lote (CPU)
+            if self.batch_sizes:
+                self.compare_batches(self.benchmark_batches(self.batch_model, audio_path))
             
             return True
             
@@ -267,6 +277,66 @@ class WhisperBenchmark:
         except Exception as e:
             logger.error(f"Error comparando resultados: {e}")
     
+    def benchmark_batches(self, model_name, audio_path):
+        """Mide en CPU la transcripción por lotes de ventanas de 30 s para cada tamaño de lote."""
+        try:
+            import whisper
+            from batched_whisper import BatchedWhisper, WINDOW_SECONDS
+
+            logger.info(f"=== INFERENCIA POR LOTES EN CPU: {model_name.upper()} ===")
+            with self.profiler.phase(f"load_{model_name}_cpu"):
+                model = whisper.load_model(model_name, device="cpu")
+
+            # Repetir el audio para que cada tamaño de lote tenga al menos dos lotes completos
+            windows_per_copy = max(1, math.ceil(300 / WINDOW_SECONDS))
+            copies = max(1, math.ceil(2 * self.batch_sizes[-1] / windows_per_copy))
+            audio_paths = [audio_path] * copies
+
+            results = []
+            for batch_size in self.batch_sizes:
+                batched = BatchedWhisper(model, batch_size)
+                started = time.time()
+                with self.profiler.phase(f"batch_{batch_size}"):
+                    outputs = batched.transcribe_files(audio_paths)
+                elapsed = time.time() - started
+                audio_seconds = sum(windows[-1][0] for windows in outputs if windows)
+                result = {
+                    "batch_size": batch_size,
+                    "time": elapsed,
+                    "windows": batched.stats["windows"],
+                    "windows_per_second": batched.stats["windows"] / elapsed if elapsed > 0 else 0,
+                    "realtime_factor": audio_seconds / elapsed if elapsed > 0 else 0,
+                    "fallbacks": batched.stats["fallbacks"],
+                }
+                logger.info(
+                    f"Lote {batch_size}: {elapsed:.2f} s, {result['windows_per_second']:.2f} ventanas/s, "
+                    f"{result['realtime_factor']:.2f}x tiempo real ({result['fallbacks']} ventanas repetidas)"
+                )
+                results.append(result)
+            return results
+
+        except Exception as e:
+            logger.error(f"Error en el benchmark por lotes: {e}")
+            return []
+
+    def compare_batches(self, results):
+        """Tabla de rendimiento frente al tamaño de lote."""
+        if not results:
+            return
+        logger.info(f"\n{'='*60}")
+        logger.info("RENDIMIENTO POR TAMAÑO DE LOTE (CPU)")
+        logger.info(f"{'='*60}")
+        logger.info(f"{'Lote':<8} {'Tiempo (s)':<12} {'Ventanas/s':<12} {'x tiempo real':<15} {'Aceleración':<12}")
+        logger.info("-" * 60)
+        baseline = results[0]["windows_per_second"] or 1
+        for result in results:
+            logger.info(
+                f"{result['batch_size']:<8} {result['time']:<12.2f} {result['windows_per_second']:<12.2f} "
+                f"{result['realtime_factor']:<15.2f} {result['windows_per_second'] / baseline:<12.2f}"
+            )
+        best = max(results, key=lambda r: r["windows_per_second"])
+        logger.info(f"\n🏆 MEJOR TAMAÑO DE LOTE EN CPU: {best['batch_size']}")
+
     def cleanup(self):
         """Limpia archivos temporales."""
         try:
@@ -278,12 +348,23 @@ class WhisperBenchmark:
             logger.warning(f"Error limpiando archivos temporales: {e}")
 
 
-def main():
+def main(argv=None):
     """Función principal del benchmark."""
-    benchmark = WhisperBenchmark()
+    parser = argparse.ArgumentParser(description="Benchmark de Whisper en la máquina local")
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=[1, 2, 4, 8],
+                        help="Tamaños de lote a medir en CPU (sin valores se omite la prueba por lotes)")
+    parser.add_argument("--batch-model", default="small", help="Modelo para la prueba por lotes")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    benchmark = WhisperBenchmark(
+        profiler=create_profiler(args.profile, args.profile_dir),
+        batch_sizes=args.batch_sizes, batch_model=args.batch_model
+    )
     
     try:
-        success = benchmark.run_benchmark()
+        with benchmark.profiler.lecture("whisper_benchmark"):
+            success = benchmark.run_benchmark()
         if success:
             logger.info("=== BENCHMARK COMPLETADO EXITOSAMENTE ===")
         else:
@@ -0,0 +1,440 @@
+"""
+Cola de transcripción compartida entre varios nodos (SQLite en el volumen común).
+Cada clase es una tarea; un worker la reclama con un arrendamiento (lease) de duración
+fija y lo renueva con latidos mientras whisper-cli trabaja. Si el worker muere, el
+arrendamiento caduca y cualquier otro worker recupera la clase. Las clases que caducan
+o fallan demasiadas veces quedan como fallidas para no bloquear la cola.
+
+Uso:
+    python work_queue.py enqueue videos/
+    python work_queue.py enqueue videos/ --catalog inventario.json
+    python work_queue.py work videos/ audios/ transcripciones/ <whisper-cli> <modelo>
+    python work_queue.py status
+    python work_queue.py retry
+"""
+
+import os
+import re
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import date
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 600
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    video TEXT UNIQUE NOT NULL,
+    course TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks(status, priority DESC, id);
+"""
+
+
+def default_worker_id():
+    """Nombre del nodo y PID: único aunque haya varios workers en la misma máquina."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Tareas por clase con estados pending -> leased -> done/failed."""
+
+    def __init__(self, db_path="work_queue.db", max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Sin WAL: en volúmenes de red (SMB/NFS) solo es fiable el bloqueo del diario clásico
+        self._conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """WORK_QUEUE (ruta de la base de datos) y WORK_QUEUE_MAX_ATTEMPTS."""
+        return cls(
+            os.getenv("WORK_QUEUE", "work_queue.db"),
+            max_attempts=int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))),
+        )
+
+    def _transaction(self, sql_fn):
+        """Ejecuta ``sql_fn(conn)`` en una transacción con bloqueo de escritura inmediato."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = sql_fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    # --- PRODUCTOR ---
+    def enqueue(self, video, course, priority=0):
+        """Añade una clase (ruta relativa a la raíz de videos); devuelve False si ya estaba."""
+        def insert(conn):
+            return conn.execute(
+                "INSERT OR IGNORE INTO tasks (video, course, priority, updated) VALUES (?, ?, ?, ?)",
+                (video, course, priority, time.time())
+            ).rowcount
+        return bool(self._transaction(insert))
+
+    def enqueue_directory(self, videos_root):
+        """Encola <videos_root>/<asignatura>/*.mp4, de la clase más reciente a la más antigua."""
+        videos_root = Path(videos_root)
+        added = 0
+        for video_path in sorted(videos_root.glob("*/*.mp4")):
+            relative = video_path.relative_to(videos_root).as_posix()
+            added += self.enqueue(relative, video_path.parent.name, _lecture_ordinal(video_path))
+        return added
+
+    def enqueue_catalog(self, videos_root, rows):
+        """Encola solo las clases de un inventario (catalog.py) que ya están descargadas.
+
+        Devuelve (añadidas, aún sin descargar); repetirlo tras la descarga completa la cola.
+        """
+        videos_root = Path(videos_root)
+        wanted = {}
+        for row in rows:
+            wanted.setdefault(row["course"], set()).add(row["date"])
+        added = missing = 0
+        for course, dates in wanted.items():
+            # Varias grabaciones del mismo día se guardan como AAAA-MM-DD_1.mp4, _2...
+            found = {}
+            for video_path in sorted((videos_root / course).glob("*.mp4")):
+                if video_path.stem[:10] in dates:
+                    found.setdefault(video_path.stem[:10], []).append(video_path)
+            missing += sum(1 for row in rows if row["course"] == course and row["date"] not in found)
+            for video_path in (path for paths in found.values() for path in paths):
+                relative = video_path.relative_to(videos_root).as_posix()
+                added += self.enqueue(relative, course, _lecture_ordinal(video_path))
+        return added, missing
+
+    def retry_failed(self):
+        """Devuelve las clases fallidas a pendientes con los intentos a cero."""
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE tasks SET status = 'pending', worker = NULL, lease_expires = NULL, attempts = 0, "
+            "error = NULL, updated = ? WHERE status = 'failed'", (time.time(),)
+        ).rowcount)
+
+    # --- WORKERS ---
+    def claim(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS, now=None):
+        """Reclama la tarea pendiente más prioritaria (o una con el arrendamiento caducado).
+
+        ``now`` (segundos epoch) sustituye a la hora del sistema en las pruebas.
+        """
+        now = time.time() if now is None else now
+
+        def take(conn):
+            while True:
+                row = conn.execute(
+                    "SELECT id, video, course, attempts, status, worker FROM tasks "
+                    "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY priority DESC, id LIMIT 1", (now,)
+                ).fetchone()
+                if row is None:
+                    return None
+                task_id, video, course, attempts, status, previous = row
+                if status == "leased":
+                    logger.warning(f"♻️ Arrendamiento caducado de {previous} sobre {video}; se recupera")
+                    if attempts >= self.max_attempts:
+                        conn.execute(
+                            "UPDATE tasks SET status = 'failed', worker = NULL, lease_expires = NULL, "
+                            "error = ?, updated = ? WHERE id = ?",
+                            (f"arrendamiento caducado {attempts} veces", now, task_id)
+                        )
+                        continue
+                conn.execute(
+                    "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                    "updated = ? WHERE id = ?", (worker_id, now + lease_seconds, now, task_id)
+                )
+                return {"id": task_id, "video": video, "course": course, "attempt": attempts + 1}
+        return self._transaction(take)
+
+    def heartbeat(self, task_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS, now=None):
+        """Renueva el arrendamiento; False si el worker ya no es su dueño."""
+        now = time.time() if now is None else now
+        return bool(self._transaction(lambda conn: conn.execute(
+            "UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (now + lease_seconds, now, task_id, worker_id)
+        ).rowcount))
+
+    def complete(self, task_id, worker_id, result=None):
+        """Marca la tarea como hecha si el worker sigue siendo su dueño."""
+        return bool(self._transaction(lambda conn: conn.execute(
+            "UPDATE tasks SET status = 'done', lease_expires = NULL, result = ?, error = NULL, updated = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (result, time.time(), task_id, worker_id)
+        ).rowcount))
+
+    def fail(self, task_id, worker_id, error):
+        """Libera la tarea para otro intento o la da por fallida al agotar los intentos."""
+        def release(conn):
+            row = conn.execute(
+                "SELECT attempts FROM tasks WHERE id = ? AND worker = ? AND status = 'leased'", (task_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+            status = "failed" if row[0] >= self.max_attempts else "pending"
+            conn.execute(
+                "UPDATE tasks SET status = ?, worker = NULL, lease_expires = NULL, error = ?, updated = ? "
+                "WHERE id = ?", (status, error, time.time(), task_id)
+            )
+            return True
+        return self._transaction(release)
+
+    # --- CONSULTA ---
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def active_leases(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT video, worker, lease_expires, attempts FROM tasks WHERE status = 'leased' ORDER BY video"
+            ).fetchall()
+
+    def failures(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT video, attempts, error FROM tasks WHERE status = 'failed' ORDER BY video"
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LeaseKeeper:
+    """Hilo de latidos mientras se procesa una tarea; ``lost`` indica que otro worker la recuperó."""
+
+    def __init__(self, queue, task, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.queue = queue
+        self.task = task
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _beat(self):
+        # Tres latidos por arrendamiento: un latido perdido (red lenta) no basta para caducar
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.task["id"], self.worker_id, self.lease_seconds):
+                    self.lost = True
+                    logger.warning(f"⚠️ Arrendamiento perdido sobre {self.task['video']}")
+                    return
+            except sqlite3.Error as e:
+                logger.warning(f"Latido fallido ({e}); se reintenta en el siguiente")
+
+
+class QueueWorker:
+    """Reclama clases de la cola y las transcribe con un transcriptor por asignatura."""
+
+    def __init__(self, queue, videos_root, audios_root, transcripts_root, whisper_cli_path, model_path,
+                 worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS, poll_seconds=30, transcriber_options=None):
+        self.queue = queue
+        self.videos_root = Path(videos_root)
+        self.audios_root = Path(audios_root)
+        self.transcripts_root = Path(transcripts_root)
+        self.whisper_cli_path = whisper_cli_path
+        self.model_path = model_path
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.transcriber_options = transcriber_options or {}
+        self.transcribers = {}
+        self.shared = None
+
+    def _shared_resources(self):
+        """Métricas, retención e índices del worker.
+
+        Registro de retención, almacén de segmentos e índice FTS5 son los mismos que usan
+        el scraper y el transcriptor (se escriben con bloqueo entre procesos), así que lo
+        que transcribe un worker no se vuelve a descargar ni a transcribir.
+        """
+        from pipeline_metrics import PipelineMetrics
+        from progress_status import ProgressStatus
+        from storage_manager import StorageManager
+        from transcript_index import TranscriptIndex
+        from segment_store import SegmentStore
+
+        worker_name = re.sub(r"[^\w.-]", "_", self.worker_id)
+        return {
+            "metrics": PipelineMetrics.from_env("transcriber"),
+            # Un archivo de progreso por worker: varios nodos pueden compartir PROGRESS_DIR
+            "progress": ProgressStatus.from_env(f"transcriber-{worker_name}", "audio_seconds"),
+            "storage": StorageManager.from_env(),
+            "index": TranscriptIndex.from_env(),
+            "segments": SegmentStore.from_env(),
+        }
+
+    def _transcriber(self, course):
+        from transcriptor_videos import WhisperTranscriberVulkan
+
+        if course not in self.transcribers:
+            self.transcribers[course] = WhisperTranscriberVulkan(
+                self.videos_root / course, self.audios_root / course, self.transcripts_root / course,
+                self.whisper_cli_path, self.model_path, **self.transcriber_options, **self.shared
+            )
+        return self.transcribers[course]
+
+    def run(self, wait=False):
+        """Procesa tareas hasta vaciar la cola (o indefinidamente con ``wait``)."""
+        self.shared = self._shared_resources()
+        logger.info(f"👷 Worker {self.worker_id} conectado a {self.queue.db_path}")
+        done = failed = 0
+        try:
+            while True:
+                task = self.queue.claim(self.worker_id, self.lease_seconds)
+                if task is None:
+                    counts = self.queue.counts()
+                    # Quedan clases en manos de otros workers: si alguno muere, su arrendamiento caducará
+                    if not wait and not counts["pending"] and not counts["leased"]:
+                        break
+                    time.sleep(self.poll_seconds)
+                    continue
+
+                logger.info(f"📥 {task['video']} (intento {task['attempt']})")
+                error = None
+                with LeaseKeeper(self.queue, task, self.worker_id, self.lease_seconds) as keeper:
+                    try:
+                        transcript_path = self._transcriber(task["course"]).process_video(
+                            self.videos_root / task["video"]
+                        )
+                        if not transcript_path:
+                            error = "extracción de audio fallida"
+                    except Exception as e:
+                        logger.error(f"Error transcribiendo {task['video']}: {e}")
+                        error = str(e)
+
+                self.shared["progress"].item_done(error is None)
+                if keeper.lost:
+                    logger.warning(f"{task['video']} fue recuperada por otro worker; no se reporta")
+                elif error:
+                    self.queue.fail(task["id"], self.worker_id, error)
+                    failed += 1
+                else:
+                    self.queue.complete(task["id"], self.worker_id, str(transcript_path))
+                    done += 1
+        finally:
+            for transcriber in self.transcribers.values():
+                transcriber.log_audio_tradeoff()
+                transcriber.cascade.log_summary()
+            self.shared["metrics"].close()
+            self.shared["progress"].close()
+            self.shared["index"].close()
+        logger.info(f"👷 Worker {self.worker_id} terminado: {done} clases hechas, {failed} fallidas")
+        return failed == 0
+
+
+def _lecture_ordinal(video_path):
+    """Prioridad por fecha de la clase (AAAA-MM-DD[_n].mp4 o mtime): las recientes primero."""
+    try:
+        return date.fromisoformat(video_path.stem[:10]).toordinal()
+    except ValueError:
+        return date.fromtimestamp(video_path.stat().st_mtime).toordinal()
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    from logging_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description="Cola de transcripción compartida entre nodos")
+    parser.add_argument("--db", default=os.getenv("WORK_QUEUE", "work_queue.db"),
+                        help="Base de datos de la cola en el volumen compartido (por defecto WORK_QUEUE)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = subparsers.add_parser("enqueue", help="Encola los videos de <raíz>/<asignatura>/*.mp4")
+    enqueue.add_argument("videos_root", help="Raíz de los videos (una carpeta por asignatura)")
+    enqueue.add_argument("--catalog", metavar="INVENTARIO",
+                         help="Encolar solo las clases de un inventario de main_improved_v3.py --catalog")
+
+    work = subparsers.add_parser("work", help="Reclama y transcribe clases hasta vaciar la cola")
+    work.add_argument("videos_root", help="Raíz de los videos en este nodo")
+    work.add_argument("audios_root", help="Raíz de los audios extraídos")
+    work.add_argument("transcripts_root", help="Raíz de las transcripciones")
+    work.add_argument("whisper_cli_path", help="Ruta del binario whisper-cli")
+    work.add_argument("model_path", help="Ruta del modelo GGML")
+    work.add_argument("--worker-id", help="Identificador del worker (por defecto <host>:<pid>)")
+    work.add_argument("--lease", type=float, default=float(os.getenv("WORK_QUEUE_LEASE_SECONDS", DEFAULT_LEASE_SECONDS)),
+                      help="Segundos de arrendamiento; se renueva cada tercio (por defecto 600)")
+    work.add_argument("--poll", type=float, default=30, help="Espera entre consultas si no hay tareas libres")
+    work.add_argument("--wait", action="store_true", help="No terminar al vaciarse la cola: esperar nuevas clases")
+    work.add_argument("--workers", type=int, help="Instancias de whisper-cli en paralelo por clase")
+    work.add_argument("--draft-model", help="Modelo GGML pequeño para la cascada")
+
+    subparsers.add_parser("status", help="Resumen de la cola, arrendamientos activos y fallos")
+    subparsers.add_parser("retry", help="Devuelve las clases fallidas a pendientes")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    setup_logging('work_queue.log')
+    queue = WorkQueue(args.db, max_attempts=int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))))
+    try:
+        if args.command == "enqueue":
+            if args.catalog:
+                from catalog import read_catalog
+                added, missing = queue.enqueue_catalog(args.videos_root, read_catalog(args.catalog))
+                print(f"{added} clases nuevas en la cola, {missing} del inventario aún sin descargar")
+                return True
+            added = queue.enqueue_directory(args.videos_root)
+            print(f"{added} clases nuevas en la cola")
+            return True
+        if args.command == "retry":
+            print(f"{queue.retry_failed()} clases devueltas a pendientes")
+            return True
+        if args.command == "status":
+            counts = queue.counts()
+            print(" · ".join(f"{status}: {n}" for status, n in counts.items()))
+            now = time.time()
+            for video, worker, expires, attempts in queue.active_leases():
+                print(f"  🔒 {video}  {worker}  caduca en {expires - now:.0f}s  (intento {attempts})")
+            for video, attempts, error in queue.failures():
+                print(f"  ❌ {video}  ({attempts} intentos): {error}")
+            return True
+
+        options = {}
+        if args.workers:
+            options["workers"] = args.workers
+        if args.draft_model:
+            options["draft_model_path"] = args.draft_model
+        worker = QueueWorker(
+            queue, args.videos_root, args.audios_root, args.transcripts_root, args.whisper_cli_path,
+            args.model_path, worker_id=args.worker_id, lease_seconds=args.lease, poll_seconds=args.poll,
+            transcriber_options=options,
+        )
+        return worker.run(wait=args.wait)
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    exit(0 if main() else 1)